@@ -3,57 +3,118 @@ Flask backend API for Electricity Load Forecasting.
 """
 import os
 import json
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, send_file
 from flask_cors import CORS
 
 import database as db
 import weather
 import features
-import model_v4
 import config
 import market
-from model_v4 import model_manager
-from config import PREPROCESSED_CSV, MODEL_DIR
+import telemetry
+import resources
+import inference_pool
+import export
+import downsample
+import response_cache
+import zones
+import retention
+import profiling
+from config import MODEL_DIR, TIMING_HEADER, DEFAULT_ZONE
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 # ── Initialization (Lazy) ───────────────────────────────────────────
-history_df_full = None
+# Model sets and history load per zone on first use (see zones.py).
 is_loading = False # Prevent race condition in warm_up
 
-def get_history_data():
-    global history_df_full
-    if history_df_full is None:
-        import gc
-        print("🕒 Loading recent historical data (Memory Optimized)...")
-        # Load only the last 10k rows (~1.5 years) instead of 70k (8 years)
-        # This saves ~100MB of RAM at runtime
-        total_rows = 70000 
-        skip = max(0, total_rows - 10000)
-        
-        history_df_full = pd.read_csv(PREPROCESSED_CSV, skiprows=range(1, skip))
-        
-        # Optimize types
-        for col in history_df_full.select_dtypes(include=['float64']).columns:
-            history_df_full[col] = history_df_full[col].astype('float32')
-        for col in history_df_full.select_dtypes(include=['int64']).columns:
-            history_df_full[col] = history_df_full[col].astype('int32')
-            
-        history_df_full['Timestamp'] = pd.to_datetime(history_df_full['Timestamp'])
-        gc.collect() 
-        print(f"✅ Recent data loaded. Horizon: {len(history_df_full)} rows.")
-    return history_df_full
-
 # Initialize database
 db.init_db()
 
-# Model manager is global, but we will call .load() inside functions
+# Zone model sets are loaded inside the endpoints (zones.pool.use)
 # instead of at startup to save memory on boot.
 
+# ── Request tracing ──────────────────────────────────────────────────
+
+@app.before_request
+def _start_trace():
+    telemetry.begin_request()
+
+
+@app.after_request
+def _finish_trace(response):
+    trace, total = telemetry.end_request()
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    telemetry.observe("voltcast_request_duration_seconds", total, endpoint=endpoint)
+    telemetry.inc("voltcast_requests_total", endpoint=endpoint, status=response.status_code)
+    if TIMING_HEADER or request.headers.get("X-Timing"):
+        response.headers["X-Timing"] = telemetry.timing_header(trace, total)
+    return response
+
+# ── On-demand profiling (?profile=cpu|mem|speedscope) ────────────────
+# Hooks are only installed when profiling is enabled, so normal requests pay nothing.
+
+def profile_token():
+    # Header only: a query-string token would end up in access logs and browser history
+    return request.headers.get("X-Profile-Token")
+
+def _start_profile():
+    modes = request.args.get("profile")
+    if modes is None or request.path.startswith("/api/profiles"):
+        return None
+    if not profiling.authorized(profile_token()):
+        return jsonify({"error": "Profiling not authorized"}), 403
+    try:
+        g.profile = profiling.begin(profiling.parse_modes(modes), f"{request.method} {request.path}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except profiling.ProfilerBusy as e:
+        response = jsonify({"error": str(e)})
+        response.status_code = 409
+        response.headers["Retry-After"] = "1"
+        return response
+    return None
+
+def _finish_profile(response):
+    session = g.pop("profile", None)
+    if session is not None:
+        meta = session.finish(response.status_code)
+        response.headers["X-Profile-Id"] = meta["id"]
+        response.headers["X-Profile-Url"] = f"/api/profiles/{meta['id']}"
+    return response
+
+def _abandon_profile(exc):
+    # The view raised before after_request ran: still release the profiler
+    session = g.pop("profile", None)
+    if session is not None:
+        session.finish(500)
+
+if profiling.enabled():
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
+
+def busy_response(e):
+    """503 + Retry-After when every inference slot stayed busy past the queue timeout."""
+    response = jsonify({"error": str(e)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+def no_history_response(zone):
+    """404 for a configured zone that has no history CSV (no server paths in the body)."""
+    return jsonify({"error": f"No history data for zone '{zone}'"}), 404
+
+def request_zone(data=None):
+    """Zone from the JSON body or ?zone= (default: system); unknown zones raise zones.UnknownZone."""
+    zone = (data or {}).get('zone') or request.args.get('zone') or DEFAULT_ZONE
+    if zone not in zones.pool.zones:
+        raise zones.UnknownZone(zone)
+    return zone
+
 # ── Endpoints ────────────────────────────────────────────────────────
 
 @app.route('/api/forecast', methods=['POST'])
@@ -64,7 +125,8 @@ def run_manual_forecast():
         return jsonify({"error": "Missing start_date"}), 400
     try:
         req_start = datetime.strptime(data['start_date'], "%Y-%m-%d %H:%M")
-        return run_forecast_logic(req_start, temp_offset=float(data.get('temp_offset', 0)))
+        return run_forecast_logic(req_start, temp_offset=float(data.get('temp_offset', 0)),
+                                  quantiles=bool(data.get('quantiles', False)), zone=request_zone(data))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -74,19 +136,26 @@ def live_forecast():
     now = datetime.now().replace(minute=0, second=0, microsecond=0)
     # Note: If 'now' is outside our data range (e.g. 2026), 
     # run_forecast_logic will handle the fallback to 2025 automatically.
-    return run_forecast_logic(now)
-
-def run_forecast_logic(req_start, temp_offset=0):
-    """Core forecasting engine used by both endpoints."""
-    # 1. Validation & Windowing
-    history_df = get_history_data()
+    quantiles = request.args.get('quantiles', '').lower() in ('1', 'true', 'yes')
+    try:
+        zone = request_zone()
+    except zones.UnknownZone as e:
+        return jsonify({"error": str(e)}), 400
+    return run_forecast_logic(now, quantiles=quantiles, zone=zone)
+
+def resolve_window(history_df, req_start):
+    """
+    Find the 168h input window ending at req_start.
+    Returns (history_window, input_start, req_start); req_start moves to the
+    latest year in history (or the end of history) when the date is outside it.
+    """
     input_start = req_start - timedelta(hours=168)
     history_window = history_df[
         (history_df['Timestamp'] >= input_start) & 
         (history_df['Timestamp'] < req_start)
     ].copy()
     
-    # 1b. Fallback for future dates (like 2026)
+    # Fallback for future dates (like 2026)
     if len(history_window) < 168:
         latest_year = history_df['Timestamp'].dt.year.max()
         try:
@@ -104,144 +173,533 @@ def run_forecast_logic(req_start, temp_offset=0):
         except:
             history_window = history_df.tail(168).copy()
             req_start = history_window['Timestamp'].iloc[-1] + timedelta(hours=1)
+    return history_window, input_start, req_start
+
+def peak_alerts(peak_load, samples=None):
+    """
+    Peak-demand alerts. With MC samples (S, 168) in MW, alerts fire on the
+    probability that the weekly peak exceeds each threshold; returns
+    (alerts, {threshold: probability} or None).
+    """
+    alerts = []
+    if samples is None:
+        if float(peak_load) > config.PEAK_CRITICAL_MW:
+            alerts.append({"type": "CRITICAL", "message": f"Peak Demand Alert: {peak_load:,.0f} MW predicted."})
+        elif float(peak_load) > config.PEAK_WARNING_MW:
+            alerts.append({"type": "WARNING", "message": "High usage period detected."})
+        return alerts, None
+
+    sample_peaks = np.asarray(samples).max(axis=-1)
+    exceedance = {
+        str(int(thr)): float((sample_peaks > thr).mean())
+        for thr in (config.PEAK_CRITICAL_MW, config.PEAK_WARNING_MW)
+    }
+    p_crit = exceedance[str(int(config.PEAK_CRITICAL_MW))]
+    p_warn = exceedance[str(int(config.PEAK_WARNING_MW))]
+    if p_crit >= config.ALERT_MIN_PROBABILITY:
+        alerts.append({"type": "CRITICAL", "probability": p_crit,
+                       "message": f"Peak Demand Alert: {p_crit:.0%} chance of exceeding {config.PEAK_CRITICAL_MW:,.0f} MW."})
+    elif p_warn >= config.ALERT_MIN_PROBABILITY:
+        alerts.append({"type": "WARNING", "probability": p_warn,
+                       "message": f"High usage period: {p_warn:.0%} chance of exceeding {config.PEAK_WARNING_MW:,.0f} MW."})
+    return alerts, exceedance
+
+def run_forecast_logic(req_start, temp_offset=0, quantiles=False, zone=DEFAULT_ZONE):
+    """Core forecasting engine used by both endpoints."""
+    with zones.pool.use(zone) as zm:
+        return _run_zone_forecast(zm, req_start, temp_offset, quantiles)
+
+def _run_zone_forecast(zm, req_start, temp_offset, quantiles):
+    # 1. Validation & Windowing
+    history_df = zm.history.get()
+    with telemetry.stage("history_window"):
+        history_window, input_start, req_start = resolve_window(history_df, req_start)
 
     # 2. Setup DB Request
-    req_id = db.save_forecast_request(
-        req_start.isoformat(), 
-        (req_start + timedelta(hours=167)).isoformat(),
-        input_start.isoformat(),
-        req_start.isoformat()
-    )
+    with telemetry.stage("db_write"):
+        req_id = db.save_forecast_request(
+            req_start.isoformat(), 
+            (req_start + timedelta(hours=167)).isoformat(),
+            input_start.isoformat(),
+            req_start.isoformat(),
+            zone=zm.zone
+        )
 
     try:
         # Load models lazily if not already done
-        model_manager.load()
+        zm.manager.load()
         
         # 3. Weather & What-If
         weather_forecast = weather.fetch_weather_forecast(req_start, hours=168)
         if temp_offset != 0:
-            for city in weather_forecast:
-                weather_forecast[city][f'Temp_{city}'] += temp_offset
+            weather_forecast = weather_forecast.with_temp_offset(temp_offset)
 
         # 4. Prediction
-        input_cols = model_manager.config['FEATURE_COLS']
-        future_df = features.prepare_inference_data(history_window, weather_forecast, input_cols)
-        preds = model_manager.predict(future_df)
+        with telemetry.stage("features"):
+            input_cols = zm.manager.config['FEATURE_COLS']
+            future_df = features.prepare_inference_data(history_window, weather_forecast, input_cols)
+        preds = zm.manager.predict(future_df, mc_samples=config.MC_DROPOUT_SAMPLES if quantiles else 0)
         
         # 5. Market & Renewables
-        solar_mw, wind_mw = market.estimate_renewables(weather_forecast)
-        
-        # 6. Formatting
-        final_results = []
-        primary_city = list(weather_forecast.keys())[0]
-        weather_codes = weather_forecast[primary_city][f'Code_{primary_city}'].values
-        
-        for i in range(168):
-            ts = req_start + timedelta(hours=i)
-            load = float(preds["prediction"][i])
-            is_we = bool(future_df['Weekend'].iloc[i] == 1)
-            price = market.estimate_iso_ne_price(load, ts.hour, is_we)
+        with telemetry.stage("market"):
+            solar_mw, wind_mw = market.estimate_renewables(weather_forecast)
             
-            final_results.append({
-                "hour_offset": i,
-                "timestamp": ts.isoformat(),
-                "predicted_load": load,
-                "xgb_load": float(preds["xgb_base"][i]),
-                "dl_residual": float(preds["residual_correction"][i]),
-                "weather_code": int(weather_codes[i]),
-                "price": price,
-                "solar_mw": float(solar_mw[i]),
-                "wind_mw": float(wind_mw[i]),
-                "net_load": float(load - solar_mw[i] - wind_mw[i])
-            })
+            # 6. Formatting
+            final_results = []
+            weather_codes = weather_forecast.code[0] # primary city
             
-        db.save_forecast_results(req_id, final_results)
+            for i in range(168):
+                ts = req_start + timedelta(hours=i)
+                load = float(preds["prediction"][i])
+                is_we = bool(future_df['Weekend'].iloc[i] == 1)
+                price = market.estimate_iso_ne_price(load, ts.hour, is_we)
+                
+                final_results.append({
+                    "hour_offset": i,
+                    "timestamp": ts.isoformat(),
+                    "predicted_load": load,
+                    "xgb_load": float(preds["xgb_base"][i]),
+                    "dl_residual": float(preds["residual_correction"][i]),
+                    "weather_code": int(weather_codes[i]),
+                    "price": price,
+                    "solar_mw": float(solar_mw[i]),
+                    "wind_mw": float(wind_mw[i]),
+                    "net_load": float(load - solar_mw[i] - wind_mw[i])
+                })
+                if quantiles:
+                    for q in config.FORECAST_QUANTILES:
+                        key = f"p{round(q * 100)}"
+                        final_results[-1][key] = float(preds[key][i])
+            
+        with telemetry.stage("db_write"):
+            db.save_forecast_results(req_id, final_results)
         
-        # 7. Contextual data
-        ground_truth = history_df[
-            (history_df['Timestamp'] >= req_start) & 
-            (history_df['Timestamp'] < req_start + timedelta(hours=168))
-        ].copy()
-        if not ground_truth.empty:
-            ground_truth['Timestamp'] = ground_truth['Timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
-            gt_data = ground_truth[['Timestamp', 'load']].to_dict(orient='records')
+        with telemetry.stage("serialization"):
+            # 7. Contextual data
+            ground_truth = history_df[
+                (history_df['Timestamp'] >= req_start) & 
+                (history_df['Timestamp'] < req_start + timedelta(hours=168))
+            ].copy()
+            if not ground_truth.empty:
+                ground_truth['Timestamp'] = ground_truth['Timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+                gt_data = ground_truth[['Timestamp', 'load']].to_dict(orient='records')
+            else:
+                gt_data = []
+
+            prev_week = history_window[['Timestamp', 'load']].copy()
+            prev_week['Timestamp'] = prev_week['Timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+            
+            # 8. Summary & Alerts
+            peak_load = max(preds["prediction"])
+            avg_xgb = float(np.mean(preds["xgb_base"]))
+            alerts, exceedance = peak_alerts(peak_load, preds.get("samples"))
+
+            # Season logic
+            m = req_start.month
+            if m in [12, 1, 2]: season = "Winter"
+            elif m in [3, 4, 5]: season = "Spring"
+            elif m in [6, 7, 8]: season = "Summer"
+            else: season = "Autumn"
+
+            return jsonify({
+                "request_id": req_id,
+                "zone": zm.zone,
+                "forecast": final_results,
+                "ground_truth": gt_data,
+                "previous_week": prev_week.to_dict(orient='records'),
+                "summary": {
+                    "peak_load": float(peak_load),
+                    "peak_time": final_results[preds["prediction"].index(peak_load)]["timestamp"],
+                    "avg_load": float(np.mean(preds["prediction"])),
+                    "xgb_avg": avg_xgb,
+                    "avg_price": float(np.mean([f['price'] for f in final_results])),
+                    "renewable_mw": float(np.mean(solar_mw + wind_mw)),
+                    "is_holiday": bool(future_df['Holiday'].iloc[0]),
+                    "season": season,
+                    "alerts": alerts,
+                    "peak_exceedance": exceedance,
+                    "temp_offset": temp_offset
+                }
+            })
+    except inference_pool.InferenceBusy as e:
+        db.update_request_error(req_id, str(e))
+        return busy_response(e)
+    except Exception as e:
+        telemetry.inc("voltcast_errors_total", endpoint="forecast")
+        db.update_request_error(req_id, str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/scenarios', methods=['POST'])
+def run_scenarios():
+    """
+    What-if sweep: one weather fetch, all scenarios scored in one batch.
+    Body: {"start_date": "YYYY-mm-dd HH:MM", "offsets": [-4, -2, 0, 2, 4],
+           "city_offsets": {"Boston": 1.5}}          # shared per-city shock
+      or {"start_date": ..., "scenarios": [{"temp_offset": 2, "city_offsets": {...}}, ...]}
+    Optional "zone" (default system).
+    """
+    data = request.get_json() or {}
+    if 'start_date' not in data:
+        return jsonify({"error": "Missing start_date"}), 400
+    try:
+        req_start = datetime.strptime(data['start_date'], "%Y-%m-%d %H:%M")
+        if 'scenarios' in data:
+            scenarios = [{"temp_offset": float(sc.get('temp_offset', 0)),
+                          "city_offsets": {c: float(v) for c, v in (sc.get('city_offsets') or {}).items()}}
+                         for sc in data['scenarios']]
         else:
-            gt_data = []
+            shared = {c: float(v) for c, v in (data.get('city_offsets') or {}).items()}
+            scenarios = [{"temp_offset": float(o), "city_offsets": shared}
+                         for o in data.get('offsets', [0])]
+        unknown = {c for sc in scenarios for c in sc["city_offsets"]} - set(config.WEATHER_CITIES)
+        if unknown:
+            raise ValueError(f"Unknown cities: {sorted(unknown)}")
+        if not 0 < len(scenarios) <= config.MAX_SCENARIOS:
+            raise ValueError(f"Between 1 and {config.MAX_SCENARIOS} scenarios allowed")
+        zone = request_zone(data)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
-        prev_week = history_window[['Timestamp', 'load']].copy()
-        prev_week['Timestamp'] = prev_week['Timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
-        
-        # 8. Summary & Alerts
-        peak_load = max(preds["prediction"])
-        avg_xgb = float(np.mean(preds["xgb_base"]))
-        alerts = []
-        if float(peak_load) > 21000.0:
-            alerts.append({"type": "CRITICAL", "message": f"Peak Demand Alert: {peak_load:,.0f} MW predicted."})
-        elif float(peak_load) > 18500.0:
-            alerts.append({"type": "WARNING", "message": "High usage period detected."})
+    try:
+        with zones.pool.use(zone) as zm:
+            history_df = zm.history.get()
+            with telemetry.stage("history_window"):
+                history_window, _, req_start = resolve_window(history_df, req_start)
+            zm.manager.load()
+
+            base_weather = weather.fetch_weather_forecast(req_start, hours=168)
+            with telemetry.stage("features"):
+                input_cols = zm.manager.config['FEATURE_COLS']
+                windows = features.prepare_scenario_windows(
+                    history_window,
+                    [base_weather.with_temp_offset(sc["temp_offset"], sc["city_offsets"]) for sc in scenarios],
+                    input_cols)
+            preds = zm.manager.predict_batch(windows)
+
+            with telemetry.stage("serialization"):
+                timestamps = [(req_start + timedelta(hours=i)).isoformat() for i in range(168)]
+                pred = preds["prediction"]
+                peak_idx = pred.argmax(axis=1)
+                results = []
+                for k, sc in enumerate(scenarios):
+                    results.append({
+                        "temp_offset": sc["temp_offset"],
+                        "city_offsets": sc["city_offsets"],
+                        "forecast": pred[k].tolist(),
+                        "xgb_base": preds["xgb_base"][k].tolist(),
+                        "peak_load": float(pred[k, peak_idx[k]]),
+                        "peak_time": timestamps[peak_idx[k]],
+                        "avg_load": float(pred[k].mean()),
+                        "min_load": float(pred[k].min()),
+                        "energy_mwh": float(pred[k].sum()),
+                    })
+                return jsonify({
+                    "zone": zm.zone,
+                    "start": req_start.isoformat(),
+                    "timestamps": timestamps,
+                    "scenarios": results
+                })
+    except inference_pool.InferenceBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        telemetry.inc("voltcast_errors_total", endpoint="scenarios")
+        return jsonify({"error": str(e)}), 500
 
-        # Season logic
-        m = req_start.month
-        if m in [12, 1, 2]: season = "Winter"
-        elif m in [3, 4, 5]: season = "Spring"
-        elif m in [6, 7, 8]: season = "Summer"
-        else: season = "Autumn"
 
-        return jsonify({
-            "request_id": req_id,
-            "forecast": final_results,
-            "ground_truth": gt_data,
-            "previous_week": prev_week.to_dict(orient='records'),
-            "summary": {
+@app.route('/api/forecast/zones', methods=['POST'])
+def run_zone_forecasts():
+    """
+    Score several load zones in one call (zones load and evict through the pool).
+    Body: {"start_date": "YYYY-mm-dd HH:MM", "temp_offset": 0, "zones": ["ME", "NH"]}
+    (default: every zone with artifacts and history, see ModelPool.available_zones)
+    Each zone's forecast is stored like /api/forecast; per-zone failures are under "errors".
+    """
+    data = request.get_json() or {}
+    if 'start_date' not in data:
+        return jsonify({"error": "Missing start_date"}), 400
+    try:
+        req_start = datetime.strptime(data['start_date'], "%Y-%m-%d %H:%M")
+        temp_offset = float(data.get('temp_offset', 0))
+        requested = data.get('zones') or zones.pool.available_zones()
+        for zone in requested:
+            if zone not in zones.pool.zones:
+                raise zones.UnknownZone(zone)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    results, errors = {}, {}
+    weather_by_start = {}  # zones usually resolve to the same window: fetch weather once
+    for zone in dict.fromkeys(requested):
+        req_id = None
+        try:
+            with zones.pool.use(zone) as zm:
+                history_df = zm.history.get()
+                with telemetry.stage("history_window"):
+                    history_window, input_start, start = resolve_window(history_df, req_start)
+                with telemetry.stage("db_write"):
+                    req_id = db.save_forecast_request(
+                        start.isoformat(), (start + timedelta(hours=167)).isoformat(),
+                        input_start.isoformat(), start.isoformat(), zone=zone)
+                if start not in weather_by_start:
+                    forecast = weather.fetch_weather_forecast(start, hours=168)
+                    if temp_offset != 0:
+                        forecast = forecast.with_temp_offset(temp_offset)
+                    weather_by_start[start] = forecast
+                with telemetry.stage("features"):
+                    future_df = features.prepare_inference_data(
+                        history_window, weather_by_start[start], zm.manager.config['FEATURE_COLS'])
+                preds = zm.manager.predict(future_df)
+
+            timestamps = [(start + timedelta(hours=i)).isoformat() for i in range(168)]
+            with telemetry.stage("db_write"):
+                db.save_forecast_results(req_id, [{
+                    "hour_offset": i,
+                    "timestamp": timestamps[i],
+                    "predicted_load": float(preds["prediction"][i]),
+                    "xgb_load": float(preds["xgb_base"][i]),
+                    "dl_residual": float(preds["residual_correction"][i]),
+                } for i in range(168)])
+            peak_load = max(preds["prediction"])
+            results[zone] = {
+                "request_id": req_id,
+                "start": start.isoformat(),
+                "forecast": [float(p) for p in preds["prediction"]],
+                "xgb_base": [float(p) for p in preds["xgb_base"]],
                 "peak_load": float(peak_load),
-                "peak_time": final_results[preds["prediction"].index(peak_load)]["timestamp"],
+                "peak_time": timestamps[preds["prediction"].index(peak_load)],
                 "avg_load": float(np.mean(preds["prediction"])),
-                "xgb_avg": avg_xgb,
-                "avg_price": float(np.mean([f['price'] for f in final_results])),
-                "renewable_mw": float(np.mean(solar_mw + wind_mw)),
-                "is_holiday": bool(future_df['Holiday'].iloc[0]),
-                "season": season,
-                "alerts": alerts,
-                "temp_offset": temp_offset
             }
-        })
-    except Exception as e:
-        db.update_request_error(req_id, str(e))
-        return jsonify({"error": str(e)}), 500
+        except Exception as e:
+            telemetry.inc("voltcast_errors_total", endpoint="forecast_zones")
+            if req_id is not None:
+                db.update_request_error(req_id, str(e))
+            errors[zone] = str(e)
+
+    status = 200 if results or not errors else 500
+    return jsonify({"zones": results, "errors": errors}), status
 
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Get all past forecast requests."""
-    return jsonify(db.get_all_requests())
+    """Get all past forecast requests (?zone= to filter)."""
+    return jsonify(db.get_all_requests(request.args.get('zone')))
 
 
 @app.route('/api/history/<int:request_id>', methods=['GET'])
 def get_history_detail(request_id):
-    """Get specific forecast with its data points."""
-    data = db.get_request_with_results(request_id)
-    if not data:
-        return jsonify({"error": "Request not found"}), 404
-    return jsonify(data)
-
+    """Get specific forecast with its data points (cached once the request has finished)."""
+    key = ("history", request_id)
+    entry = response_cache.cache.get(key)
+    if entry is None:
+        data = db.get_request_with_results(request_id)
+        if not data:
+            return jsonify({"error": "Request not found"}), 404
+        if data["request"]["status"] == "processing":
+            return jsonify(data)
+        # Completed/failed requests never change again (until deleted)
+        entry = response_cache.CachedResponse(data)
+        response_cache.cache.put(key, entry)
+    return response_cache.respond(entry)
+
+
+def forget_history(request_ids):
+    """Drop cached detail responses of deleted requests (retention passes)."""
+    for request_id in request_ids:
+        response_cache.cache.invalidate(("history", request_id))
 
 @app.route('/api/history/<int:request_id>', methods=['DELETE'])
 def delete_history_entry(request_id):
     """Delete a specific forecast request."""
     try:
         db.delete_request(request_id)
+        response_cache.cache.invalidate(("history", request_id))
         return jsonify({"status": "deleted"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/rollups', methods=['GET'])
+def get_rollups():
+    """
+    Daily rollups of forecasts past the full-resolution retention window.
+    Query: zone (default system), start / end ('YYYY-mm-dd', end exclusive, both optional)
+    """
+    try:
+        zone = request_zone()
+    except zones.UnknownZone as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "zone": zone,
+        "full_days": retention.policy.full_days,
+        "days": db.get_daily_rollups(zone, request.args.get('start'), request.args.get('end'))
+    })
+
+
+def export_response(columns, batches, name):
+    """
+    Stream rows as ?format=ndjson|csv. With ?gzip=1 the body is a .gz file
+    (application/gzip, no Content-Encoding): clients that decode
+    Content-Encoding would otherwise save plain text under a .gz name.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    body = export.encode(columns, batches, fmt)
+    filename, mimetype = f"{name}.{fmt}", export.FORMATS[fmt]
+    if request.args.get('gzip') == '1':
+        body = export.gzip_stream(body)
+        filename, mimetype = filename + ".gz", "application/gzip"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+def _export_args():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        raise ValueError(f"format must be one of {sorted(export.FORMATS)}")
+    return export.parse_range(request.args.get('start'), request.args.get('end'))
+
+
+@app.route('/api/export/forecasts', methods=['GET'])
+def export_forecasts():
+    """
+    Stored forecast points of completed requests, streamed.
+    Query: start / end ('YYYY-mm-dd[ HH:MM]', end exclusive, both optional),
+           zone (default all zones), format=ndjson|csv, gzip=1
+    """
+    try:
+        start, end = _export_args()
+        zone = request_zone() if request.args.get('zone') else None
+        columns, batches = export.forecast_rows(start, end, zone)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return export_response(columns, batches, "forecasts")
+
+
+@app.route('/api/export/history', methods=['GET'])
+def export_history():
+    """
+    Historical load/weather rows from the preprocessed CSV, streamed.
+    Query: start / end as above, columns=load,Temp_Boston,... (default all),
+           zone (default system), format=ndjson|csv, gzip=1
+    """
+    try:
+        start, end = _export_args()
+        columns = [c for c in request.args.get('columns', '').split(',') if c]
+        zone = request_zone()
+        path = zones.history_csv(zone)
+        if not os.path.exists(path):
+            return no_history_response(zone)
+        columns, batches = export.history_rows(start, end, columns or None, path)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return export_response(columns, batches, "history")
+
+
+def _series_payload(ts, values, points, method):
+    """Downsampled columnar {"t": [...], "v": [...]} plus the raw point count."""
+    with telemetry.stage("downsample"):
+        keep = downsample.downsample(ts.astype(np.int64), values, points, method)
+    return {
+        "t": np.datetime_as_string(ts[keep], unit='s').tolist(),
+        "v": np.round(values[keep], 2).tolist(),
+        "raw_points": len(values),
+    }
+
+
+@app.route('/api/series', methods=['GET'])
+def get_series():
+    """
+    Actual load, stored forecasts and forecast errors over a range, downsampled for charts.
+    Query: start / end ('YYYY-mm-dd[ HH:MM]', end exclusive; default the last
+           SERIES_DEFAULT_DAYS days of history), points (per series), method=lttb|minmax,
+           zone (default system)
+    Each series is columnar: {"t": [iso timestamps], "v": [values], "raw_points": n}.
+    Forecasts are the most recent completed request covering each hour.
+    """
+    try:
+        zone = request_zone()
+        start, end = export.parse_range(request.args.get('start'), request.args.get('end'))
+        points = min(max(int(request.args.get('points', config.SERIES_DEFAULT_POINTS)), 10),
+                     config.SERIES_MAX_POINTS)
+        method = request.args.get('method', 'lttb')
+        if method not in downsample.METHODS:
+            raise ValueError(f"method must be one of {list(downsample.METHODS)}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not os.path.exists(zones.history_csv(zone)):
+        return no_history_response(zone)
+
+    try:
+        with telemetry.stage("series_query"):
+            ts, load = zones.pool.get(zone).history.column('load')
+            end = np.datetime64(end, 's') if end else ts[-1] + np.timedelta64(1, 'h')
+            start = np.datetime64(start, 's') if start else end - np.timedelta64(config.SERIES_DEFAULT_DAYS, 'D')
+            lo, hi = np.searchsorted(ts, [start, end])
+            ts, load = ts[lo:hi], load[lo:hi]
+            valid = ~np.isnan(load)
+            ts, load = ts[valid], load[valid]
+
+            rows = db.get_latest_forecasts(str(start), str(end), zone)
+            f_ts = np.array([r[0] for r in rows], dtype='datetime64[s]')
+            f_pred = np.array([r[1] for r in rows], dtype=np.float64)
+            f_xgb = np.array([np.nan if r[2] is None else r[2] for r in rows], dtype=np.float64)
+
+            # Errors where a forecast hour has an actual
+            pos = np.minimum(np.searchsorted(ts, f_ts), max(len(ts) - 1, 0))
+            matched = (ts[pos] == f_ts) if len(ts) else np.zeros(len(f_ts), dtype=bool)
+            e_ts = f_ts[matched]
+            err = f_pred[matched] - load[pos[matched]]
+            actual_matched = load[pos[matched]]
+
+        metrics = None
+        if len(err):
+            nonzero = actual_matched != 0  # MAPE is undefined where the actual is 0
+            metrics = {
+                "n": int(len(err)),
+                "mae": float(np.mean(np.abs(err))),
+                "rmse": float(np.sqrt(np.mean(err ** 2))),
+                "mape": float(np.mean(np.abs(err[nonzero] / actual_matched[nonzero]))) * 100 if nonzero.any() else None,
+                "bias": float(np.mean(err)),
+            }
+
+        xgb_ok = ~np.isnan(f_xgb)
+        return jsonify({
+            "zone": zone,
+            "start": str(start),
+            "end": str(end),
+            "method": method,
+            "points": points,
+            "actual": _series_payload(ts, load, points, method),
+            "forecast": _series_payload(f_ts, f_pred, points, method),
+            "xgb": _series_payload(f_ts[xgb_ok], f_xgb[xgb_ok], points, method),
+            "error": _series_payload(e_ts, err, points, method),
+            "metrics": metrics,
+        })
+    except FileNotFoundError:
+        return no_history_response(zone)
+    except Exception as e:
+        telemetry.inc("voltcast_errors_total", endpoint="series")
+        return jsonify({"error": str(e)}), 500
+
+
+def metrics_file_response(name):
+    """Serve a training metrics JSON file, parsed and serialized once per file version."""
+    path = os.path.join(MODEL_DIR, "v4", name)
+    st = os.stat(path)
+
+    def build():
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    entry = response_cache.cache.get(("file", path), version=(st.st_mtime_ns, st.st_size), build=build)
+    return response_cache.respond(entry)
+
+
 @app.route('/api/models', methods=['GET'])
 def get_model_comparison():
     """Return model comparison metrics from training (JSON)."""
     try:
-        path = os.path.join(MODEL_DIR, "v4", "all_model_comparison_v4.json")
-        with open(path, 'r') as f:
-            return jsonify(json.load(f))
+        return metrics_file_response("all_model_comparison_v4.json")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -250,32 +708,34 @@ def get_model_comparison():
 def get_evaluation():
     """Return detailed V4 metrics."""
     try:
-        path = os.path.join(MODEL_DIR, "v4", "dl_metrics_v4.json")
-        with open(path, 'r') as f:
-            return jsonify(json.load(f))
+        return metrics_file_response("dl_metrics_v4.json")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/live-evaluation', methods=['GET'])
 def get_live_evaluation():
-    """Evaluate stored forecasts against real historic loads."""
-    all_requests = db.get_all_requests()
+    """Evaluate stored forecasts against real historic loads (?zone=, default system)."""
+    try:
+        zone = request_zone()
+    except zones.UnknownZone as e:
+        return jsonify({"error": str(e)}), 400
+    all_requests = db.get_all_requests(zone)
     results = []
     
     # We'll calculate performance of the latest 10 requests that have ground truth
     combined_actuals = []
     combined_preds = []
-    history_df = get_history_data()
+    hist_ts, hist_load = zones.pool.get(zone).history.column('load')
     
     for req in all_requests[:10]:
         details = db.get_request_with_results(req['id'])
         for r in details['results']:
-            ts = pd.to_datetime(r['timestamp'])
-            # Match with history_df
-            actual = history_df[history_df['Timestamp'] == ts]
-            if not actual.empty:
-                combined_actuals.append(actual['load'].values[0])
+            ts = np.datetime64(r['timestamp'], 's')
+            # Match with the zone's history
+            i = np.searchsorted(hist_ts, ts)
+            if i < len(hist_ts) and hist_ts[i] == ts and not np.isnan(hist_load[i]):
+                combined_actuals.append(hist_load[i])
                 combined_preds.append(r['predicted_load'])
     
     if not combined_actuals:
@@ -298,11 +758,56 @@ def get_live_evaluation():
     })
 
 
+def profiles_guard():
+    """404 while profiling is off, 403 without the profiling token, else None."""
+    if not profiling.enabled():
+        return jsonify({"error": "Profiling is disabled"}), 404
+    if not profiling.authorized(profile_token()):
+        return jsonify({"error": "Profiling not authorized"}), 403
+    return None
+
+@app.route('/api/profiles', methods=['GET'])
+def get_profiles():
+    """Stored request profiles, newest first."""
+    return profiles_guard() or jsonify(profiling.list_profiles())
+
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Metadata of one profile (duration, memory summary, artifact files)."""
+    denied = profiles_guard()
+    if denied:
+        return denied
+    meta = profiling.load_meta(profile_id)
+    if meta is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(meta)
+
+
+@app.route('/api/profiles/<profile_id>/<name>', methods=['GET'])
+def download_profile_artifact(profile_id, name):
+    """Download one artifact: cpu.pstats, cpu.txt, speedscope.json or mem.json."""
+    denied = profiles_guard()
+    if denied:
+        return denied
+    path = profiling.artifact_path(profile_id, name)
+    if path is None:
+        return jsonify({"error": "Artifact not found"}), 404
+    return send_file(path, as_attachment=True, download_name=f"{profile_id}-{name}")
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint (stage latencies, cache hits, fallbacks, errors)."""
+    return Response(telemetry.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     global is_loading
     try:
-        if model_manager.loaded:
+        system = zones.pool.get(DEFAULT_ZONE)
+        if zones.pool.loaded_zones():
             ready = True
         elif not is_loading:
             from threading import Thread
@@ -310,8 +815,8 @@ def health_check():
                 global is_loading
                 is_loading = True
                 try:
-                    get_history_data()
-                    model_manager.load()
+                    with zones.pool.use(DEFAULT_ZONE):
+                        pass
                 finally:
                     is_loading = False
             
@@ -319,11 +824,28 @@ def health_check():
             ready = False
         else:
             ready = False
+
+        # Periodic memory re-plan (shrink under pressure, grow when room frees up)
+        if ready and resources.governor.due():
+            from threading import Thread
+            Thread(target=resources.governor.run_exclusive, args=(zones.pool.rebalance,), daemon=True).start()
+
+        # Periodic retention pass (archive, roll up and delete old forecasts, incremental vacuum)
+        if retention.policy.due():
+            from threading import Thread
+            Thread(target=retention.policy.run_exclusive, args=(forget_history,), daemon=True).start()
             
         return jsonify({
             "status": "healthy", 
             "model_ready": ready,
-            "warming_up": not ready
+            "warming_up": not ready,
+            "ensemble_members": len(system.manager.dl_ensemble),
+            "history_rows": 0 if system.history.df is None else len(system.history.df),
+            "zones": zones.pool.status(),
+            "memory": resources.governor.status(),
+            "inference": inference_pool.pool.status(),
+            "response_cache": response_cache.cache.stats(),
+            "retention": retention.policy.status()
         })
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -0,0 +1,378 @@
+"""
+Model artifact manager.
+Published artifacts are described by a manifest (file -> sha256, size). Missing
+or stale files are fetched in parallel into a content-addressed cache with
+atomic renames, and every file is hash-verified before it is loaded. Sources
+that predate manifests are still fetched by file name, unverified.
+
+    python artifacts.py publish <dir> [zone]   # stage artifacts + manifest.json for upload/serving
+    python artifacts.py sync [zone]            # fetch/verify into the cache (e.g. at image build)
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from config import (MODEL_DIR, DEFAULT_ZONE, ZONE_MODEL_ROOT, CONFIG_PATH, FEATURE_SCALER_PATH, TARGET_SCALER_PATH, XGB_MODEL_PATH, XGB_FOREST_PATH,
+                    DL_MODEL_PATHS, ARTIFACT_SOURCE, ARTIFACT_CACHE_DIR, ARTIFACT_FETCH_WORKERS, ARTIFACT_TIMEOUT_S)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+CHUNK = 1 << 20
+
+# Published file names (as on the Hub) and their local default paths
+CONFIG_FILE = "config.joblib"
+FEATURE_SCALER_FILE = "feature_scaler.joblib"
+TARGET_SCALER_FILE = "target_scaler.joblib"
+XGB_FILE = "xgb_v4.joblib"
+FOREST_FILE = "xgb_v4_forest.npz"  # optional: packed trees for tree_predictor.py
+DL_FILES = [f"residual_ensemble_seed_{i}.pth" for i in range(len(DL_MODEL_PATHS))]
+OPTIONAL_FILES = {FOREST_FILE}
+
+LOCAL_PATHS = {
+    CONFIG_FILE: CONFIG_PATH,
+    FEATURE_SCALER_FILE: FEATURE_SCALER_PATH,
+    TARGET_SCALER_FILE: TARGET_SCALER_PATH,
+    XGB_FILE: XGB_MODEL_PATH,
+    FOREST_FILE: XGB_FOREST_PATH,
+    **dict(zip(DL_FILES, DL_MODEL_PATHS)),
+}
+
+
+def local_paths(model_dir=None):
+    """Published name -> local path, with the default layout re-rooted at model_dir (zones)."""
+    if model_dir is None:
+        return dict(LOCAL_PATHS)
+    return {name: os.path.join(model_dir, os.path.relpath(path, MODEL_DIR)) for name, path in LOCAL_PATHS.items()}
+
+
+def zone_model_dir(zone):
+    return MODEL_DIR if zone == DEFAULT_ZONE else os.path.join(ZONE_MODEL_ROOT, zone)
+
+
+def zone_prefix(zone):
+    """Where a zone's files live in the artifact source (and on the Hub)."""
+    return "" if zone == DEFAULT_ZONE else f"zones/{zone}/"
+
+
+class ArtifactError(Exception):
+    """An artifact could not be fetched or failed verification."""
+
+
+# ── Hashing & manifests ────────────────────────────────────────────────
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def verify(path, entry):
+    """True if the file at `path` matches a manifest entry (size first, then sha256)."""
+    try:
+        if os.path.getsize(path) != entry["size"]:
+            return False
+    except OSError:
+        return False
+    return sha256_file(path) == entry["sha256"]
+
+
+def build_manifest(files=None):
+    """Manifest for {published name: local path} (default: all local artifacts that exist)."""
+    files = files or {name: path for name, path in LOCAL_PATHS.items() if os.path.exists(path)}
+    return {
+        "version": MANIFEST_VERSION,
+        "files": {
+            name: {"sha256": sha256_file(path), "size": os.path.getsize(path)}
+            for name, path in sorted(files.items())
+        },
+    }
+
+
+def publish(dest_dir, files=None):
+    """
+    Copy artifacts under their published names into dest_dir and write
+    manifest.json last. The result can be uploaded to the Hub or served as a
+    local/HTTP ARTIFACT_SOURCE.
+    """
+    files = files or {name: path for name, path in LOCAL_PATHS.items() if os.path.exists(path)}
+    os.makedirs(dest_dir, exist_ok=True)
+    for name, path in files.items():
+        shutil.copyfile(path, os.path.join(dest_dir, name))
+    manifest = build_manifest(files)
+    _atomic_write_json(os.path.join(dest_dir, MANIFEST_NAME), manifest)
+    return manifest
+
+
+def _atomic_write_json(path, obj):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(obj, f, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# ── Sources ────────────────────────────────────────────────────────────
+
+def _source_base(source):
+    """("http", base_url) or ("dir", path) for an ARTIFACT_SOURCE string."""
+    if source.startswith("hf://"):
+        endpoint = os.environ.get("HF_ENDPOINT", "https://huggingface.co").rstrip("/")
+        return "http", f"{endpoint}/{source[len('hf://'):].strip('/')}/resolve/main/"
+    if source.startswith(("http://", "https://")):
+        return "http", source.rstrip("/") + "/"
+    if source.startswith("file://"):
+        return "dir", source[len("file://"):]
+    return "dir", source
+
+
+def _open_chunks(source, name):
+    """Iterate over the bytes of one published file (name may include a zones/<zone>/ prefix)."""
+    kind, base = _source_base(source)
+    if kind == "dir":
+        with open(os.path.join(base, name), "rb") as f:
+            yield from iter(lambda: f.read(CHUNK), b"")
+        return
+    headers = {}
+    token = os.environ.get("HF_TOKEN")
+    if token and source.startswith("hf://"):
+        headers["Authorization"] = f"Bearer {token}"
+    with requests.get(base + name, headers=headers, stream=True, timeout=ARTIFACT_TIMEOUT_S) as resp:
+        resp.raise_for_status()
+        yield from resp.iter_content(CHUNK)
+
+
+# ── Store ──────────────────────────────────────────────────────────────
+
+class ArtifactStore:
+    """
+    Resolves published file names to verified local paths. A zone store reads
+    <prefix>manifest.json and <prefix><name> from the same source and keeps
+    its own cache dir (pruning is per manifest).
+    """
+    def __init__(self, source=ARTIFACT_SOURCE, cache_dir=ARTIFACT_CACHE_DIR, local=None, prefix=""):
+        self.source = source
+        self.cache_dir = cache_dir
+        self.local = local or dict(LOCAL_PATHS)
+        self.prefix = prefix
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.manifest = None
+        self.paths = None
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256)
+
+    def _cached_manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_NAME)
+
+    def fetch_manifest(self):
+        """Remote manifest, else the last one synced into the cache, else None."""
+        try:
+            manifest = json.loads(b"".join(_open_chunks(self.source, self.prefix + MANIFEST_NAME)))
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ArtifactError(f"unsupported manifest version {manifest.get('version')}")
+            return manifest
+        except Exception as e:
+            print(f"⚠️ Artifact manifest unavailable from {self.source}/{self.prefix}: {e}")
+        try:
+            with open(self._cached_manifest_path()) as f:
+                print("📦 Using the last synced artifact manifest.")
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _download(self, name, entry):
+        """Stream one file into the cache, verify it, then rename it into place."""
+        os.makedirs(self.blob_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.blob_dir, prefix=".tmp-")
+        h, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in _open_chunks(self.source, self.prefix + name):
+                    f.write(chunk)
+                    h.update(chunk)
+                    size += len(chunk)
+            if size != entry["size"] or h.hexdigest() != entry["sha256"]:
+                raise ArtifactError(f"{name}: checksum mismatch (got {size} bytes, sha256 {h.hexdigest()[:12]})")
+            os.replace(tmp, self.blob_path(entry["sha256"]))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        print(f"  📥 {name} ({size / 1e6:.1f} MB)")
+        return self.blob_path(entry["sha256"])
+
+    def _try_download(self, name, entry):
+        try:
+            return self._download(name, entry)
+        except Exception as e:
+            print(f"⚠️ {name}: download failed: {e}")
+            return None
+
+    def _download_unverified(self, name):
+        """Fetch one file by its published name straight to its local path (sources without a manifest)."""
+        dest = self.local[name]
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in _open_chunks(self.source, self.prefix + name):
+                    f.write(chunk)
+            os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        print(f"  📥 {name} (unverified)")
+        return dest
+
+    def _sync_unversioned(self):
+        """
+        Source without a manifest (e.g. a Hub repo published before manifests):
+        fetch the known file names that are missing locally, unverified.
+        """
+        missing = [name for name, path in self.local.items() if not os.path.exists(path)]
+        if not missing:
+            print("ℹ️ No artifact manifest. Using local copies (unverified).")
+            return dict(self.local)
+        print(f"📦 No artifact manifest. Fetching {len(missing)} artifact(s) by name from {self.source}...")
+        failed = []
+        for name in missing:
+            try:
+                self._download_unverified(name)
+            except Exception as e:
+                if name not in OPTIONAL_FILES:
+                    print(f"⚠️ {name}: download failed: {e}")
+                    failed.append(name)
+        if failed:
+            raise ArtifactError(f"{', '.join(failed)} could not be fetched from {self.source}/{self.prefix}, "
+                                f"which has no {MANIFEST_NAME}. Publish the model set with "
+                                f"`python artifacts.py publish <dir>` and upload it to enable verified sync.")
+        return dict(self.local)
+
+    def sync(self):
+        """
+        Make every manifest file available locally and verified.
+        Returns {published name: path}. Without a source, the local default
+        paths are returned unverified (local development); a source without a
+        manifest is fetched by file name, unverified.
+        Raises ArtifactError when a listed file can neither be fetched nor
+        verified locally.
+        """
+        with self._lock:
+            if self.paths is not None:
+                return self.paths
+            manifest = self.fetch_manifest() if self.source else None
+            if manifest is None:
+                if self.source:
+                    self.paths = self._sync_unversioned()
+                else:
+                    print("ℹ️ No artifact manifest. Using local paths.")
+                    self.paths = dict(self.local)
+                return self.paths
+
+            paths, missing = {}, []
+            for name, entry in manifest["files"].items():
+                blob, local = self.blob_path(entry["sha256"]), self.local.get(name)
+                if verify(blob, entry):
+                    paths[name] = blob
+                elif local and verify(local, entry):
+                    paths[name] = local
+                else:
+                    missing.append(name)
+            for name, local in self.local.items():  # not published (yet): local copy as-is
+                if name not in manifest["files"] and os.path.exists(local):
+                    paths[name] = local
+
+            if missing:
+                print(f"📦 Fetching {len(missing)} artifact(s) from {self.source}...")
+                with ThreadPoolExecutor(max_workers=ARTIFACT_FETCH_WORKERS) as pool:
+                    results = list(pool.map(lambda n: self._try_download(n, manifest["files"][n]), missing))
+                failed = [name for name, path in zip(missing, results) if path is None]
+                if failed:
+                    # A local copy that failed verification may be partial or stale: never load it.
+                    raise ArtifactError(f"{', '.join(failed)} could not be fetched and "
+                                        f"no local copy matches the manifest")
+                paths.update(zip(missing, results))
+                print("✨ Artifacts synchronized.")
+            else:
+                print("🚀 All artifacts verified (no download needed).")
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _atomic_write_json(self._cached_manifest_path(), manifest)
+            self._prune(manifest)
+            self.manifest, self.paths = manifest, paths
+            return paths
+
+    def _prune(self, manifest):
+        """Drop cached blobs the current manifest no longer references."""
+        keep = {entry["sha256"] for entry in manifest["files"].values()}
+        for fname in os.listdir(self.blob_dir) if os.path.isdir(self.blob_dir) else []:
+            if fname not in keep and not fname.startswith(".tmp-"):
+                os.remove(os.path.join(self.blob_dir, fname))
+
+    def path(self, name):
+        return self.sync()[name]
+
+    def sha256(self, name):
+        """sha256 of a synced file: from the manifest when it lists it, else hashed from disk."""
+        paths = self.sync()
+        if self.manifest and name in self.manifest["files"]:
+            return self.manifest["files"][name]["sha256"]
+        return sha256_file(paths[name])
+
+    def size(self, name):
+        """Size in bytes of a published file, from the manifest when known (no download)."""
+        manifest = self.manifest
+        if manifest is None:
+            try:
+                with open(self._cached_manifest_path()) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = None
+        if manifest and name in manifest["files"]:
+            return manifest["files"][name]["size"]
+        try:
+            return os.path.getsize((self.paths or self.local)[name])
+        except (OSError, KeyError):
+            return 0
+
+
+def zone_store(zone):
+    """Artifact store of one load zone (the singleton for DEFAULT_ZONE)."""
+    if zone == DEFAULT_ZONE:
+        return store
+    model_dir = zone_model_dir(zone)
+    return ArtifactStore(cache_dir=os.path.join(model_dir, "cache"), local=local_paths(model_dir),
+                         prefix=zone_prefix(zone))
+
+
+# Singleton instance
+store = ArtifactStore()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "publish":
+        zone = sys.argv[3] if len(sys.argv) == 4 else DEFAULT_ZONE
+        files = {name: path for name, path in local_paths(zone_model_dir(zone)).items() if os.path.exists(path)}
+        dest = os.path.join(sys.argv[2], zone_prefix(zone))
+        m = publish(dest, files)
+        print(f"✅ Published {len(m['files'])} artifacts to {dest}")
+    elif len(sys.argv) in (2, 3) and sys.argv[1] == "sync":
+        zone = sys.argv[2] if len(sys.argv) == 3 else DEFAULT_ZONE
+        for name, path in zone_store(zone).sync().items():
+            print(f"  {name} -> {path}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,5 @@
+"""
+Reproducible benchmark suite for the Flask backend.
+Builds synthetic artifacts, stubs Open-Meteo locally and measures each API path.
+Run from the backend directory: `python -m bench.run --help`.
+"""
@@ -0,0 +1,298 @@
+"""
+Benchmark runner.
+
+    cd backend
+    python -m bench.run --save bench_baseline.json
+    python -m bench.run --baseline bench_baseline.json   # compare after a change
+
+Measures cold start, /api/forecast (point and quantile), /api/live-forecast, a 20-offset
+/api/scenarios sweep, /api/live-evaluation,
+/api/history at 10k/100k stored requests and batched inference against
+synthetic artifacts and a local Open-Meteo stub. Reports p50/p95/p99 latency,
+throughput and peak RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from bench.weather_stub import WeatherStub
+
+FORECAST_BODY = {"start_date": "2025-07-14 00:00"}
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss / 1024.0  # ru_maxrss is KiB on Linux
+
+
+def _summarize(latencies, wall):
+    arr = np.asarray(latencies) * 1000.0
+    return {
+        "n": len(arr),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+        "throughput_rps": round(len(arr) / wall, 3) if wall > 0 else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    t_start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return _summarize(latencies, time.perf_counter() - t_start)
+
+
+def _http(client, method, url, **kwargs):
+    def call():
+        resp = getattr(client, method)(url, **kwargs)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {url} -> {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+        return resp
+    return call
+
+
+# ── Scenarios ──────────────────────────────────────────────────────────
+
+def bench_cold_start(env):
+    """Fresh interpreter: import app, then serve the first forecast."""
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-m", "bench.run", "--cold-start-child"],
+                         env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - t0
+    child = json.loads(out.stdout.strip().splitlines()[-1])
+    return {
+        "wall_s": round(wall, 3),
+        "import_s": child["import_s"],
+        "first_forecast_s": child["first_forecast_s"],
+        "peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+
+
+def _cold_start_child():
+    t0 = time.perf_counter()
+    import app
+    t1 = time.perf_counter()
+    resp = app.app.test_client().post("/api/forecast", json=FORECAST_BODY)
+    t2 = time.perf_counter()
+    if resp.status_code != 200:
+        raise SystemExit(f"cold start forecast failed: {resp.get_data(as_text=True)[:200]}")
+    print(json.dumps({"import_s": round(t1 - t0, 3), "first_forecast_s": round(t2 - t1, 3)}))
+
+
+def bench_batched_inference(batch_sizes, iterations, warmup):
+    import app
+    import features
+    import weather
+    import zones
+
+    system = zones.pool.get()
+    model_manager = system.manager
+    history_df = system.history.get()
+    window = history_df.iloc[-336:-168]
+    wx = weather.fetch_weather_forecast(datetime(2025, 12, 24), hours=168)
+    future_df = features.prepare_inference_data(window, wx, model_manager.config["FEATURE_COLS"])
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for b in batch_sizes:
+        batch = [future_df + rng.normal(0, 0.01, future_df.shape).astype(np.float32) for _ in range(b)]
+
+        def run():
+            model_manager.predict_batch(batch)
+
+        stats = _measure(run, iterations, warmup)
+        stats["windows_per_s"] = round(b * 1000.0 / stats["mean_ms"], 2)
+        results[f"batch_{b}"] = stats
+    return results
+
+
+def run_suite(args, env):
+    results = {"meta": {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "iterations": args.iterations,
+        "weather_latency_ms": args.weather_latency_ms,
+    }, "scenarios": {}}
+    scenarios = results["scenarios"]
+
+    if not args.skip_cold_start:
+        print("⏱️  cold start...")
+        scenarios["cold_start"] = bench_cold_start(env)
+
+    import app
+    import database as db
+    from bench import synthetic
+    client = app.app.test_client()
+    with app.zones.pool.use():
+        pass
+
+    print("⏱️  /api/forecast...")
+    scenarios["forecast"] = _measure(
+        _http(client, "post", "/api/forecast", json=FORECAST_BODY), args.iterations, args.warmup)
+    print("⏱️  /api/forecast (quantiles)...")
+    scenarios["forecast_quantiles"] = _measure(
+        _http(client, "post", "/api/forecast", json=dict(FORECAST_BODY, quantiles=True)),
+        args.iterations, args.warmup)
+    print("⏱️  /api/live-forecast...")
+    scenarios["live_forecast"] = _measure(
+        _http(client, "get", "/api/live-forecast"), args.iterations, args.warmup)
+    print("⏱️  /api/scenarios (20 offsets)...")
+    sweep = dict(FORECAST_BODY, offsets=[round(-5 + 0.5 * i, 1) for i in range(20)])
+    scenarios["scenarios_20"] = _measure(
+        _http(client, "post", "/api/scenarios", json=sweep), args.iterations, args.warmup)
+    print("⏱️  /api/live-evaluation...")
+    scenarios["live_evaluation"] = _measure(
+        _http(client, "get", "/api/live-evaluation"), args.iterations, args.warmup)
+
+    for target in (10_000, 100_000):
+        with db.get_db() as conn:
+            have = conn.execute("SELECT COUNT(*) FROM forecast_requests").fetchone()[0]
+            synthetic.seed_requests(conn, max(0, target - have))
+        print(f"⏱️  /api/history @ {target:,} rows...")
+        scenarios[f"history_{target // 1000}k"] = _measure(
+            _http(client, "get", "/api/history"), max(3, args.iterations // 4), 1)
+
+    print("⏱️  batched inference...")
+    scenarios["batched_inference"] = bench_batched_inference(
+        args.batch_sizes, max(3, args.iterations // 4), 1)
+    return results
+
+
+# ── Reporting ──────────────────────────────────────────────────────────
+
+def _flatten(scenarios):
+    flat = {}
+    for name, stats in scenarios.items():
+        if any(isinstance(v, dict) for v in stats.values()):
+            for sub, s in stats.items():
+                flat[f"{name}.{sub}"] = s
+        else:
+            flat[name] = stats
+    return flat
+
+
+def print_report(results):
+    print(f"\n{'scenario':<32} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'rps':>9} {'rss MB':>8}")
+    print("-" * 84)
+    for name, s in _flatten(results["scenarios"]).items():
+        if "p50_ms" in s:
+            print(f"{name:<32} {s['p50_ms']:>10.2f} {s['p95_ms']:>10.2f} {s['p99_ms']:>10.2f} "
+                  f"{s['throughput_rps']:>9.2f} {s['peak_rss_mb']:>8.1f}")
+        else:
+            print(f"{name:<32} " + ", ".join(f"{k}={v}" for k, v in s.items()))
+
+
+def compare(results, baseline, threshold):
+    """Print p50/p95 deltas against a saved baseline. Returns True on regression."""
+    cur, base = _flatten(results["scenarios"]), _flatten(baseline["scenarios"])
+    print(f"\nvs baseline {baseline['meta'].get('commit') or '?'} ({baseline['meta'].get('timestamp')})")
+    print(f"{'scenario':<32} {'metric':<18} {'base':>10} {'now':>10} {'delta':>9}")
+    print("-" * 84)
+    regressed = False
+    for name in cur:
+        if name not in base:
+            continue
+        for metric in ("p50_ms", "p95_ms", "wall_s", "peak_rss_mb"):
+            if metric not in cur[name] or metric not in base[name] or not base[name][metric]:
+                continue
+            b, c = base[name][metric], cur[name][metric]
+            delta = (c - b) / b * 100
+            flag = ""
+            if delta > threshold:
+                flag, regressed = " ❌", True
+            print(f"{name:<32} {metric:<18} {b:>10.2f} {c:>10.2f} {delta:>+8.1f}%{flag}")
+    return regressed
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# ── Entry point ────────────────────────────────────────────────────────
+
+def _prepare_workdir(args):
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="voltcast-bench-"))
+    env = {
+        "VOLTCAST_MODEL_DIR": os.path.join(workdir, "models"),
+        "VOLTCAST_DATA_DIR": os.path.join(workdir, "data"),
+        "VOLTCAST_DB_DIR": os.path.join(workdir, "database"),
+        "VOLTCAST_ARTIFACT_SOURCE": "",  # synthetic artifacts are local; never sync from the Hub
+    }
+    os.environ.update(env)
+    shutil.rmtree(env["VOLTCAST_DB_DIR"], ignore_errors=True)
+
+    marker = os.path.join(workdir, "synthetic.json")
+    spec = {"history_rows": args.history_rows, "xgb_rounds": args.xgb_rounds}
+    built = None
+    if os.path.exists(marker):
+        with open(marker) as f:
+            built = json.load(f)
+    if built != spec:
+        from bench import synthetic
+        synthetic.build_artifacts(history_rows=args.history_rows, xgb_rounds=args.xgb_rounds)
+        with open(marker, "w") as f:
+            json.dump(spec, f)
+    return workdir
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--workdir", help="Reuse synthetic artifacts from this directory")
+    p.add_argument("--iterations", type=int, default=20)
+    p.add_argument("--warmup", type=int, default=2)
+    p.add_argument("--weather-latency-ms", type=float, default=20.0)
+    p.add_argument("--history-rows", type=int, default=70080)
+    p.add_argument("--xgb-rounds", type=int, default=20)
+    p.add_argument("--batch-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32])
+    p.add_argument("--skip-cold-start", action="store_true")
+    p.add_argument("--save", help="Write results JSON here")
+    p.add_argument("--baseline", help="Compare against a saved results JSON")
+    p.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    p.add_argument("--cold-start-child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    if args.cold_start_child:
+        _cold_start_child()
+        return 0
+
+    # Environment overrides must be in place before `config` is first imported.
+    with WeatherStub(latency_ms=args.weather_latency_ms) as stub:
+        os.environ.update(stub.env)
+        workdir = _prepare_workdir(args)
+        results = run_suite(args, dict(os.environ))
+    results["meta"]["workdir"] = workdir
+
+    print_report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            return 1 if compare(results, json.load(f), args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
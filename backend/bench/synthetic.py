@@ -0,0 +1,149 @@
+"""
+Synthetic model artifacts, history CSV and database rows for benchmarking.
+Shapes and file layout match the real V4 artifacts so every code path runs.
+"""
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBRegressor
+
+import artifacts
+import config
+import features
+from model_v4 import ResidualPredictor
+from tree_predictor import PackedForest
+
+WEATHER_VARS = ["Temp", "Humidity", "Precip", "Wind", "Code", "Solar", "Wind100"]
+SIN_COS_COLS = ["Hour_sin", "Hour_cos", "Day_sin", "Day_cos", "Month_sin", "Month_cos"]
+TARGET_COL = "load"
+
+
+def build_history(rows, seed=0):
+    """Hourly history ending Dec 31 2025, same columns as preprocessed_load_data.csv."""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range(end="2025-12-31 23:00", periods=rows, freq="h")
+    hours = np.arange(rows)
+    doy = ts.dayofyear.values
+
+    cols = {"Timestamp": ts}
+    for c, city in enumerate(config.WEATHER_CITIES):
+        temp = (8.0 - 14.0 * np.cos(2 * np.pi * (doy - 15) / 365.25)
+                + 5.0 * np.sin(2 * np.pi * (ts.hour.values - 6) / 24)
+                + rng.normal(0, 1.5, rows) - c)
+        wind = np.abs(12 + rng.normal(0, 3, rows))
+        cols[f"Temp_{city}"] = temp
+        cols[f"Humidity_{city}"] = 65 + 10 * np.sin(2 * np.pi * hours / 24)
+        cols[f"Precip_{city}"] = np.clip(rng.normal(0, 0.3, rows), 0, None)
+        cols[f"Wind_{city}"] = wind
+        cols[f"Code_{city}"] = rng.choice([0, 1, 2, 3, 61], rows)
+        cols[f"Solar_{city}"] = np.clip(800 * np.sin(np.pi * (ts.hour.values - 6) / 12), 0, None)
+        cols[f"Wind100_{city}"] = wind * 1.3
+    df = pd.DataFrame(cols)
+
+    df = features.generate_time_features(df)
+    for city in config.WEATHER_CITIES:
+        df[f"CDH_{city}"] = np.maximum(0, df[f"Temp_{city}"] - config.CDH_BASE)
+        df[f"HDH_{city}"] = np.maximum(0, config.HDH_BASE - df[f"Temp_{city}"])
+
+    temp_mean = df[[f"Temp_{c}" for c in config.WEATHER_CITIES]].mean(axis=1).values
+    df[TARGET_COL] = (14500
+                      + 2500 * np.sin(2 * np.pi * (ts.hour.values - 9) / 24)
+                      - 900 * df["Weekend"].values
+                      + 90 * np.abs(temp_mean - 15)
+                      + rng.normal(0, 250, rows))
+    df["rolling_24"] = df[TARGET_COL].rolling(24, min_periods=1).mean()
+    df["rolling_168"] = df[TARGET_COL].rolling(168, min_periods=1).mean()
+    return df
+
+
+def build_config(df):
+    """Mirror scaling_sequences.ipynb: numerical + sin/cos + target-as-input."""
+    numerical = [c for c in df.columns if c not in ["Timestamp", TARGET_COL] + SIN_COS_COLS]
+    feature_cols = numerical + SIN_COS_COLS + [TARGET_COL]
+    return {
+        "FEATURE_COLS": feature_cols,
+        "TARGET_COL": TARGET_COL,
+        "NUMERICAL_COLS": numerical,
+        "SIN_COS_COLS": SIN_COS_COLS,
+        "INPUT_LEN": config.INPUT_LEN,
+        "OUTPUT_LEN": config.OUTPUT_LEN,
+        "N_FEATURES": len(feature_cols),
+        "load_col_idx": feature_cols.index(TARGET_COL),
+    }
+
+
+def build_artifacts(history_rows=70080, xgb_rounds=20, n_windows=240, seed=0):
+    """Write config, scalers, XGBoost (+ packed forest), DL ensemble, metric JSONs and history CSV."""
+    os.makedirs(os.path.join(config.MODEL_DIR, "v4"), exist_ok=True)
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+
+    print(f"🧪 Building synthetic history ({history_rows:,} rows)...")
+    df = build_history(history_rows, seed)
+    df.to_csv(config.PREPROCESSED_CSV, index=False, float_format="%.4f",
+              date_format="%Y-%m-%d %H:%M:%S")
+
+    cfg = build_config(df)
+    feature_scaler = StandardScaler().fit(df[cfg["NUMERICAL_COLS"]])
+    target_scaler = StandardScaler().fit(df[[TARGET_COL]])
+    joblib.dump(cfg, config.CONFIG_PATH)
+    joblib.dump(feature_scaler, config.FEATURE_SCALER_PATH)
+    joblib.dump(target_scaler, config.TARGET_SCALER_PATH)
+
+    # XGBoost on a small set of windows from the tail
+    print(f"🌲 Training synthetic XGBoost ({xgb_rounds} rounds)...")
+    scaled = df[cfg["FEATURE_COLS"]].copy()
+    scaled[cfg["NUMERICAL_COLS"]] = feature_scaler.transform(df[cfg["NUMERICAL_COLS"]])
+    scaled[[TARGET_COL]] = target_scaler.transform(df[[TARGET_COL]])
+    X = scaled.values.astype(np.float32)
+    y = X[:, cfg["load_col_idx"]]
+    span = cfg["INPUT_LEN"] + cfg["OUTPUT_LEN"]
+    starts = np.arange(len(X) - span, 0, -24)[:n_windows]
+    Xf = np.stack([features.engineer_xgb_features(X[s:s + cfg["INPUT_LEN"]], cfg["load_col_idx"])
+                   for s in starts])
+    Y = np.stack([y[s + cfg["INPUT_LEN"]:s + span] for s in starts])
+    xgb = XGBRegressor(n_estimators=xgb_rounds, max_depth=4, learning_rate=0.1,
+                       tree_method="hist", random_state=seed)
+    xgb.fit(Xf, Y)
+    joblib.dump(xgb, config.XGB_MODEL_PATH)
+    PackedForest.from_model(xgb, artifacts.sha256_file(config.XGB_MODEL_PATH)).save(config.XGB_FOREST_PATH)
+
+    # Untrained residual models: same architecture and parameter count
+    print(f"🧠 Writing {len(config.DL_MODEL_PATHS)} synthetic residual models...")
+    for i, path in enumerate(config.DL_MODEL_PATHS):
+        torch.manual_seed(seed + i)
+        model = ResidualPredictor(cfg["N_FEATURES"] + 1, cfg["OUTPUT_LEN"])
+        torch.save(model.state_dict(), path)
+
+    metrics = {"MAE": 0.0, "RMSE": 0.0, "MAPE": 0.0, "Peak_MAE": 0.0}
+    with open(os.path.join(config.MODEL_DIR, "v4", "dl_metrics_v4.json"), "w") as f:
+        json.dump({"final_blended_test": metrics, "best_blend_alpha": config.BLEND_ALPHA}, f)
+    with open(os.path.join(config.MODEL_DIR, "v4", "all_model_comparison_v4.json"), "w") as f:
+        json.dump({"V4 Hybrid": {"val": metrics, "test": metrics}}, f)
+
+    return cfg
+
+
+def seed_requests(conn, n_rows):
+    """Bulk-insert completed forecast requests (older than any benchmark run)."""
+    base = pd.Timestamp("2024-01-01")
+    rows = []
+    for i in range(n_rows):
+        start = base + pd.Timedelta(hours=i % 8760)
+        rows.append((
+            "2020-01-01 00:00:00",
+            start.isoformat(), (start + pd.Timedelta(hours=167)).isoformat(),
+            (start - pd.Timedelta(hours=168)).isoformat(), start.isoformat(),
+            18000.0, start.isoformat(), 15000.0, 12000.0, "completed",
+        ))
+    conn.executemany("""
+        INSERT INTO forecast_requests
+            (created_at, forecast_start, forecast_end, input_start, input_end,
+             peak_load, peak_hour, avg_load, min_load, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
@@ -0,0 +1,102 @@
+"""
+Local stand-in for the Open-Meteo forecast and archive APIs.
+Serves deterministic hourly weather with a configurable response latency.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+
+def canned_hourly(lat, lon, start_date, end_date):
+    """Deterministic hourly series (same inputs -> same payload)."""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    n = ((end - start).days + 1) * 24
+    hours = np.arange(n)
+    doy = start.timetuple().tm_yday + hours / 24.0
+    seed = int(abs(lat * 100) + abs(lon * 100))
+    rng = np.random.default_rng(seed)
+
+    seasonal = 8.0 - 14.0 * np.cos(2 * np.pi * (doy - 15) / 365.25)
+    diurnal = 5.0 * np.sin(2 * np.pi * ((hours % 24) - 6) / 24)
+    temp = seasonal + diurnal + rng.normal(0, 1.0, n)
+    solar = np.clip(800 * np.sin(np.pi * ((hours % 24) - 6) / 12), 0, None)
+    wind = np.abs(12 + 4 * np.sin(2 * np.pi * hours / 97) + rng.normal(0, 2, n))
+
+    return {
+        "time": [(start + timedelta(hours=int(h))).strftime("%Y-%m-%dT%H:%M") for h in hours],
+        "temperature_2m": np.round(temp, 1).tolist(),
+        "relative_humidity_2m": np.round(65 + 10 * np.sin(2 * np.pi * hours / 24), 0).tolist(),
+        "precipitation": np.round(np.clip(rng.normal(0, 0.3, n), 0, None), 2).tolist(),
+        "wind_speed_10m": np.round(wind, 1).tolist(),
+        "weather_code": rng.choice([0, 1, 2, 3, 61], n).tolist(),
+        "shortwave_radiation": np.round(solar, 1).tolist(),
+        "wind_speed_100m": np.round(wind * 1.3, 1).tolist(),
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ("/v1/forecast", "/v1/archive"):
+            self.send_error(404)
+            return
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            body = json.dumps({
+                "latitude": float(q["latitude"]),
+                "longitude": float(q["longitude"]),
+                "hourly": canned_hourly(float(q["latitude"]), float(q["longitude"]),
+                                        q["start_date"], q["end_date"]),
+            }).encode()
+        except (KeyError, ValueError) as e:
+            self.send_error(400, str(e))
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class WeatherStub:
+    """Threaded HTTP server bound to an ephemeral localhost port."""
+
+    def __init__(self, latency_ms=0.0):
+        handler = type("Handler", (_Handler,), {"latency": latency_ms / 1000.0})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def env(self):
+        """Environment overrides pointing the weather module at this stub."""
+        return {
+            "OPEN_METEO_FORECAST_URL": f"{self.base_url}/v1/forecast",
+            "OPEN_METEO_ARCHIVE_URL": f"{self.base_url}/v1/archive",
+        }
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,99 @@
+"""
+Precomputed hourly calendar feature table.
+Hour/day/month encodings, weekend and rule-based US holiday flags for every
+hour in CALENDAR_START_YEAR..CALENDAR_END_YEAR. Inference, data preparation
+and training all read from here so they produce identical features.
+"""
+import threading
+import numpy as np
+import pandas as pd
+from config import CALENDAR_START_YEAR, CALENDAR_END_YEAR, US_HOLIDAY_RULES
+
+CALENDAR_COLS = [
+    'Hour', 'DayOfWeek', 'Month', 'Weekend', 'Holiday',
+    'Hour_sin', 'Hour_cos', 'Day_sin', 'Day_cos', 'Month_sin', 'Month_cos',
+]
+
+TABLE_START = pd.Timestamp(year=CALENDAR_START_YEAR, month=1, day=1)
+TABLE_END = pd.Timestamp(year=CALENDAR_END_YEAR + 1, month=1, day=1)  # exclusive
+_HOUR = pd.Timedelta(hours=1)
+
+_table = None
+_lock = threading.Lock()
+
+
+def holiday_dates(years):
+    """All US federal holiday dates (per US_HOLIDAY_RULES) in the given years."""
+    dates = []
+    for year in years:
+        for rule in US_HOLIDAY_RULES:
+            if len(rule) == 2:
+                month, day = rule
+                dates.append(pd.Timestamp(year=year, month=month, day=day))
+                continue
+            month, weekday, nth = rule
+            first = pd.Timestamp(year=year, month=month, day=1)
+            if nth > 0:
+                offset = (weekday - first.dayofweek) % 7 + 7 * (nth - 1)
+                dates.append(first + pd.Timedelta(days=offset))
+            else:
+                last = first + pd.offsets.MonthEnd(0)
+                dates.append(last - pd.Timedelta(days=(last.dayofweek - weekday) % 7))
+    return pd.DatetimeIndex(dates)
+
+
+def compute(timestamps):
+    """Calendar features for arbitrary timestamps as a (n, len(CALENDAR_COLS)) float32 array."""
+    ts = pd.DatetimeIndex(timestamps)
+    hour = ts.hour.values
+    dow = ts.dayofweek.values
+    month = ts.month.values
+    holidays = holiday_dates(range(ts.year.min(), ts.year.max() + 1)) if len(ts) else []
+
+    out = np.empty((len(ts), len(CALENDAR_COLS)), dtype=np.float32)
+    out[:, 0] = hour
+    out[:, 1] = dow
+    out[:, 2] = month
+    out[:, 3] = dow >= 5
+    out[:, 4] = ts.normalize().isin(holidays)
+    out[:, 5] = np.sin(2 * np.pi * hour / 24)
+    out[:, 6] = np.cos(2 * np.pi * hour / 24)
+    out[:, 7] = np.sin(2 * np.pi * dow / 7)
+    out[:, 8] = np.cos(2 * np.pi * dow / 7)
+    out[:, 9] = np.sin(2 * np.pi * (month - 1) / 12)
+    out[:, 10] = np.cos(2 * np.pi * (month - 1) / 12)
+    return out
+
+
+def table():
+    """The full hourly table, built on first use (~12 MB for 31 years)."""
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                _table = compute(pd.date_range(TABLE_START, TABLE_END, freq='h', inclusive='left'))
+    return _table
+
+
+def window(start, hours):
+    """
+    Features for `hours` consecutive hours from `start`, as {column: (hours,) array}.
+    Inside the table span this is a slice (views, no computation).
+    """
+    start = pd.Timestamp(start).floor('h')
+    i = (start - TABLE_START) // _HOUR
+    if start >= TABLE_START and start + hours * _HOUR <= TABLE_END:
+        block = table()[i:i + hours]
+    else:
+        block = compute(pd.date_range(start, periods=hours, freq='h'))
+    return {col: block[:, j] for j, col in enumerate(CALENDAR_COLS)}
+
+
+def lookup(timestamps):
+    """Features for arbitrary (e.g. non-contiguous) timestamps, as {column: array}."""
+    ts = pd.DatetimeIndex(timestamps)
+    if len(ts) and ts.min() >= TABLE_START and ts.max() < TABLE_END and (ts == ts.floor('h')).all():
+        block = table()[np.asarray((ts - TABLE_START) // _HOUR)]
+    else:
+        block = compute(ts)
+    return {col: block[:, j] for j, col in enumerate(CALENDAR_COLS)}
@@ -7,9 +7,10 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(BASE_DIR)
 
 # ── Paths ──────────────────────────────────────────────────────────────
-MODEL_DIR        = os.path.join(PROJECT_DIR, "models")
-DATA_DIR         = os.path.join(PROJECT_DIR, "data")
-DB_DIR           = os.path.join(PROJECT_DIR, "database")
+# Overridable so benchmarks/tests can point the app at synthetic artifacts.
+MODEL_DIR        = os.environ.get("VOLTCAST_MODEL_DIR") or os.path.join(PROJECT_DIR, "models")
+DATA_DIR         = os.environ.get("VOLTCAST_DATA_DIR") or os.path.join(PROJECT_DIR, "data")
+DB_DIR           = os.environ.get("VOLTCAST_DB_DIR") or os.path.join(PROJECT_DIR, "database")
 PREPROCESSED_CSV = os.path.join(DATA_DIR, "preprocessed_load_data.csv")
 
 # ── Model artifacts ────────────────────────────────────────────────────
@@ -17,6 +18,7 @@ XGB_MODEL_PATH      = os.path.join(MODEL_DIR, "xgb_model.pkl")
 FEATURE_SCALER_PATH = os.path.join(MODEL_DIR, "feature_scaler.pkl")
 TARGET_SCALER_PATH  = os.path.join(MODEL_DIR, "target_scaler.pkl")
 CONFIG_PATH         = os.path.join(MODEL_DIR, "config.pkl")
+XGB_FOREST_PATH     = os.path.join(MODEL_DIR, "xgb_forest.npz")   # packed trees (tree_predictor.py convert)
 
 DL_MODEL_PATHS = [
     os.path.join(MODEL_DIR, "v4", "res_model_0_s42.pt"),
@@ -24,9 +26,88 @@ DL_MODEL_PATHS = [
     os.path.join(MODEL_DIR, "v4", "res_model_2_s456.pt"),
 ]
 
-# V4 hybrid blend alpha (from training)
+# ── Load zones ─────────────────────────────────────────────────────────
+# DEFAULT_ZONE is the ISO-NE system total, served from the paths above. Each
+# load zone has the same artifact layout under ZONE_MODEL_ROOT/<zone>/ (published
+# under zones/<zone>/ in the artifact source) and its own history CSV under
+# ZONE_DATA_ROOT/<zone>/. Model sets load on demand and are evicted LRU.
+DEFAULT_ZONE     = "system"
+LOAD_ZONES       = [z.strip() for z in os.environ.get("VOLTCAST_ZONES", "ME,NH,VT,CT,RI,SEMA,WCMA,NEMA").split(",") if z.strip()]
+ZONES            = [DEFAULT_ZONE] + [z for z in LOAD_ZONES if z != DEFAULT_ZONE]
+ZONE_MODEL_ROOT  = os.path.join(MODEL_DIR, "zones")
+ZONE_DATA_ROOT   = os.path.join(DATA_DIR, "zones")
+MAX_LOADED_ZONES = int(os.environ.get("VOLTCAST_MAX_LOADED_ZONES", 0)) or None  # None = memory budget only
+
+# ── Artifact store ─────────────────────────────────────────────────────
+# Where published artifacts (and their manifest.json) come from:
+# hf://<repo_id>, http(s)://<base url>/ or a local directory. Empty = use the
+# local paths above as-is, without a manifest.
+HF_REPO_ID             = (os.environ.get("HF_REPO_ID") or "vidhyaramu/voltcast-v4").strip()
+ARTIFACT_SOURCE        = os.environ.get("VOLTCAST_ARTIFACT_SOURCE", f"hf://{HF_REPO_ID}").strip()
+ARTIFACT_CACHE_DIR     = os.path.join(MODEL_DIR, "cache")   # content-addressed: cache/blobs/<sha256>
+ARTIFACT_FETCH_WORKERS = 4
+ARTIFACT_TIMEOUT_S     = 10
+
+# ── XGBoost inference (see tree_predictor.py) ──────────────────────────
+XGB_NTHREAD          = int(os.environ.get("XGB_NTHREAD", 0)) or None  # booster threads (None = per inference slot)
+XGB_PACKED_MAX_BATCH = 4    # packed forest up to this many windows per call (~7x faster at 1); booster above
+
+# ── Inference slots (see inference_pool.py) ────────────────────────────
+# gunicorn gthreads serve requests concurrently; model compute is limited to
+# INFERENCE_SLOTS at a time and the CPUs are split between the slots, so
+# concurrent requests queue instead of oversubscribing intra-op threads.
+INFERENCE_SLOTS           = max(1, int(os.environ.get("INFERENCE_SLOTS", 1)))
+INFERENCE_THREADS         = int(os.environ.get("INFERENCE_THREADS", 0)) or None  # per slot (None = CPUs / slots)
+INFERENCE_QUEUE_TIMEOUT_S = float(os.environ.get("INFERENCE_QUEUE_TIMEOUT_S", 20))  # then 503
+
+# V4 hybrid blend alpha (from training); used when the model set's config
+# has no BLEND_ALPHA of its own (train_v4.py writes one)
 BLEND_ALPHA = 0.85
 
+# ── Probabilistic forecasts ────────────────────────────────────────────
+# MC-dropout draws per ensemble member (folded into one batched forward pass)
+MC_DROPOUT_SAMPLES = 16
+FORECAST_QUANTILES = (0.1, 0.5, 0.9)
+
+# Peak-demand alerts: thresholds in MW and, in quantile mode, the minimum
+# probability of the weekly peak exceeding them that raises the alert.
+PEAK_CRITICAL_MW = 21000.0
+PEAK_WARNING_MW  = 18500.0
+ALERT_MIN_PROBABILITY = 0.2
+
+# Upper bound on scenarios per /api/scenarios sweep (one batched model call)
+MAX_SCENARIOS = 50
+
+# ── Bulk export (see export.py) ────────────────────────────────────────
+EXPORT_FETCH_ROWS     = 2000   # forecast rows per SQLite fetchmany / streamed block
+EXPORT_CSV_CHUNK_ROWS = 5000   # history CSV rows parsed per chunk
+
+# ── Chart series (see downsample.py) ───────────────────────────────────
+SERIES_DEFAULT_POINTS = 1000   # per series, after downsampling
+SERIES_MAX_POINTS     = 5000
+SERIES_DEFAULT_DAYS   = 30     # range when no start is given
+HISTORY_COLUMN_CACHE  = 4      # whole-CSV columns kept per zone (LRU, reported to the governor)
+
+# ── Response cache (see response_cache.py) ─────────────────────────────
+RESPONSE_CACHE_MAX_MB         = 32     # serialized + gzipped bytes kept in memory
+RESPONSE_CACHE_MIN_GZIP_BYTES = 1024   # smaller bodies are only sent uncompressed
+
+# ── Retention (see retention.py) ───────────────────────────────────────
+# Hourly forecast results are kept for RETENTION_FULL_DAYS (by request age);
+# older requests are archived to ARCHIVE_DIR, folded into daily rollups and
+# deleted. 0 keeps forever.
+RETENTION_FULL_DAYS   = int(os.environ.get("VOLTCAST_RETENTION_FULL_DAYS", 30))
+RETENTION_ROLLUP_DAYS = int(os.environ.get("VOLTCAST_RETENTION_ROLLUP_DAYS", 0))
+RETENTION_ARCHIVE     = os.environ.get("VOLTCAST_RETENTION_ARCHIVE", "1") == "1"
+ARCHIVE_DIR           = os.path.join(DB_DIR, "archive")
+RETENTION_INTERVAL_S  = 3600   # minimum seconds between passes
+RETENTION_BATCH       = 200    # requests archived and deleted per transaction
+VACUUM_PAGES_PER_PASS = 4096   # freelist pages returned to the OS per pass
+
+# ── Weather API (Open-Meteo) ───────────────────────────────────────────
+OPEN_METEO_FORECAST_URL = os.environ.get("OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+OPEN_METEO_ARCHIVE_URL  = os.environ.get("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+
 # ── Weather cities (New England) ───────────────────────────────────────
 WEATHER_CITIES = {
     "Boston":      {"lat": 42.36, "lon": -71.06},
@@ -56,8 +137,57 @@ SEASONAL_WIND = {
     7: 10.5, 8: 10.0, 9: 11.0, 10: 12.5, 11: 14.0, 12: 15.0
 }
 
-# ── US Federal Holidays (approximate) ─────────────────────────────────
-US_HOLIDAYS_MD = [
-    (1, 1), (1, 20), (2, 17), (5, 26), (7, 4), (9, 1),
-    (10, 13), (11, 11), (11, 27), (12, 25)
+# ── Memory governor ────────────────────────────────────────────────────
+# The ensemble size and history tail are sized from the container memory
+# limit (cgroup v2/v1, else physical RAM) instead of guessing from the host.
+MEMORY_LIMIT_MB        = float(os.environ.get("VOLTCAST_MEMORY_LIMIT_MB", 0)) or None  # override detection
+MEMORY_TARGET_FRACTION = 0.85   # share of the limit the app plans to fill
+MEMORY_HEADROOM_MB     = 96     # per-request working set (feature frames, activations, MC batches)
+MEMORY_GROW_MARGIN_MB  = 32     # extra room required before growing again (avoids flapping)
+MIN_ENSEMBLE_MEMBERS   = 1
+HISTORY_MIN_ROWS       = 2016   # 12 weeks: input windows plus recent ground truth
+HISTORY_MAX_ROWS       = int(os.environ.get("VOLTCAST_HISTORY_MAX_ROWS", 0)) or None  # None = whole CSV
+
+# Footprint estimates (resident bytes per byte on disk / per CSV cell)
+DL_MEMBER_MEMORY_FACTOR = 1.5   # weights + load-time state_dict copy
+XGB_MEMORY_FACTOR       = 4.0   # booster + unpickle transient
+HISTORY_CELL_BYTES      = 28    # float32 frame + read_csv parse peak
+GOVERNOR_INTERVAL_S     = 60    # minimum seconds between runtime re-plans
+
+# ── Observability ──────────────────────────────────────────────────
+# Attach the per-request stage breakdown as an X-Timing header on every
+# response (clients can also opt in per request by sending `X-Timing: 1`).
+TIMING_HEADER = os.environ.get("TIMING_HEADER", "0") == "1"
+
+# On-demand profiling (see profiling.py): `?profile=cpu|mem|speedscope` on a
+# request. Off unless VOLTCAST_PROFILING=1 (anyone may profile) or a token is
+# set (requests must send it as X-Profile-Token); when off no hooks are installed.
+PROFILING_ENABLED          = os.environ.get("VOLTCAST_PROFILING", "0") == "1"
+PROFILING_TOKEN            = os.environ.get("VOLTCAST_PROFILING_TOKEN", "").strip()
+PROFILE_DIR                = os.path.join(DB_DIR, "profiles")
+PROFILE_KEEP               = 50     # newest profiles kept on disk
+PROFILE_SAMPLE_INTERVAL_MS = 5      # speedscope sampler period
+PROFILE_MEM_FRAMES         = 8      # traceback depth recorded by tracemalloc
+PROFILE_MEM_TOP            = 30     # allocation sites reported
+
+# ── Calendar feature table ─────────────────────────────────────────────
+# Hourly time/holiday features are precomputed once for this span of years
+# (inclusive); windows inside it are plain slices of the table.
+CALENDAR_START_YEAR = 2010
+CALENDAR_END_YEAR   = 2040
+
+# ── US Federal Holidays (rule-based) ──────────────────────────────────
+# (month, day) for fixed dates, (month, weekday, nth) for floating ones
+# (weekday 0=Mon, nth=-1 means the last such weekday of the month).
+US_HOLIDAY_RULES = [
+    (1, 1),         # New Year's Day
+    (1, 0, 3),      # Martin Luther King Jr. Day
+    (2, 0, 3),      # Presidents' Day
+    (5, 0, -1),     # Memorial Day
+    (7, 4),         # Independence Day
+    (9, 0, 1),      # Labor Day
+    (10, 0, 2),     # Columbus Day
+    (11, 11),       # Veterans Day
+    (11, 3, 4),     # Thanksgiving
+    (12, 25),       # Christmas
 ]
@@ -3,10 +3,14 @@ SQLite database initialization and helper functions.
 """
 import os
 import sqlite3
-from config import DB_DIR
+from config import DB_DIR, DEFAULT_ZONE
 
 DB_PATH = os.path.join(DB_DIR, "forecasts.db")
 
+# Row layout of iter_forecast_results (bulk export)
+EXPORT_COLUMNS = ["request_id", "zone", "forecast_start", "hour_offset", "timestamp",
+                  "predicted_load", "xgb_load", "dl_residual"]
+
 def get_db():
     """Get a database connection."""
     os.makedirs(DB_DIR, exist_ok=True)
@@ -18,10 +22,16 @@ def get_db():
 def init_db():
     """Create tables if they don't exist."""
     with get_db() as conn:
-        conn.execute("""
+        # New databases reclaim space incrementally (retention.py); the mode must
+        # be set before the first table exists.
+        if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+        conn.execute(f"""
             CREATE TABLE IF NOT EXISTS forecast_requests (
                 id              INTEGER PRIMARY KEY AUTOINCREMENT,
                 created_at      DATETIME DEFAULT CURRENT_TIMESTAMP,
+                zone            TEXT    NOT NULL DEFAULT '{DEFAULT_ZONE}',
                 forecast_start  TEXT    NOT NULL,
                 forecast_end    TEXT    NOT NULL,
                 input_start     TEXT    NOT NULL,
@@ -52,17 +62,56 @@ def init_db():
             CREATE INDEX IF NOT EXISTS idx_results_request
             ON forecasted_results(request_id)
         """)
+
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_results_timestamp
+            ON forecasted_results(timestamp)
+        """)
+
+        # Databases created before load zones: every existing request is system-level
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(forecast_requests)")}
+        if "zone" not in columns:
+            conn.execute(f"ALTER TABLE forecast_requests ADD COLUMN zone TEXT NOT NULL DEFAULT '{DEFAULT_ZONE}'")
+            print("🛠️ Added zone column to forecast_requests")
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_requests_zone
+            ON forecast_requests(zone)
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_requests_created
+            ON forecast_requests(created_at)
+        """)
+
+        # Daily aggregates of forecasts past the full-resolution window (retention.py).
+        # Sums, not means, so later passes can merge into the same day.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_rollups (
+                zone            TEXT    NOT NULL,
+                day             TEXT    NOT NULL,
+                forecasts       INTEGER NOT NULL,
+                hours           INTEGER NOT NULL,
+                load_sum        REAL    NOT NULL,
+                peak_load       REAL    NOT NULL,
+                peak_hour       TEXT    NOT NULL,
+                min_load        REAL    NOT NULL,
+                actual_hours    INTEGER NOT NULL DEFAULT 0,
+                error_sum       REAL    NOT NULL DEFAULT 0,
+                abs_error_sum   REAL    NOT NULL DEFAULT 0,
+                pct_error_sum   REAL    NOT NULL DEFAULT 0,
+                PRIMARY KEY (zone, day)
+            )
+        """)
     print("✅ Database initialized")
 
-def save_forecast_request(forecast_start, forecast_end, input_start, input_end):
+def save_forecast_request(forecast_start, forecast_end, input_start, input_end, zone=DEFAULT_ZONE):
     """Save a new forecast request. Returns the request ID."""
     with get_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO forecast_requests
-                (forecast_start, forecast_end, input_start, input_end, status)
-            VALUES (?, ?, ?, ?, 'processing')
-        """, (forecast_start, forecast_end, input_start, input_end))
+                (zone, forecast_start, forecast_end, input_start, input_end, status)
+            VALUES (?, ?, ?, ?, ?, 'processing')
+        """, (zone, forecast_start, forecast_end, input_start, input_end))
         return cursor.lastrowid
 
 def save_forecast_results(request_id, results):
@@ -106,13 +155,14 @@ def update_request_error(request_id, error_msg):
             WHERE id = ?
         """, (error_msg, request_id))
 
-def get_all_requests():
-    """Get all forecast requests, newest first."""
+def get_all_requests(zone=None):
+    """Get all forecast requests (optionally of one zone), newest first."""
     with get_db() as conn:
         rows = conn.execute("""
             SELECT * FROM forecast_requests
+            WHERE ? IS NULL OR zone = ?
             ORDER BY created_at DESC
-        """).fetchall()
+        """, (zone, zone)).fetchall()
         return [dict(r) for r in rows]
 
 def get_request_with_results(request_id):
@@ -135,7 +185,67 @@ def get_request_with_results(request_id):
             "results": [dict(r) for r in results]
         }
 
+def iter_forecast_results(start=None, end=None, batch_size=1000, zone=None):
+    """
+    Stream results of completed requests with timestamp in [start, end)
+    (ISO strings, either optional; zone=None for all zones) as lists of EXPORT_COLUMNS tuples.
+    Uses a server-side cursor with fetchmany, so memory does not grow with the range.
+    """
+    conn = get_db()
+    conn.row_factory = None  # plain tuples
+    try:
+        cursor = conn.execute("""
+            SELECT r.request_id, q.zone, q.forecast_start, r.hour_offset, r.timestamp,
+                   r.predicted_load, r.xgb_load, r.dl_residual
+            FROM forecasted_results r
+            JOIN forecast_requests q ON q.id = r.request_id
+            WHERE q.status = 'completed'
+              AND r.timestamp >= ? AND r.timestamp < ?
+              AND (? IS NULL OR q.zone = ?)
+            ORDER BY r.timestamp, r.request_id
+        """, (start or "", end or "\uffff", zone, zone))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def get_latest_forecasts(start, end, zone=DEFAULT_ZONE):
+    """
+    One stored forecast per hour in [start, end) (ISO strings) for a zone: the
+    most recent completed request covering it. Returns [(timestamp, predicted_load, xgb_load)].
+    """
+    with get_db() as conn:
+        # SQLite takes bare columns from the row that supplies MAX(request_id)
+        rows = conn.execute("""
+            SELECT r.timestamp, r.predicted_load, r.xgb_load, MAX(r.request_id)
+            FROM forecasted_results r
+            JOIN forecast_requests q ON q.id = r.request_id
+            WHERE q.status = 'completed' AND q.zone = ?
+              AND r.timestamp >= ? AND r.timestamp < ?
+            GROUP BY r.timestamp
+            ORDER BY r.timestamp
+        """, (zone, start, end)).fetchall()
+        return [tuple(r)[:3] for r in rows]
+
 def delete_request(request_id):
     """Delete a forecast request and its results."""
     with get_db() as conn:
         conn.execute("DELETE FROM forecast_requests WHERE id = ?", (request_id,))
+
+def get_daily_rollups(zone=DEFAULT_ZONE, start=None, end=None):
+    """Daily rollups of a zone with day in [start, end) ('YYYY-mm-dd', either optional), oldest first."""
+    with get_db() as conn:
+        rows = conn.execute("""
+            SELECT day, forecasts, hours, load_sum / hours AS avg_load, peak_load, peak_hour, min_load,
+                   actual_hours,
+                   CASE WHEN actual_hours > 0 THEN abs_error_sum / actual_hours END AS mae,
+                   CASE WHEN actual_hours > 0 THEN 100.0 * pct_error_sum / actual_hours END AS mape,
+                   CASE WHEN actual_hours > 0 THEN error_sum / actual_hours END AS bias
+            FROM daily_rollups
+            WHERE zone = ? AND day >= ? AND day < ?
+            ORDER BY day
+        """, (zone, start or "", end or "\uffff")).fetchall()
+        return [dict(r) for r in rows]
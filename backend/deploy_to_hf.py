@@ -1,34 +1,34 @@
 import os
+import tempfile
 from huggingface_hub import HfApi
-from config import CONFIG_PATH, FEATURE_SCALER_PATH, TARGET_SCALER_PATH, XGB_MODEL_PATH, DL_MODEL_PATHS
+import artifacts
+from config import DEFAULT_ZONE
 
-def upload_to_hf(repo_id, token):
+def upload_to_hf(repo_id, token, zone=DEFAULT_ZONE):
     api = HfApi()
+    prefix = artifacts.zone_prefix(zone)
     
-    print(f"🚀 Starting upload to {repo_id}...")
+    print(f"🚀 Starting upload to {repo_id}/{prefix}...")
     
-    # Files to upload
-    files = {
-        CONFIG_PATH: "config.joblib",
-        FEATURE_SCALER_PATH: "feature_scaler.joblib",
-        TARGET_SCALER_PATH: "target_scaler.joblib",
-        XGB_MODEL_PATH: "xgb_v4.joblib",
-    }
-    
-    for i, path in enumerate(DL_MODEL_PATHS):
-        files[path] = f"residual_ensemble_seed_{i}.pth"
+    # Stage every artifact under its published name, with manifest.json
+    # (sha256 + size per file) so the app can verify and cache them.
+    with tempfile.TemporaryDirectory() as staging:
+        local = artifacts.local_paths(artifacts.zone_model_dir(zone))
+        missing = [path for path in local.values() if not os.path.exists(path)]
+        for path in missing:
+            print(f"❌ File not found: {path}")
+        manifest = artifacts.publish(staging, {name: path for name, path in local.items() if os.path.exists(path)})
 
-    for local_path, repo_path in files.items():
-        if os.path.exists(local_path):
+        # Upload the manifest last: clients never see it pointing at files
+        # that are not on the Hub yet.
+        for repo_path in list(manifest["files"]) + [artifacts.MANIFEST_NAME]:
             print(f"📤 Uploading {repo_path}...")
             api.upload_file(
-                path_or_fileobj=local_path,
-                path_in_repo=repo_path,
+                path_or_fileobj=os.path.join(staging, repo_path),
+                path_in_repo=prefix + repo_path,
                 repo_id=repo_id,
                 token=token
             )
-        else:
-            print(f"❌ File not found: {local_path}")
 
     print("✅ Upload complete!")
 
@@ -36,4 +36,5 @@ if __name__ == "__main__":
     # User should set these or input them
     repo = input("Enter HF Repo ID (e.g., username/voltcast-v4): ")
     hf_token = input("Enter HF Write Token: ")
-    upload_to_hf(repo, hf_token)
+    zone = input(f"Zone to upload [{DEFAULT_ZONE}]: ").strip() or DEFAULT_ZONE
+    upload_to_hf(repo, hf_token, zone)
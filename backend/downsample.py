@@ -0,0 +1,65 @@
+"""
+Time-series downsampling for chart payloads.
+Both methods pick existing samples (no interpolation), so peaks stay real
+data points: LTTB (Largest-Triangle-Three-Buckets) for visual shape, min/max
+bucketing to keep every bucket's extremes.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def downsample(x, y, n_out, method="lttb"):
+    """Indices (sorted) of at most n_out samples of y(x) chosen by `method`."""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if len(y) <= n_out:
+        return np.arange(len(y))
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    return lttb_indices(x, y, n_out)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: first and last points are kept; each
+    interior bucket keeps the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n) if n_out >= n else np.array([0, n - 1][:n_out])
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 interior buckets
+    # Mean of each bucket (the "next bucket" point for the one before it); last is the final sample.
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area (a, candidate, next-bucket mean); constants dropped.
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y, n_out):
+    """Min and max of each of n_out // 2 equal-count buckets, in time order."""
+    n = len(y)
+    n_buckets = max(1, n_out // 2)
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, bucket))                    # by bucket, then value
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    picks = np.unique(np.concatenate([order[starts], order[ends]]))  # sorted, min==max deduped
+    return picks
@@ -0,0 +1,109 @@
+"""
+Streaming bulk export.
+Stored forecasts (SQLite cursor, fetchmany) and history (preprocessed CSV,
+read in chunks) are encoded batch by batch as NDJSON or CSV and optionally
+gzipped on the fly, so memory stays flat however long the date range is.
+"""
+import csv
+import io
+import json
+import math
+import zlib
+from datetime import datetime
+import pandas as pd
+import database as db
+from config import PREPROCESSED_CSV, EXPORT_FETCH_ROWS, EXPORT_CSV_CHUNK_ROWS
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def parse_range(start, end):
+    """ISO-ish 'YYYY-mm-dd[ HH:MM]' strings -> (start, end) datetimes (either may be None); end is exclusive."""
+    start = datetime.fromisoformat(start) if start else None
+    end = datetime.fromisoformat(end) if end else None
+    if start and end and end <= start:
+        raise ValueError("end must be after start")
+    return start, end
+
+
+# ── Sources: (columns, iterator of row batches) ────────────────────────
+# Arguments are validated before anything is streamed, so bad input is a 400.
+
+def forecast_rows(start=None, end=None, zone=None):
+    """Completed forecast rows with target timestamp in [start, end), oldest first (zone=None: all zones)."""
+    return db.EXPORT_COLUMNS, db.iter_forecast_results(
+        start.strftime(TIMESTAMP_FORMAT) if start else None,
+        end.strftime(TIMESTAMP_FORMAT) if end else None,
+        batch_size=EXPORT_FETCH_ROWS, zone=zone)
+
+
+def history_columns(path=PREPROCESSED_CSV):
+    with open(path, newline="") as f:
+        return next(csv.reader(f))
+
+
+def history_rows(start=None, end=None, columns=None, path=PREPROCESSED_CSV):
+    """History CSV rows in [start, end), optionally only some columns (Timestamp always first)."""
+    header = history_columns(path)
+    columns = columns or header
+    unknown = set(columns) - set(header)
+    if unknown:
+        raise ValueError(f"Unknown history columns: {sorted(unknown)}")
+    columns = ["Timestamp"] + [c for c in columns if c != "Timestamp"]
+    return columns, _history_batches(path, columns, start, end)
+
+
+def _history_batches(path, columns, start, end):
+    # The file is time-ordered: reading stops at the first chunk past `end`.
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=EXPORT_CSV_CHUNK_ROWS):
+        ts = pd.to_datetime(chunk["Timestamp"])
+        mask = pd.Series(True, index=chunk.index)
+        if start:
+            mask &= ts >= start
+        if end:
+            mask &= ts < end
+        if mask.any():
+            chunk = chunk.loc[mask, columns]
+            chunk["Timestamp"] = ts[mask].dt.strftime(TIMESTAMP_FORMAT)
+            yield chunk.itertuples(index=False, name=None)
+        if end and ts.iloc[-1] >= end:
+            break
+
+
+# ── Encoders ───────────────────────────────────────────────────────────
+
+def _json_value(v):
+    v = v.item() if hasattr(v, "item") else v  # numpy scalars from pandas rows
+    return None if isinstance(v, float) and not math.isfinite(v) else v
+
+
+def encode(columns, batches, fmt):
+    """Yield text blocks (one per batch) in NDJSON or CSV (header row first)."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(columns)
+        yield buf.getvalue()
+    for rows in batches:
+        buf = io.StringIO()
+        if fmt == "csv":
+            csv.writer(buf, lineterminator="\n").writerows(rows)
+        else:
+            for row in rows:
+                buf.write(json.dumps(dict(zip(columns, map(_json_value, row)))))
+                buf.write("\n")
+        if buf.tell():
+            yield buf.getvalue()
+
+
+def gzip_stream(blocks, level=6):
+    """Gzip (wbits=31) a stream of text blocks incrementally."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for block in blocks:
+        data = z.compress(block.encode())
+        if data:
+            yield data
+    yield z.flush()
@@ -5,45 +5,27 @@ Replicates the exact preprocessing and augmentation used during training.
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from config import CDH_BASE, HDH_BASE, US_HOLIDAYS_MD
+import calendar_features
+from config import CDH_BASE, HDH_BASE
 
 def generate_time_features(df):
-    """Generate sin/cos time features and holiday/weekend flags."""
-    df = df.copy()
-    ts = pd.to_datetime(df['Timestamp'])
-    
-    # Base components
-    df['Hour'] = ts.dt.hour
-    df['DayOfWeek'] = ts.dt.dayofweek
-    df['Month'] = ts.dt.month
-    df['Weekend'] = (df['DayOfWeek'] >= 5).astype(int)
-    
-    # Cyclical encoding
-    df['Hour_sin'] = np.sin(2 * np.pi * df['Hour'] / 24)
-    df['Hour_cos'] = np.cos(2 * np.pi * df['Hour'] / 24)
-    df['Day_sin']  = np.sin(2 * np.pi * df['DayOfWeek'] / 7)
-    df['Day_cos']  = np.cos(2 * np.pi * df['DayOfWeek'] / 7)
-    df['Month_sin'] = np.sin(2 * np.pi * (df['Month'] - 1) / 12)
-    df['Month_cos'] = np.cos(2 * np.pi * (df['Month'] - 1) / 12)
-    
-    # Holiday flag
-    df['Holiday'] = 0
-    for m, d in US_HOLIDAYS_MD:
-        df.loc[(ts.dt.month == m) & (ts.dt.day == d), 'Holiday'] = 1
-        
-    return df
+    """Add sin/cos time features and holiday/weekend flags from the calendar table."""
+    return df.assign(**calendar_features.lookup(df['Timestamp']))
 
-def generate_cdh_hdh(df):
-    """Generate Cooling and Heating Degree Hours for all 5 cities."""
-    df = df.copy()
-    cities = ["Boston", "Hartford", "Providence", "Portland", "Burlington"]
-    
-    for city in cities:
-        temp_col = f"Temp_{city}"
-        df[f"CDH_{city}"] = np.maximum(0, df[temp_col] - CDH_BASE)
-        df[f"HDH_{city}"] = np.maximum(0, HDH_BASE - df[temp_col])
-        
-    return df
+def generate_cdh_hdh(weather):
+    """
+    Cooling and Heating Degree Hours for every city in a WeatherArray.
+    Returns {`CDH_{city}` / `HDH_{city}`: (hours,) array}.
+    """
+    temp = weather.var("Temp")  # (cities, hours)
+    cdh = np.maximum(0, temp - CDH_BASE)
+    hdh = np.maximum(0, HDH_BASE - temp)
+
+    cols = {}
+    for i, city in enumerate(weather.cities):
+        cols[f"CDH_{city}"] = cdh[i]
+        cols[f"HDH_{city}"] = hdh[i]
+    return cols
 
 def engineer_xgb_features(X_window, load_idx):
     """
@@ -74,36 +56,86 @@ def engineer_xgb_features(X_window, load_idx):
             
     return np.array(f, dtype=np.float32)
 
-def prepare_inference_data(historical_df, weather_forecast_dict, feature_cols):
+def engineer_xgb_features_batch(X_windows, load_idx):
+    """
+    engineer_xgb_features for (N, 168, n_features) windows at once (training).
+    Same columns in the same order; reductions run over the window axis.
+    """
+    X = np.asarray(X_windows, dtype=np.float32)
+    load = X[:, :, load_idx]
+    stats = np.stack([
+        load.mean(axis=1),
+        load.std(axis=1),
+        load.min(axis=1),
+        load.max(axis=1),
+        load[:, -1],
+        load[:, 0],
+        load[:, -1] - load[:, 0],
+        load[:, -24:].mean(axis=1),
+        load[:, -48:].mean(axis=1),
+    ], axis=1)
+
+    # Other features: mean + last value, interleaved per column
+    means = np.delete(X.mean(axis=1), load_idx, axis=1)
+    lasts = np.delete(X[:, -1, :], load_idx, axis=1)
+    other = np.stack([means, lasts], axis=2).reshape(len(X), -1)
+    return np.concatenate([stats, other], axis=1).astype(np.float32)
+
+def sliding_windows(features, target, input_len, output_len, start_offset=0):
+    """
+    Training windows as zero-copy views (scaling_sequences.ipynb create_windows):
+    X[i] = features[i:i+input_len], y[i] = target[i+input_len:i+input_len+output_len]
+    for i from start_offset. Returns X (N, input_len, F) and y (N, output_len).
+    """
+    n = len(features) - input_len - output_len + 1
+    X = np.lib.stride_tricks.sliding_window_view(features, input_len, axis=0).transpose(0, 2, 1)
+    y = np.lib.stride_tricks.sliding_window_view(target, output_len)[input_len:]
+    return X[start_offset:n], y[start_offset:n]
+
+def prepare_inference_data(historical_df, weather, feature_cols):
     """
     Combines 168h of history with 168h of weather forecast.
     historical_df: last 168h of actual data (including load)
-    weather_forecast_dict: 168h of future weather city->DF
+    weather: WeatherArray with 168h of future weather
     Returns: full future DF with skeleton for features
     """
     # 1. Create future range
     last_ts = pd.to_datetime(historical_df['Timestamp'].iloc[-1])
-    future_ts = [last_ts + timedelta(hours=i+1) for i in range(168)]
-    
-    future_df = pd.DataFrame({'Timestamp': future_ts})
-    
-    # 2. Merge weather forecasts
-    for city, w_df in weather_forecast_dict.items():
-        future_df = pd.concat([future_df, w_df.reset_index(drop=True)], axis=1)
-        
-    # 3. Add time features
-    future_df = generate_time_features(future_df)
+    future_ts = pd.date_range(last_ts + timedelta(hours=1), periods=weather.hours, freq='h')
+
+    # 2. Weather columns + CDH/HDH, assembled once (no per-city concat)
+    cols = {'Timestamp': future_ts}
+    cols.update(weather.columns())
+    cols.update(generate_cdh_hdh(weather))
     
-    # 4. Add CDH/HDH
-    future_df = generate_cdh_hdh(future_df)
+    # 3. Add time features (slice of the precomputed calendar table)
+    cols.update(calendar_features.window(future_ts[0], weather.hours))
+    future_df = pd.DataFrame(cols)
     
-    # 5. Add rolling placeholders (XGBoost doesn't use raw rolling, but DL might need column count)
+    # 4. Add rolling placeholders (XGBoost doesn't use raw rolling, but DL might need column count)
     # Replicate training: rolling_24 and rolling_168 were in the preprocessed CSV
     future_df['rolling_24'] = historical_df['load'].tail(24).mean()
     future_df['rolling_168'] = historical_df['load'].mean()
     
-    # 6. Add load placeholder (to be filled by prediction)
+    # 5. Add load placeholder (to be filled by prediction)
     future_df['load'] = 0.0
     
     # Ensure correct column order
     return future_df[feature_cols]
+
+def prepare_scenario_windows(historical_df, weathers, feature_cols):
+    """
+    Feature windows for several what-if weathers over the same history.
+    Returns one (N, hours, F) float64 array in feature_cols order: calendar,
+    rolling and load columns are built once, only weather-derived columns
+    (raw weather, CDH/HDH) are refilled per scenario.
+    """
+    base = prepare_inference_data(historical_df, weathers[0], feature_cols).to_numpy(np.float64)
+    out = np.repeat(base[None], len(weathers), axis=0)
+    for k, w in enumerate(weathers[1:], start=1):
+        cols = w.columns()
+        cols.update(generate_cdh_hdh(w))
+        for j, col in enumerate(feature_cols):
+            if col in cols:
+                out[k, :, j] = cols[col]
+    return out
@@ -0,0 +1,100 @@
+"""
+Bounded inference executor.
+gunicorn gthreads run requests concurrently, and every PyTorch forward would
+otherwise use all cores for intra-op work. Model compute runs inside one of
+INFERENCE_SLOTS slots, each sized to its share of the CPUs (torch threads and
+XGBoost nthread), and waiting for a slot times out into InferenceBusy (503).
+torch.set_num_threads is process-wide, so it is set once when the pool is
+created; anything else calling it changes every slot.
+"""
+import threading
+import time
+from contextlib import contextmanager
+import torch
+import telemetry
+import resources
+from config import INFERENCE_SLOTS, INFERENCE_THREADS, INFERENCE_QUEUE_TIMEOUT_S
+
+
+class InferenceBusy(Exception):
+    """No inference slot freed up within the queue timeout."""
+    def __init__(self, waited, retry_after=1):
+        super().__init__(f"Inference queue full: no slot free after {waited:.1f}s")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    def __init__(self, slots=INFERENCE_SLOTS, threads=INFERENCE_THREADS, timeout=INFERENCE_QUEUE_TIMEOUT_S):
+        self.slots = slots
+        self.threads = threads or max(1, resources.cpu_count() // slots)
+        self.timeout = timeout
+        self._sem = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        torch.set_num_threads(self.threads)
+
+    def _gauges(self):
+        telemetry.set_gauge("voltcast_inference_active", self.active)
+        telemetry.set_gauge("voltcast_inference_queue_depth", self.waiting)
+
+    @contextmanager
+    def slot(self):
+        """Run the enclosed model compute in an inference slot (re-entrant per thread)."""
+        if getattr(self._local, "held", False):
+            yield
+            return
+
+        with self._lock:
+            self.waiting += 1
+            self._gauges()
+        t0 = time.perf_counter()
+        with telemetry.stage("inference_wait"):
+            acquired = self._sem.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - t0
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.active += 1
+                self.last_wait = waited
+                self.max_wait = max(self.max_wait, waited)
+            else:
+                self.rejected += 1
+            self._gauges()
+        telemetry.observe("voltcast_inference_wait_seconds", waited)
+
+        if not acquired:
+            telemetry.inc("voltcast_inference_rejected_total")
+            raise InferenceBusy(waited, retry_after=max(1, round(self.timeout / 4)))
+
+        try:
+            self._local.held = True
+            yield
+        finally:
+            self._local.held = False
+            with self._lock:
+                self.active -= 1
+                self._gauges()
+            self._sem.release()
+
+    def status(self):
+        """Slot usage for /api/health."""
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "threads_per_slot": self.threads,
+                "active": self.active,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+                "last_wait_ms": round(self.last_wait * 1000, 1),
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "timeout_s": self.timeout,
+            }
+
+
+# Singleton instance
+pool = InferencePool()
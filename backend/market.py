@@ -29,33 +29,23 @@ def estimate_iso_ne_price(load_mw, hour_of_day, is_weekend):
     
     return round(price * volatility, 2)
 
-def estimate_renewables(weather_forecast):
+def estimate_renewables(weather):
     """
-    weather_forecast: dict of city -> DataFrame with Solar and Wind100 columns.
+    weather: WeatherArray (cities, hours, variables) with Solar and Wind100.
     Estimates Solar and Wind generation in MW for the ISO-NE region.
     Rough capacity estimates used for demonstration.
     """
     # Approximate solar capacity in New England (weighted by city) ~6000 MW
     # Approximate wind capacity ~1500 MW
     
-    cities = list(weather_forecast.keys())
-    hours = len(weather_forecast[cities[0]])
+    # Solar: 0-1000 W/m2 usually. We proxy 1 W/m2 -> X MW across region
+    # Solar radiation is usually 'shortwave_radiation' in W/m2
+    solar_total = weather.solar.sum(axis=0, dtype=np.float64) * 1.5 # 1000 W/m2 -> 1500 MW contribution per city
     
-    solar_total = np.zeros(hours)
-    wind_total = np.zeros(hours)
-    
-    for city in cities:
-        df = weather_forecast[city]
-        
-        # Solar: 0-1000 W/m2 usually. We proxy 1 W/m2 -> X MW across region
-        # Solar radiation is usually 'shortwave_radiation' in W/m2
-        solar_total += df[f'Solar_{city}'].values * 1.5 # 1000 W/m2 -> 1500 MW contribution per city
-        
-        # Wind: Power curve is cubic with wind speed (v^3)
-        # Wind100 is speed at 100m in km/h. Let's convert to m/s for standard power curves
-        v = df[f'Wind100_{city}'].values / 3.6
-        wind_potential = (v / 12.0) ** 3 # Rated speed around 12 m/s
-        wind_potential = np.clip(wind_potential, 0, 1.2) # Max capacity factor
-        wind_total += wind_potential * 300 # 300 MW per city capacity
+    # Wind: Power curve is cubic with wind speed (v^3)
+    # Wind100 is speed at 100m in km/h. Let's convert to m/s for standard power curves
+    v = weather.wind100.astype(np.float64) / 3.6
+    wind_potential = np.clip((v / 12.0) ** 3, 0, 1.2) # Rated speed around 12 m/s, max capacity factor
+    wind_total = wind_potential.sum(axis=0) * 300 # 300 MW per city capacity
         
     return solar_total, wind_total
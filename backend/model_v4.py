@@ -3,13 +3,21 @@ Model inference module for the V4 Hybrid Model.
 Loads XGBoost and PyTorch DL ensemble, and performs blended inference.
 """
 import os
+import threading
 import joblib
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from config import XGB_MODEL_PATH, DL_MODEL_PATHS, BLEND_ALPHA, CONFIG_PATH, TARGET_SCALER_PATH, FEATURE_SCALER_PATH
+import telemetry
+import resources
+import artifacts
+import inference_pool
+from contextlib import contextmanager
+from config import BLEND_ALPHA, FORECAST_QUANTILES, XGB_NTHREAD, DEFAULT_ZONE, PREPROCESSED_CSV
 from features import engineer_xgb_features
+from tree_predictor import PackedForest, TreePredictor
+from scaling import ScalingPlan
 
 # ── DL Model Architecture (Replicated from V4 Notebook) ────────────────
 
@@ -61,6 +69,8 @@ class ResidualPredictor(nn.Module):
             nn.Dropout(dropout), nn.Linear(d // 2, 1))
 
     def forward(self, x):
+        if self.training and self.noise_std > 0:  # input noise while training (train_v4.py); none in eval
+            x = x + torch.randn_like(x) * self.noise_std
         x = self.input_proj(x)
         x = self.cnn(x.permute(0,2,1)).permute(0,2,1)
         h, _ = self.lstm(x)
@@ -71,153 +81,274 @@ class ResidualPredictor(nn.Module):
         return self.head(h).squeeze(-1)
 
 
+# ── Monte-Carlo Dropout ───────────────────────────────────────────────
+# Models stay in eval() (BatchNorm uses running stats). While mc_dropout() is
+# active on a thread, forward hooks re-apply dropout to the batch rows after
+# the first `keep` ones: on every Dropout layer, and inside every
+# MultiheadAttention (attention-weight dropout). Deterministic and sampled
+# rows share one forward pass and other threads are unaffected.
+
+_mc_state = threading.local()
+
+def _mc_dropout_hook(module, inputs, output):
+    keep = getattr(_mc_state, "keep", None)
+    if keep is None:
+        return None
+    x = inputs[0]
+    return torch.cat([output[:keep], F.dropout(x[keep:], module.p, training=True)])
+
+def _mc_attention_hook(module, inputs, output):
+    """Recompute self-attention for the sampled rows with its dropout on (module state untouched)."""
+    keep = getattr(_mc_state, "keep", None)
+    if keep is None or module.dropout == 0:
+        return None
+    q, k, v = (t[keep:].transpose(0, 1) for t in inputs[:3])  # batch_first -> (T, B, d)
+    sampled, _ = F.multi_head_attention_forward(
+        q, k, v, module.embed_dim, module.num_heads,
+        module.in_proj_weight, module.in_proj_bias, module.bias_k, module.bias_v,
+        module.add_zero_attn, module.dropout, module.out_proj.weight, module.out_proj.bias,
+        training=True, need_weights=False)
+    return torch.cat([output[0][:keep], sampled.transpose(0, 1)]), output[1]
+
+def enable_mc_dropout(model):
+    """Register the MC-dropout hooks on every Dropout and MultiheadAttention layer of a model."""
+    for m in model.modules():
+        if isinstance(m, nn.Dropout):
+            m.register_forward_hook(_mc_dropout_hook)
+        elif isinstance(m, nn.MultiheadAttention):
+            m.register_forward_hook(_mc_attention_hook)
+
+@contextmanager
+def mc_dropout(keep):
+    """Sample dropout on batch rows [keep:] for forwards on this thread."""
+    _mc_state.keep = keep
+    try:
+        yield
+    finally:
+        _mc_state.keep = None
+
+
 # ── Model Manager ─────────────────────────────────────────────────────
 
 class ModelV4Manager:
-    def __init__(self):
+    """One zone's model set (see zones.py for the pool that holds several)."""
+    def __init__(self, zone=DEFAULT_ZONE, store=None, history_path=PREPROCESSED_CSV):
+        self.zone = zone
+        self.store = store or artifacts.store
+        self.history_path = history_path  # sizes the history share of the memory plan
+        self.label = "" if zone == DEFAULT_ZONE else f" [{zone}]"
         self.device = torch.device('cpu') # Use CPU for production inference
         self.xgb_model = None
+        self.xgb_predictor = None
         self.dl_ensemble = []
+        self.dl_paths = []
         self.feature_scaler = None
         self.target_scaler = None
+        self.scaling = None
+        self.blend_alpha = BLEND_ALPHA
         self.config = None
         self.loaded = False
+        self._load_lock = threading.Lock()
+        self._resize_lock = threading.Lock()
 
     def load(self):
-        """Load all models and scalers into memory."""
-        print("🚀 Loading V4 Hybrid Model components...")
-        
-        # ── HF Hub Integration ──────────────────────────────────────────
-        global CONFIG_PATH, FEATURE_SCALER_PATH, TARGET_SCALER_PATH, XGB_MODEL_PATH, DL_MODEL_PATHS
-        repo_id = (os.environ.get('HF_REPO_ID') or "vidhyaramu/voltcast-v4").strip()
-        
-        # Check if we should skip network sync (saves 3-5 seconds on cold start)
-        already_synced = os.path.exists(XGB_MODEL_PATH) and os.path.getsize(XGB_MODEL_PATH) > 1000
-        
-        if repo_id and not already_synced:
-            from huggingface_hub import hf_hub_download
-            print(f"📦 First-time Cloud Sync for '{repo_id}'...")
+        """Load all models and scalers into memory (no-op once loaded)."""
+        with self._load_lock:
+            if self.loaded:
+                telemetry.inc("voltcast_cache_hits_total", cache="models")
+                return
+            telemetry.inc("voltcast_cache_misses_total", cache="models")
             try:
-                # Fetch all core artifacts
-                CONFIG_PATH = hf_hub_download(repo_id=repo_id, filename="config.joblib")
-                FEATURE_SCALER_PATH = hf_hub_download(repo_id=repo_id, filename="feature_scaler.joblib")
-                TARGET_SCALER_PATH = hf_hub_download(repo_id=repo_id, filename="target_scaler.joblib")
-                XGB_MODEL_PATH = hf_hub_download(repo_id=repo_id, filename="xgb_v4.joblib")
-                
-                # Fetch ensemble
-                new_dl_paths = []
-                for i in range(len(DL_MODEL_PATHS)):
-                    fname = f"residual_ensemble_seed_{i}.pth"
-                    new_dl_paths.append(hf_hub_download(repo_id=repo_id, filename=fname))
-                DL_MODEL_PATHS = new_dl_paths
-                print("✨ Cloud weights synchronized.")
-            except Exception as e:
-                print(f"⚠️ Sync skipped: {e}")
-        elif already_synced:
-            print("🚀 Using cached weights (Turbo Load).")
-        else:
-            print("ℹ️ No HF_REPO_ID found. Using local paths.")
+                with telemetry.stage("model_load"):
+                    self._load()
+            except Exception:
+                # Release whatever loaded before the failure, and don't leave
+                # a plan for a model set that never loaded in /api/health
+                with self._resize_lock:
+                    self._clear()
+                resources.governor.forget(self.zone)
+                raise
 
-        import time, gc
-        is_cloud = os.environ.get('RENDER') or os.environ.get('PORT')
+    def unload(self):
+        """Drop every loaded component (pool eviction); load() brings them back."""
+        with self._load_lock, self._resize_lock:
+            if not self.loaded:
+                return
+            self._clear()
+            print(f"📤 Model set unloaded{self.label}.")
+
+    def _clear(self):
+        self.loaded = False
+        self.xgb_model = self.xgb_predictor = None
+        self.feature_scaler = self.target_scaler = self.scaling = None
+        self.dl_ensemble = []
+        resources.governor.report("ensemble", 0, 0, zone=self.zone)
+        resources.release_memory()
+
+    def _load(self):
+        print(f"🚀 Loading V4 Hybrid Model components{self.label}...")
+        
+        # ── Artifacts (manifest-verified cache, see artifacts.py) ──────
+        paths = self.store.sync()
+        self.dl_paths = [paths[name] for name in artifacts.DL_FILES if name in paths]
+
+        import gc
         
         # 1. Load config and scalers
-        self.config = joblib.load(CONFIG_PATH)
-        self.feature_scaler = joblib.load(FEATURE_SCALER_PATH)
-        self.target_scaler = joblib.load(TARGET_SCALER_PATH)
+        self.config = joblib.load(paths[artifacts.CONFIG_FILE])
+        self.feature_scaler = joblib.load(paths[artifacts.FEATURE_SCALER_FILE])
+        self.target_scaler = joblib.load(paths[artifacts.TARGET_SCALER_FILE])
+        self.scaling = ScalingPlan(self.config, self.feature_scaler, self.target_scaler)
+        self.blend_alpha = self.config.get('BLEND_ALPHA', BLEND_ALPHA)  # written by train_v4.py
         print("📊 Scalers ready...")
         gc.collect()
 
-        # 2. Load XGBoost
-        self.xgb_model = joblib.load(XGB_MODEL_PATH)
-        print("🌲 XGBoost ready...")
+        # 2. Load XGBoost (+ packed trees for small batches, see tree_predictor.py)
+        self.xgb_model = joblib.load(paths[artifacts.XGB_FILE])
+        forest_path = paths.get(artifacts.FOREST_FILE)
+        forest = PackedForest.load(forest_path) if forest_path and os.path.exists(forest_path) else None
+        if forest is not None and forest.source != self.store.sha256(artifacts.XGB_FILE):
+            # Packed from another xgb_v4.joblib (or before sources were recorded): stale
+            print(f"⚠️ {artifacts.FOREST_FILE} does not match {artifacts.XGB_FILE}; using the booster.")
+            forest = None
+        self.xgb_predictor = TreePredictor(self.xgb_model, forest,
+                                           nthread=XGB_NTHREAD or inference_pool.pool.threads)
+        print(f"🌲 XGBoost ready ({self.xgb_predictor.mode})...")
         gc.collect()
 
         # 3. Load DL Ensemble
-        # Cloud-Adaptive Logic: Only load 1 model on Render to stay under 512MB RAM
-        # Load full 3-model ensemble on Localhost for max power.
-        n_feat_aug = self.config['N_FEATURES'] + 1 
-        ensemble_limit = 1 if is_cloud else len(DL_MODEL_PATHS)
-        
-        if is_cloud:
-            print("☁️ Cloud Detected: Running in 'Lite Mode' (1-Model Ensemble) to save RAM.")
-        
-        for i in range(ensemble_limit):
-            path = DL_MODEL_PATHS[i]
-            model = ResidualPredictor(
-                n_features=n_feat_aug,
-                pred_len=self.config['OUTPUT_LEN']
-            )
-            model.load_state_dict(torch.load(path, map_location=self.device, weights_only=True))
-            model.eval()
-            self.dl_ensemble.append(model)
-            print(f"🧠 DL Model {i+1}/{ensemble_limit} ready...")
-            gc.collect()
-            time.sleep(1) 
+        # As many members as the memory budget allows (see resources.py);
+        # the governor can shrink or grow this at runtime.
+        plan = resources.governor.plan(self.member_sizes(), zone=self.zone, history_path=self.history_path)
+        self.resize_ensemble(plan["members"])
             
         self.loaded = True
-        print(f"✅ Engine Sync Complete ({'Lite' if is_cloud else 'Full'} Mode).")
+        print(f"✅ Engine Sync Complete{self.label} ({len(self.dl_ensemble)}/{len(self.dl_paths)} ensemble members).")
         gc.collect()
 
-    def predict(self, X_window_raw):
+    def resize_ensemble(self, n_members):
+        """
+        Grow or shrink the DL ensemble to the first n_members seeds.
+        In-flight predictions keep the list they started with.
+        """
+        import time, gc
+        n_members = max(0, min(n_members, len(self.dl_paths)))
+        with self._resize_lock:
+            ensemble = list(self.dl_ensemble)
+            if n_members < len(ensemble):
+                print(f"📉 Shrinking DL ensemble{self.label} {len(ensemble)} -> {n_members} to fit the memory budget.")
+                ensemble = ensemble[:n_members]
+                self.dl_ensemble = ensemble
+                resources.release_memory()
+
+            n_feat_aug = self.config['N_FEATURES'] + 1 
+            for i in range(len(ensemble), n_members):
+                path = self.dl_paths[i]
+                model = ResidualPredictor(
+                    n_features=n_feat_aug,
+                    pred_len=self.config['OUTPUT_LEN']
+                )
+                model.load_state_dict(torch.load(path, map_location=self.device, weights_only=True))
+                model.eval()
+                enable_mc_dropout(model)
+                ensemble.append(model)
+                self.dl_ensemble = list(ensemble)
+                print(f"🧠 DL Model {i+1}/{n_members} ready{self.label}...")
+                gc.collect()
+                time.sleep(1) 
+
+            unit = max((resources.member_bytes(size) for size in self.member_sizes()), default=0)
+            resources.governor.report("ensemble", len(self.dl_ensemble), unit, zone=self.zone)
+
+    def member_sizes(self):
+        """On-disk size of each ensemble member (from the manifest before any download)."""
+        return [self.store.size(name) for name in artifacts.DL_FILES]
+
+    def xgb_size(self):
+        return self.store.size(artifacts.XGB_FILE)
+
+    def predict(self, X_window_raw, mc_samples=0):
         """
         Perform blended hybrid inference.
         X_window_raw: last 168h of data (DataFrame with correct columns)
-        Returns: (168,) array of load predictions in MW
+        Returns: dict of (168,) lists of load predictions in MW
+        """
+        out = self.predict_batch([X_window_raw], mc_samples=mc_samples)
+        return {k: v[0].tolist() for k, v in out.items()}
+
+    def predict_batch(self, windows, mc_samples=0):
+        """
+        Blended hybrid inference for several windows at once: one XGBoost call
+        and one forward pass per ensemble member for the whole batch.
+        windows: list of DataFrames with FEATURE_COLS, or an (N, 168, F) array in FEATURE_COLS order
+        mc_samples: K > 0 adds K MC-dropout draws per member, folded into the
+            batch dimension of the same forward pass, and returns FORECAST_QUANTILES
+            (e.g. "p10"/"p50"/"p90") plus the pooled "samples" (N, members*K, 168)
+        Returns: dict of (N, 168) arrays in MW
+        Raises inference_pool.InferenceBusy when no inference slot frees up in time.
         """
         if not self.loaded:
             self.load()
+        with inference_pool.pool.slot():
+            return self._predict_batch(windows, mc_samples)
 
+    def _predict_batch(self, windows, mc_samples):
         # 1. Scale input features
-        # Training logic: numerical columns scaled, sin/cos not, load scaled separately.
-        # But wait, X_window should already have FEATURE_COLS in correct order.
-        X_raw = X_window_raw.copy()
-        
-        # Scale numerical parts
-        num_cols = self.config['NUMERICAL_COLS']
-        X_raw = X_raw.ffill().bfill().fillna(0.0) # Ensure no NaNs before scaling
-        X_raw[num_cols] = self.feature_scaler.transform(X_raw[num_cols])
-        
-        # Scale load column
-        target_col = self.config['TARGET_COL']
-        X_raw[[target_col]] = self.target_scaler.transform(X_raw[[target_col]])
-        
-        # order features as per training
-        X_scaled = X_raw[self.config['FEATURE_COLS']].values.astype(np.float32)
+        # Training logic: numerical columns scaled, sin/cos not, load scaled separately
+        # (precompiled into one affine transform, see scaling.py).
+        with telemetry.stage("scaling"):
+            X_scaled = self.scaling.transform(windows) # (N, 168, F)
         
         # 2. XGBoost Prediction (Base)
-        # Engineer stats from current window
-        load_idx = self.config['load_col_idx']
-        Xf_xgb = engineer_xgb_features(X_scaled, load_idx) # (1, n_xgb_feats)
-        xgb_pred_scaled = self.xgb_model.predict(Xf_xgb.reshape(1, -1))[0] # (168,)
+        # Engineer stats from each window
+        with telemetry.stage("xgboost"):
+            load_idx = self.config['load_col_idx']
+            Xf_xgb = np.stack([engineer_xgb_features(x, load_idx) for x in X_scaled]) # (N, n_xgb_feats)
+            xgb_pred_scaled = self.xgb_predictor.predict(Xf_xgb) # (N, 168)
         
         # 3. DL Residual Prediction
-        # Augment DL input: (1, 168, N+1)
-        X_dl_aug = np.concatenate([X_scaled, xgb_pred_scaled[:, None]], axis=-1)
-        X_tensor = torch.tensor(X_dl_aug, dtype=torch.float32).unsqueeze(0).to(self.device)
+        # Augment DL input: (N, 168, F+1)
+        X_dl_aug = np.concatenate([X_scaled, xgb_pred_scaled[:, :, None]], axis=-1)
+        X_tensor = torch.tensor(X_dl_aug, dtype=torch.float32).to(self.device)
+        n = len(X_tensor)
+        if mc_samples:
+            # rows [0, n) deterministic, then K stochastic copies of the batch
+            X_tensor = torch.cat([X_tensor, X_tensor.repeat(mc_samples, 1, 1)])
         
-        res_preds = []
-        with torch.no_grad():
-            for model in self.dl_ensemble:
-                res_preds.append(model(X_tensor).cpu().numpy()[0])
+        res_preds, res_samples = [], []
+        ensemble = self.dl_ensemble # snapshot: the governor may resize concurrently
+        with torch.no_grad(), mc_dropout(n if mc_samples else None):
+            for i, model in enumerate(ensemble):
+                with telemetry.stage(f"dl_member_{i}"):
+                    out = model(X_tensor).cpu().numpy()
+                res_preds.append(out[:n])
+                if mc_samples:
+                    res_samples.append(out[n:].reshape(mc_samples, n, -1))
         
-        avg_res_scaled = np.mean(res_preds, axis=0) # (168,)
+        avg_res_scaled = np.mean(res_preds, axis=0) # (N, 168)
         
         # 4. Blending (Optimized Alpha)
         # hybrid = XGB + Residual
         # final = α * hybrid + (1-α) * XGB
         # note: final = XGB + α * Residual
-        final_pred_scaled = xgb_pred_scaled + (BLEND_ALPHA * avg_res_scaled)
+        # 5. Inverse Scale (folded into the blend output)
+        final_pred_mw = self.scaling.inverse_target(xgb_pred_scaled + self.blend_alpha * avg_res_scaled)
+        xgb_pred_mw   = self.scaling.inverse_target(xgb_pred_scaled)
         
-        # 5. Inverse Scale
-        final_pred_mw = self.target_scaler.inverse_transform(final_pred_scaled.reshape(-1, 1)).flatten()
-        xgb_pred_mw   = self.target_scaler.inverse_transform(xgb_pred_scaled.reshape(-1, 1)).flatten()
-        
-        return {
-            "prediction": np.nan_to_num(final_pred_mw).tolist(),
-            "xgb_base": np.nan_to_num(xgb_pred_mw).tolist(),
-            "residual_correction": np.nan_to_num(final_pred_mw - xgb_pred_mw).tolist()
+        result = {
+            "prediction": np.nan_to_num(final_pred_mw),
+            "xgb_base": np.nan_to_num(xgb_pred_mw),
+            "residual_correction": np.nan_to_num(final_pred_mw - xgb_pred_mw)
         }
 
+        # 6. Predictive distribution: pool (members x K) samples per window
+        if mc_samples:
+            res_samples = np.stack(res_samples).transpose(2, 0, 1, 3).reshape(n, -1, xgb_pred_scaled.shape[-1])
+            samples_mw = np.nan_to_num(self.scaling.inverse_target(xgb_pred_scaled[:, None, :] + self.blend_alpha * res_samples))
+            for q, values in zip(FORECAST_QUANTILES, np.quantile(samples_mw, FORECAST_QUANTILES, axis=1)):
+                result[f"p{round(q * 100)}"] = values
+            result["samples"] = samples_mw
+        return result
+
 # Singleton instance
 model_manager = ModelV4Manager()
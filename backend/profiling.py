@@ -0,0 +1,280 @@
+"""
+On-demand per-request profiling.
+A request with ?profile=cpu,mem,speedscope (any combination) is captured while
+it runs and its artifacts are stored under PROFILE_DIR/<id>/:
+  cpu         cProfile -> cpu.pstats (+ cpu.txt, top functions by cumulative time)
+  speedscope  stack sampler -> speedscope.json (open in https://www.speedscope.app)
+  mem         tracemalloc -> mem.json (top allocation sites still alive at the
+              end of the request, Python peak and RSS before/after)
+cProfile and tracemalloc are process-wide, so only one request is profiled
+at a time (ProfilerBusy). Allocations made by torch kernels are not traced by
+tracemalloc; they show up in the RSS delta.
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+import resources
+import telemetry
+from config import (PROFILING_ENABLED, PROFILING_TOKEN, PROFILE_DIR, PROFILE_KEEP,
+                    PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MEM_FRAMES, PROFILE_MEM_TOP)
+
+MODES = ("cpu", "mem", "speedscope")
+FILES = ("meta.json", "cpu.pstats", "cpu.txt", "speedscope.json", "mem.json")
+ID_PATTERN = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+CPU_TOP = 40
+MB = 1024 * 1024
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    def __init__(self):
+        super().__init__("Another request is being profiled; try again shortly")
+
+
+def enabled():
+    return PROFILING_ENABLED or bool(PROFILING_TOKEN)
+
+
+def authorized(token):
+    """Whether a caller presenting `token` may profile and read profiles."""
+    if not enabled():
+        return False
+    if not PROFILING_TOKEN:
+        return True
+    return hmac.compare_digest((token or "").encode(), PROFILING_TOKEN.encode())
+
+
+def parse_modes(value):
+    modes = [m.strip() for m in value.split(",") if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if not modes or unknown:
+        raise ValueError(f"profile must be a comma-separated subset of {MODES}")
+    return list(dict.fromkeys(modes))
+
+
+# ── Stack sampler (speedscope) ─────────────────────────────────────────
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every `interval` seconds."""
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        super().__init__(daemon=True, name="profile-sampler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []          # speedscope shared frames
+        self._frame_index = {}    # (name, file, line) -> index
+        self.samples = []         # root-first frame indices
+        self.weights = []         # seconds each sample stands for
+        self._stop_event = threading.Event()
+
+    def _index(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        idx = self._frame_index.get(key)
+        if idx is None:
+            idx = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return idx
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(self._index(frame.f_code))
+                frame = frame.f_back
+            self.samples.append(stack[::-1])
+            self.weights.append(now - last)
+            last = now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def speedscope(self, name):
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(self.weights),
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "voltcast profiling.py",
+        }
+
+
+# ── Session ────────────────────────────────────────────────────────────
+
+class ProfileSession:
+    """Profiles the calling thread from start() until finish()."""
+    def __init__(self, modes, label):
+        self.modes = modes
+        self.label = label
+        self.id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.profiler = None
+        self.sampler = None
+        self.mem_before = None
+        self.stop_tracemalloc = False
+        self.rss_before = 0
+        self.t0 = 0.0
+
+    def start(self):
+        if "mem" in self.modes:
+            self.rss_before = resources.rss_bytes()
+            if tracemalloc.is_tracing():
+                self.mem_before = tracemalloc.take_snapshot()   # already tracing: report the diff
+            else:
+                tracemalloc.start(PROFILE_MEM_FRAMES)
+                self.stop_tracemalloc = True
+            tracemalloc.reset_peak()
+        if "speedscope" in self.modes:
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+        self.t0 = time.perf_counter()
+        if "cpu" in self.modes:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def finish(self, status):
+        """Stop every collector, write the artifacts and return the metadata."""
+        try:
+            if self.profiler:
+                self.profiler.disable()
+            duration = time.perf_counter() - self.t0
+            if self.sampler:
+                self.sampler.stop()
+            mem = self._memory() if "mem" in self.modes else None
+        finally:
+            _busy.release()
+        return self._write(status, duration, mem)
+
+    def _memory(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stop_tracemalloc:
+            tracemalloc.stop()
+        if self.mem_before is not None:
+            stats = snapshot.compare_to(self.mem_before, "traceback")
+            top = [{"size_diff_kb": round(s.size_diff / 1024, 1), "count_diff": s.count_diff,
+                    "size_kb": round(s.size / 1024, 1), "traceback": s.traceback.format()}
+                   for s in stats[:PROFILE_MEM_TOP]]
+        else:
+            stats = snapshot.statistics("traceback")
+            top = [{"size_kb": round(s.size / 1024, 1), "count": s.count, "traceback": s.traceback.format()}
+                   for s in stats[:PROFILE_MEM_TOP]]
+        rss_after = resources.rss_bytes()
+        return {
+            "python_current_mb": round(current / MB, 2),
+            "python_peak_mb": round(peak / MB, 2),
+            "rss_before_mb": round(self.rss_before / MB, 1),
+            "rss_after_mb": round(rss_after / MB, 1),
+            "rss_delta_mb": round((rss_after - self.rss_before) / MB, 1),
+            "top_allocations": top,
+        }
+
+    def _write(self, status, duration, mem):
+        out = os.path.join(PROFILE_DIR, self.id)
+        os.makedirs(out, exist_ok=True)
+        meta = {
+            "id": self.id,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "request": self.label,
+            "status": status,
+            "modes": self.modes,
+            "duration_ms": round(duration * 1000, 1),
+        }
+        if self.profiler:
+            self.profiler.dump_stats(os.path.join(out, "cpu.pstats"))
+            text = io.StringIO()
+            pstats.Stats(self.profiler, stream=text).sort_stats("cumulative").print_stats(CPU_TOP)
+            with open(os.path.join(out, "cpu.txt"), "w") as f:
+                f.write(text.getvalue())
+        if self.sampler:
+            with open(os.path.join(out, "speedscope.json"), "w") as f:
+                json.dump(self.sampler.speedscope(f"{self.label} ({self.id})"), f)
+            meta["samples"] = len(self.sampler.samples)
+        if mem is not None:
+            with open(os.path.join(out, "mem.json"), "w") as f:
+                json.dump(mem, f, indent=1)
+            meta["memory"] = {k: v for k, v in mem.items() if k != "top_allocations"}
+        meta["files"] = [name for name in FILES[1:] if os.path.exists(os.path.join(out, name))]
+        with open(os.path.join(out, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=1)
+        prune()
+        for mode in self.modes:
+            telemetry.inc("voltcast_profiles_total", mode=mode)
+        return meta
+
+
+def begin(modes, label):
+    """Start profiling the calling thread; raises ProfilerBusy if another request holds the profiler."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy()
+    session = ProfileSession(modes, label)
+    try:
+        session.start()
+    except BaseException:
+        _busy.release()
+        raise
+    return session
+
+
+# ── Stored profiles ────────────────────────────────────────────────────
+
+def list_profiles():
+    """Metadata of stored profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for pid in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        meta = load_meta(pid)
+        if meta:
+            out.append(meta)
+    return out
+
+
+def load_meta(pid):
+    path = artifact_path(pid, "meta.json")
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def artifact_path(pid, name):
+    """Path of one stored artifact, or None (unknown id/name or missing file)."""
+    if not ID_PATTERN.match(pid) or name not in FILES:
+        return None
+    path = os.path.join(PROFILE_DIR, pid, name)
+    return path if os.path.exists(path) else None
+
+
+def prune(keep=PROFILE_KEEP):
+    """Delete all but the newest `keep` profiles."""
+    ids = sorted(p for p in os.listdir(PROFILE_DIR) if ID_PATTERN.match(p))
+    for pid in ids[:-keep] if keep else []:
+        shutil.rmtree(os.path.join(PROFILE_DIR, pid), ignore_errors=True)
@@ -0,0 +1,305 @@
+"""
+Memory-budget governor.
+Reads the container memory limit (cgroup v2/v1, else physical RAM) and the
+process RSS, estimates what each ensemble member and history row costs, and
+picks the largest ensemble and history tail that fit.
+"""
+import gc
+import os
+import threading
+import time
+from datetime import datetime
+import telemetry
+from config import (PREPROCESSED_CSV, DEFAULT_ZONE, MEMORY_LIMIT_MB, MEMORY_TARGET_FRACTION, MEMORY_HEADROOM_MB,
+                    MEMORY_GROW_MARGIN_MB, MIN_ENSEMBLE_MEMBERS, HISTORY_MIN_ROWS, HISTORY_MAX_ROWS,
+                    DL_MEMBER_MEMORY_FACTOR, XGB_MEMORY_FACTOR, HISTORY_CELL_BYTES, GOVERNOR_INTERVAL_S)
+
+MB = 1024 * 1024
+_CGROUP_LIMIT_FILES = (
+    "/sys/fs/cgroup/memory.max",                    # cgroup v2
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",  # cgroup v1
+)
+_UNLIMITED = 1 << 60  # cgroup v1 reports "no limit" as a huge page-aligned number
+_CGROUP_CPU_FILES = (
+    ("/sys/fs/cgroup/cpu.max", None),                                      # cgroup v2: "<quota> <period>"
+    ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),  # cgroup v1
+)
+
+_shape_cache = {}
+
+
+# ── Probes ─────────────────────────────────────────────────────────────
+
+def _meminfo():
+    """/proc/meminfo as {field: bytes} (empty off Linux)."""
+    info = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                info[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    return info
+
+
+def memory_limit_bytes():
+    """Memory this process may use: VOLTCAST_MEMORY_LIMIT_MB, else the cgroup limit, else physical RAM."""
+    if MEMORY_LIMIT_MB:
+        return int(MEMORY_LIMIT_MB * MB)
+    total = _meminfo().get("MemTotal")
+    for path in _CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                raw = f.read().strip()
+        except OSError:
+            continue
+        if raw != "max" and int(raw) < _UNLIMITED:
+            return min(int(raw), total) if total else int(raw)
+        break
+    return total
+
+
+def cpu_count():
+    """CPUs this process may use: affinity mask, capped by the cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    for quota_path, period_path in _CGROUP_CPU_FILES:
+        try:
+            with open(quota_path) as f:
+                fields = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    fields.append(f.read().strip())
+        except OSError:
+            continue
+        if fields[0] not in ("max", "-1"):
+            cpus = min(cpus, max(1, int(int(fields[0]) / int(fields[1]))))
+        break
+    return cpus
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak; best effort off Linux
+
+
+def release_memory():
+    """Collect garbage and hand freed heap pages back to the OS so RSS reflects a shrink."""
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+# ── Footprint estimates ────────────────────────────────────────────────
+
+def member_bytes(file_size):
+    """Estimated resident cost of one residual model with this on-disk size."""
+    return int(file_size * DL_MEMBER_MEMORY_FACTOR)
+
+
+def xgb_bytes(file_size):
+    """Estimated resident cost of an XGBoost model with this on-disk size."""
+    return int(file_size * XGB_MEMORY_FACTOR)
+
+
+def history_shape(path=PREPROCESSED_CSV):
+    """(data rows, columns) of the history CSV, cached per file mtime."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return 0, 0
+    cached = _shape_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        n_cols = f.readline().count(b",") + 1
+        rows = 0
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            rows += chunk.count(b"\n")
+        # last line without a trailing newline
+        f.seek(-1, os.SEEK_END)
+        if f.tell() > 0 and f.read(1) != b"\n":
+            rows += 1
+    _shape_cache[path] = (mtime, (rows, n_cols))
+    return rows, n_cols
+
+
+def history_row_bytes(n_cols):
+    """Estimated resident cost of one loaded history row."""
+    return n_cols * HISTORY_CELL_BYTES
+
+
+def model_set_floor_bytes(xgb_size, member_sizes, history_path=PREPROCESSED_CSV):
+    """Smallest useful footprint of one zone's model set: XGBoost, minimum ensemble and history."""
+    total_rows, n_cols = history_shape(history_path)
+    members = min(MIN_ENSEMBLE_MEMBERS, len(member_sizes))
+    return (xgb_bytes(xgb_size)
+            + members * max((member_bytes(size) for size in member_sizes), default=0)
+            + min(HISTORY_MIN_ROWS, total_rows) * history_row_bytes(n_cols))
+
+
+# ── Governor ───────────────────────────────────────────────────────────
+
+def _fit(room, unit, held, lo, hi):
+    """Units of size `unit` that fit in `room`; growing past `held` must also clear the margin."""
+    if unit <= 0:
+        return hi
+    n = int(room // unit)
+    if n > held:
+        n = max(held, int((room - MEMORY_GROW_MARGIN_MB * MB) // unit))
+    return max(lo, min(hi, n))
+
+
+def _key(component, zone):
+    return component if zone == DEFAULT_ZONE else f"{component}:{zone}"
+
+
+class MemoryGovernor:
+    """
+    Plans the adjustable footprint (ensemble members, history rows) against
+    the memory budget. Components report what they hold via report(); plan()
+    treats the rest of RSS as fixed and fills the remaining budget, ensemble
+    first (accuracy), then history. With several zones loaded, each zone is
+    planned on its own and the other zones count as fixed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebalancing = threading.Lock()
+        self.usage = {}          # component[:zone] -> (units held, bytes per unit)
+        self.decisions = {}      # zone -> latest plan
+        self.last_plan_at = 0.0
+
+    @property
+    def decision(self):
+        return self.decisions.get(DEFAULT_ZONE)
+
+    def report(self, component, units, unit_bytes, zone=DEFAULT_ZONE):
+        """Record what a component currently holds (e.g. "ensemble", 3 members, 5 MB each)."""
+        with self._lock:
+            self.usage[_key(component, zone)] = (units, unit_bytes)
+        telemetry.set_gauge("voltcast_memory_component_bytes", units * unit_bytes, component=component, zone=zone)
+
+    def forget(self, zone):
+        """Drop everything a zone reported (its model set was evicted)."""
+        with self._lock:
+            for component in ("ensemble", "history"):
+                if self.usage.pop(_key(component, zone), None) is not None:
+                    telemetry.set_gauge("voltcast_memory_component_bytes", 0, component=component, zone=zone)
+            self.decisions.pop(zone, None)
+
+    def held(self, component, zone=DEFAULT_ZONE):
+        return self.usage.get(_key(component, zone), (0, 0))[0]
+
+    def budget(self):
+        """(limit, budget, rss) in bytes; limit/budget are None when unknown."""
+        limit = memory_limit_bytes()
+        rss = rss_bytes()
+        budget = int(limit * MEMORY_TARGET_FRACTION) if limit else None
+        available = _meminfo().get("MemAvailable")
+        if available:  # never plan past what the host can actually give us
+            budget = min(budget, rss + available) if budget else rss + available
+        return limit, budget, rss
+
+    def plan(self, member_sizes, pending_bytes=0, zone=DEFAULT_ZONE, history_path=PREPROCESSED_CSV):
+        """
+        Largest ensemble (up to len(member_sizes), in seed order) and history tail that fit.
+        pending_bytes: fixed cost about to be loaded that RSS does not show yet.
+        Returns the decision dict (also kept in self.decisions for /api/health).
+        """
+        limit, budget, rss = self.budget()
+        with self._lock:
+            adjustable = sum(units * unit for key, (units, unit) in self.usage.items()
+                             if key in (_key("ensemble", zone), _key("history", zone)))
+            held_members, held_rows = self.held("ensemble", zone), self.held("history", zone)
+
+        fixed = rss - adjustable + pending_bytes
+
+        total_rows, n_cols = history_shape(history_path)
+        row_bytes = history_row_bytes(n_cols)
+        max_rows = min(total_rows, HISTORY_MAX_ROWS or total_rows)
+        min_rows = min(HISTORY_MIN_ROWS, max_rows)
+        unit = max((member_bytes(size) for size in member_sizes), default=0)
+
+        if budget:
+            free = budget - fixed - MEMORY_HEADROOM_MB * MB
+            members = _fit(free - min_rows * row_bytes, unit, held_members,
+                           min(MIN_ENSEMBLE_MEMBERS, len(member_sizes)), len(member_sizes))
+            rows = _fit(free - members * unit, row_bytes, held_rows, min_rows, max_rows)
+            fits = free >= members * unit + rows * row_bytes
+        else:
+            # No known limit (no cgroup or /proc/meminfo, e.g. macOS): load everything
+            members, rows, fits = len(member_sizes), max_rows, True
+
+        decision = {
+            "zone": zone,
+            "limit_mb": round(limit / MB, 1) if limit else None,
+            "budget_mb": round(budget / MB, 1) if budget else None,
+            "rss_mb": round(rss / MB, 1),
+            "fixed_mb": round(fixed / MB, 1),
+            "members": members,
+            "max_members": len(member_sizes),
+            "member_mb": round(unit / MB, 2),
+            "history_rows": rows,
+            "max_history_rows": max_rows,
+            "history_row_bytes": row_bytes,
+            "fits": fits,
+            "planned_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        previous = self.decisions.get(zone)
+        self.decisions[zone] = decision
+        self.last_plan_at = time.monotonic()
+        if not previous or (previous["members"], previous["history_rows"]) != (members, rows):
+            label = "" if zone == DEFAULT_ZONE else f" [{zone}]"
+            print(f"🧮 Memory plan{label}: {members}/{len(member_sizes)} ensemble members, {rows:,} history rows "
+                  f"(limit {decision['limit_mb']} MB, RSS {decision['rss_mb']} MB)")
+
+        if limit:
+            telemetry.set_gauge("voltcast_memory_limit_bytes", limit)
+        telemetry.set_gauge("voltcast_memory_rss_bytes", rss)
+        telemetry.set_gauge("voltcast_planned_ensemble_members", members, zone=zone)
+        telemetry.set_gauge("voltcast_planned_history_rows", rows, zone=zone)
+        return decision
+
+    def due(self):
+        """True when a runtime re-plan is allowed (rate-limited, one at a time)."""
+        return (time.monotonic() - self.last_plan_at >= GOVERNOR_INTERVAL_S
+                and not self._rebalancing.locked())
+
+    def run_exclusive(self, fn):
+        """Run a rebalance unless one is already in progress."""
+        if not self._rebalancing.acquire(blocking=False):
+            return None
+        try:
+            return fn()
+        finally:
+            self._rebalancing.release()
+
+    def status(self):
+        """Current usage and the latest decision, for /api/health."""
+        with self._lock:
+            usage = {name: {"units": units, "mb": round(units * unit / MB, 1)}
+                     for name, (units, unit) in self.usage.items()}
+        limit = memory_limit_bytes()
+        return {
+            "limit_mb": round(limit / MB, 1) if limit else None,
+            "rss_mb": round(rss_bytes() / MB, 1),
+            "usage": usage,
+            "decision": self.decision,
+            "zone_decisions": {z: d for z, d in self.decisions.items() if z != DEFAULT_ZONE},
+        }
+
+
+# Singleton instance
+governor = MemoryGovernor()
@@ -0,0 +1,116 @@
+"""
+Pre-serialized response cache.
+Payloads that only change with a file (training metrics) or never change once
+written (completed forecasts) are serialized and gzipped once and kept as
+bytes with a strong ETag. Repeat requests are answered from memory, or with
+304 Not Modified when the client already holds the same representation.
+Entries are per process: with several gunicorn workers, DELETE only
+invalidates the worker that served it.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import Response, request, current_app
+import telemetry
+from config import RESPONSE_CACHE_MAX_MB, RESPONSE_CACHE_MIN_GZIP_BYTES
+
+MB = 1024 * 1024
+
+
+class CachedResponse:
+    """One JSON payload as identity and gzip bytes, each with its own strong ETag."""
+    __slots__ = ("version", "body", "gzipped", "etag", "etag_gzip")
+
+    def __init__(self, payload, version=None):
+        self.version = version
+        self.body = current_app.json.response(payload).get_data()  # same bytes jsonify() would send
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = digest
+        if len(self.body) >= RESPONSE_CACHE_MIN_GZIP_BYTES:
+            self.gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self.etag_gzip = digest + "-gz"  # a different representation needs a different strong ETag
+        else:
+            self.gzipped, self.etag_gzip = None, None
+
+    @property
+    def nbytes(self):
+        return len(self.body) + len(self.gzipped or b"")
+
+
+class ResponseCache:
+    """LRU of CachedResponse entries, bounded by total bytes."""
+    def __init__(self, max_bytes=int(RESPONSE_CACHE_MAX_MB * MB)):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version=None, build=None):
+        """
+        Entry for key if its version matches; otherwise build() -> payload is
+        serialized and stored (returns None when build returns None, e.g. 404).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                telemetry.inc("voltcast_cache_hits_total", cache="response")
+                return entry
+        telemetry.inc("voltcast_cache_misses_total", cache="response")
+        if build is None:
+            return None
+        payload = build()
+        if payload is None:
+            return None
+        entry = CachedResponse(payload, version)
+        self.put(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def invalidate(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "mb": round(self._bytes / MB, 2)}
+
+
+def respond(entry):
+    """Serve a CachedResponse for the current request: 304, gzip or identity."""
+    use_gzip = entry.gzipped is not None and "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = entry.etag_gzip if use_gzip else entry.etag
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.gzipped if use_gzip else entry.body, mimetype="application/json")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # always revalidate; a 304 costs almost nothing
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+# Singleton instance
+cache = ResponseCache()
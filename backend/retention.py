@@ -0,0 +1,303 @@
+"""
+Retention for the forecasts database.
+Requests older than RETENTION_FULL_DAYS are archived (one compressed .npz of
+columnar arrays per batch), folded into per-zone daily rollups and deleted;
+rollups older than RETENTION_ROLLUP_DAYS are dropped. Freed pages are then
+returned to the OS with incremental vacuum, so the file, queries and backups
+stay bounded in long-running deployments.
+
+Usage:
+    python retention.py            run one pass now (and convert a pre-retention
+                                   database to incremental auto-vacuum)
+    python retention.py --dry-run  report what a pass would remove
+
+The one-time conversion is a full VACUUM, which locks the whole database, so
+passes started by the server skip it and only the CLI runs it.
+
+Archive layout (np.load): req_id, req_zone, req_created_at, req_forecast_start,
+req_status, req_peak_load, then one row per result: request_id, hour_offset,
+timestamp (datetime64[s]), predicted_load, xgb_load, dl_residual (NaN for NULL).
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import database as db
+import telemetry
+from config import (RETENTION_FULL_DAYS, RETENTION_ROLLUP_DAYS, RETENTION_ARCHIVE, ARCHIVE_DIR,
+                    RETENTION_INTERVAL_S, RETENTION_BATCH, VACUUM_PAGES_PER_PASS)
+
+SQLITE_TIME = "%Y-%m-%d %H:%M:%S"  # format of CURRENT_TIMESTAMP (UTC)
+
+UPSERT_ROLLUP = """
+    INSERT INTO daily_rollups
+        (zone, day, forecasts, hours, load_sum, peak_load, peak_hour, min_load,
+         actual_hours, error_sum, abs_error_sum, pct_error_sum)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(zone, day) DO UPDATE SET
+        forecasts     = forecasts + excluded.forecasts,
+        hours         = hours + excluded.hours,
+        load_sum      = load_sum + excluded.load_sum,
+        peak_hour     = CASE WHEN excluded.peak_load > peak_load THEN excluded.peak_hour ELSE peak_hour END,
+        peak_load     = MAX(peak_load, excluded.peak_load),
+        min_load      = MIN(min_load, excluded.min_load),
+        actual_hours  = actual_hours + excluded.actual_hours,
+        error_sum     = error_sum + excluded.error_sum,
+        abs_error_sum = abs_error_sum + excluded.abs_error_sum,
+        pct_error_sum = pct_error_sum + excluded.pct_error_sum
+"""
+
+
+def zone_actuals(zone):
+    """(timestamps, load) of a zone's history for rollup error stats, or None without history."""
+    import zones  # lazy: pulls in the model stack
+    try:
+        return zones.pool.get(zone).history.column('load')
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# ── Rollups ────────────────────────────────────────────────────────────
+
+def daily_rollups(zone, request_ids, timestamps, loads, actuals=None):
+    """
+    Per-day aggregates of one zone's forecast hours as UPSERT_ROLLUP rows.
+    Counts are forecast-hours: a day covered by several requests counts each.
+    """
+    ts = np.asarray(timestamps, dtype="datetime64[s]")
+    loads = np.asarray(loads, dtype=np.float64)
+    request_ids = np.asarray(request_ids)
+    days, inv = np.unique(ts.astype("datetime64[D]"), return_inverse=True)
+    n_days = len(days)
+
+    hours = np.bincount(inv, minlength=n_days)
+    load_sum = np.bincount(inv, weights=loads, minlength=n_days)
+    order = np.lexsort((loads, inv))                     # by day, then load
+    last = np.searchsorted(inv[order], np.arange(n_days), side="right") - 1
+    first = np.searchsorted(inv[order], np.arange(n_days))
+    peak_idx, min_idx = order[last], order[first]
+    pairs = np.unique(np.stack([inv, request_ids]), axis=1)
+    forecasts = np.bincount(pairs[0], minlength=n_days)
+
+    actual_hours = np.zeros(n_days, dtype=np.int64)
+    error_sum = np.zeros(n_days)
+    abs_error_sum = np.zeros(n_days)
+    pct_error_sum = np.zeros(n_days)
+    if actuals is not None:
+        a_ts, a_load = actuals
+        pos = np.minimum(np.searchsorted(a_ts, ts), len(a_ts) - 1)
+        actual = a_load[pos]
+        hit = (a_ts[pos] == ts) & np.isfinite(actual) & (actual > 0)
+        err = np.where(hit, loads - actual, 0.0)
+        actual_hours = np.bincount(inv, weights=hit.astype(np.float64), minlength=n_days).astype(np.int64)
+        error_sum = np.bincount(inv, weights=err, minlength=n_days)
+        abs_error_sum = np.bincount(inv, weights=np.abs(err), minlength=n_days)
+        pct_error_sum = np.bincount(inv, weights=np.abs(err) / np.where(hit, actual, 1.0), minlength=n_days)
+
+    peak_hours = np.datetime_as_string(ts[peak_idx], unit="s")
+    return [(zone, str(days[d]), int(forecasts[d]), int(hours[d]), float(load_sum[d]),
+             float(loads[peak_idx[d]]), str(peak_hours[d]), float(loads[min_idx[d]]),
+             int(actual_hours[d]), float(error_sum[d]), float(abs_error_sum[d]), float(pct_error_sum[d]))
+            for d in range(n_days)]
+
+
+# ── Archive ────────────────────────────────────────────────────────────
+
+def _floats(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def write_archive(requests, results):
+    """Save expired requests and their results as one .npz; returns its path."""
+    ids = [r["id"] for r in requests]
+    month = requests[0]["created_at"][:7]
+    os.makedirs(os.path.join(ARCHIVE_DIR, month), exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, month, f"forecasts_{min(ids)}-{max(ids)}.npz")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f,
+            req_id=np.array(ids, dtype=np.int64),
+            req_zone=np.array([r["zone"] for r in requests], dtype=str),
+            req_created_at=np.array([r["created_at"] for r in requests], dtype=str),
+            req_forecast_start=np.array([r["forecast_start"] for r in requests], dtype=str),
+            req_status=np.array([r["status"] or "" for r in requests], dtype=str),
+            req_peak_load=_floats(r["peak_load"] for r in requests),
+            request_id=np.array([r[0] for r in results], dtype=np.int64),
+            hour_offset=np.array([r[1] for r in results], dtype=np.int16),
+            timestamp=np.array([r[2] for r in results], dtype="datetime64[s]"),
+            predicted_load=_floats(r[3] for r in results),
+            xgb_load=_floats(r[4] for r in results),
+            dl_residual=_floats(r[5] for r in results),
+        )
+    os.replace(tmp, path)  # a crash never leaves a truncated archive behind
+    return path
+
+
+# ── Policy ─────────────────────────────────────────────────────────────
+
+class RetentionPolicy:
+    def __init__(self, full_days=RETENTION_FULL_DAYS, rollup_days=RETENTION_ROLLUP_DAYS,
+                 archive=RETENTION_ARCHIVE, interval=RETENTION_INTERVAL_S, actuals=zone_actuals):
+        self.full_days = full_days
+        self.rollup_days = rollup_days
+        self.archive = archive
+        self.interval = interval
+        self.actuals = actuals
+        self.last_run_at = None     # monotonic
+        self.last_result = None
+        self.needs_conversion = False
+        self._running = threading.Lock()
+
+    def due(self):
+        """True when a pass is enabled, not running and the interval has elapsed."""
+        if not self.interval or self._running.locked():
+            return False
+        return self.last_run_at is None or time.monotonic() - self.last_run_at >= self.interval
+
+    def run_exclusive(self, on_deleted=None):
+        """Run a pass unless one is already in progress."""
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            return self.run(on_deleted=on_deleted)
+        finally:
+            self._running.release()
+
+    def expired_ids(self, conn, now):
+        if not self.full_days:
+            return []
+        cutoff = (now - timedelta(days=self.full_days)).strftime(SQLITE_TIME)
+        return [r[0] for r in conn.execute(
+            "SELECT id FROM forecast_requests WHERE created_at < ? ORDER BY id", (cutoff,))]
+
+    def run(self, now=None, dry_run=False, on_deleted=None, convert=False):
+        """
+        One retention pass. on_deleted(ids) is called after each committed
+        batch (e.g. to drop cached responses). convert: allow the one-time
+        full VACUUM of a pre-retention database (CLI only). Returns a summary dict.
+        """
+        now = now or datetime.now(timezone.utc)  # created_at is CURRENT_TIMESTAMP (UTC)
+        t0 = time.perf_counter()
+        if not dry_run:
+            self.last_run_at = time.monotonic()  # a failing pass also waits out the interval
+        summary = {"requests": 0, "results": 0, "rollup_days": 0, "archives": 0,
+                   "rollups_dropped": 0, "vacuum_pages": 0}
+        conn = db.get_db()
+        try:
+            expired = self.expired_ids(conn, now)
+            if dry_run:
+                summary["requests"] = len(expired)
+                return summary
+            actuals = {}
+            for i in range(0, len(expired), RETENTION_BATCH):
+                ids = expired[i:i + RETENTION_BATCH]
+                self._expire_batch(conn, ids, actuals, summary)
+                if on_deleted:
+                    on_deleted(ids)
+
+            if self.rollup_days:
+                cutoff = (now - timedelta(days=self.rollup_days)).strftime("%Y-%m-%d")
+                with conn:
+                    summary["rollups_dropped"] = conn.execute(
+                        "DELETE FROM daily_rollups WHERE day < ?", (cutoff,)).rowcount
+            summary["vacuum_pages"] = self.vacuum(conn, convert)
+        finally:
+            conn.close()
+
+        summary["db_mb"] = round(os.path.getsize(db.DB_PATH) / 1024 / 1024, 2)
+        summary["seconds"] = round(time.perf_counter() - t0, 2)
+        telemetry.set_gauge("voltcast_db_bytes", os.path.getsize(db.DB_PATH))
+        self.last_result = dict(summary, at=now.strftime(SQLITE_TIME))
+        if summary["requests"] or summary["rollups_dropped"]:
+            print(f"🧹 Retention: {summary['requests']:,} requests ({summary['results']:,} results) rolled up "
+                  f"into {summary['rollup_days']:,} zone-days, {summary['vacuum_pages']:,} pages vacuumed, "
+                  f"DB {summary['db_mb']} MB.")
+        return summary
+
+    def _expire_batch(self, conn, ids, actuals, summary):
+        marks = ",".join("?" * len(ids))
+        requests = [dict(r) for r in conn.execute(
+            f"SELECT * FROM forecast_requests WHERE id IN ({marks}) ORDER BY id", ids)]
+        results = conn.execute(f"""
+            SELECT r.request_id, r.hour_offset, r.timestamp, r.predicted_load, r.xgb_load, r.dl_residual
+            FROM forecasted_results r
+            WHERE r.request_id IN ({marks})
+            ORDER BY r.request_id, r.hour_offset
+        """, ids).fetchall()
+        if self.archive:
+            write_archive(requests, results)
+            summary["archives"] += 1
+
+        # Only completed forecasts feed the rollups; failed and abandoned requests just go.
+        zone_of = {r["id"]: r["zone"] for r in requests if r["status"] == "completed"}
+        rollups = []
+        for zone in sorted(set(zone_of.values())):
+            rows = [r for r in results if zone_of.get(r[0]) == zone]
+            if not rows:
+                continue
+            if zone not in actuals:
+                actuals[zone] = self.actuals(zone) if self.actuals else None
+            rollups += daily_rollups(zone, [r[0] for r in rows], [r[2] for r in rows],
+                                     [r[3] for r in rows], actuals[zone])
+
+        with conn:  # rollups and deletes commit together
+            conn.executemany(UPSERT_ROLLUP, rollups)
+            conn.execute(f"DELETE FROM forecast_requests WHERE id IN ({marks})", ids)  # results cascade
+
+        summary["requests"] += len(ids)
+        summary["results"] += len(results)
+        summary["rollup_days"] += len(rollups)
+        for r in requests:
+            telemetry.inc("voltcast_retention_requests_total", status=r["status"] or "unknown")
+
+    def vacuum(self, conn, convert=False):
+        """Return up to VACUUM_PAGES_PER_PASS free pages to the OS; returns pages freed."""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Databases created before retention: one full VACUUM switches the mode.
+            # It holds an exclusive lock for its whole run, so never from the server.
+            if not convert:
+                if not self.needs_conversion:
+                    print("ℹ️ forecasts.db predates incremental auto-vacuum; run `python retention.py` "
+                          "once (while idle) to convert it.")
+                self.needs_conversion = True
+                return 0
+            print("🛠️ Converting forecasts.db to incremental auto-vacuum (one-time VACUUM)...")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            self.needs_conversion = False
+            return 0
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # executescript steps the pragma to completion (execute() frees a single page)
+        conn.executescript(f"PRAGMA incremental_vacuum({int(VACUUM_PAGES_PER_PASS)});")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def status(self):
+        """Policy and the last pass, for /api/health."""
+        return {
+            "full_days": self.full_days,
+            "rollup_days": self.rollup_days,
+            "archive": self.archive,
+            "interval_s": self.interval,
+            "needs_conversion": self.needs_conversion,
+            "last_run": self.last_result,
+        }
+
+
+# Singleton instance
+policy = RetentionPolicy()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and sys.argv[1] != "--dry-run"):
+        print(__doc__)
+        sys.exit(1)
+    db.init_db()
+    dry_run = len(sys.argv) == 2
+    result = policy.run(dry_run=dry_run, convert=True)
+    if dry_run:
+        print(f"🧹 {result['requests']:,} requests are past the {policy.full_days}-day retention window.")
+    else:
+        print(f"✅ Retention pass done: {result}")
@@ -0,0 +1,88 @@
+"""
+Precompiled affine preprocessing for inference.
+Built once at load from the training config and the fitted StandardScalers:
+every FEATURE_COLS column gets an offset and a scale (sin/cos columns pass
+through unchanged), so a batch of windows is scaled with one subtract/divide
+over a float64 matrix and the target inverse-transform is one multiply-add.
+Arithmetic and dtypes match StandardScaler.transform / inverse_transform.
+"""
+import numpy as np
+import pandas as pd
+
+
+class ScalingPlan:
+    def __init__(self, config, feature_scaler, target_scaler):
+        self.columns = list(config['FEATURE_COLS'])
+        n = len(self.columns)
+        self.mean = np.zeros(n, dtype=np.float64)
+        self.scale = np.ones(n, dtype=np.float64)
+
+        # Numerical columns, in the order the scaler was fitted on
+        num_cols = list(getattr(feature_scaler, "feature_names_in_", config['NUMERICAL_COLS']))
+        idx = [self.columns.index(c) for c in num_cols]
+        self.mean[idx], self.scale[idx] = _affine(feature_scaler, len(num_cols))
+
+        # Load column (model input) uses the target scaler
+        t_mean, t_scale = _affine(target_scaler, 1)
+        self.mean[self.columns.index(config['TARGET_COL'])] = t_mean[0]
+        self.scale[self.columns.index(config['TARGET_COL'])] = t_scale[0]
+
+        # Model outputs are float32; inverse_transform works in the input dtype
+        self.target_mean = np.float32(t_mean[0])
+        self.target_scale = np.float32(t_scale[0])
+
+    def transform(self, windows):
+        """
+        windows: list of DataFrames / arrays, or an (N, T, F) array, in any float dtype.
+        Returns (N, T, F) float32 scaled features in FEATURE_COLS order, with
+        gaps forward/back-filled along time (then 0) as in training.
+        """
+        X = self._stack(windows)
+        fill_gaps(X)
+        X -= self.mean
+        X /= self.scale
+        return X.astype(np.float32)
+
+    def inverse_target(self, y_scaled):
+        """Scaled model output (any shape) -> MW."""
+        return np.asarray(y_scaled, dtype=np.float32) * self.target_scale + self.target_mean
+
+    def _stack(self, windows):
+        """Float64 (N, T, F) copy of the input, DataFrames reordered to FEATURE_COLS."""
+        if isinstance(windows, np.ndarray):
+            return np.array(windows, dtype=np.float64)
+        arrays = []
+        for w in windows:
+            if isinstance(w, pd.DataFrame):
+                w = w if list(w.columns) == self.columns else w[self.columns]
+                w = w.to_numpy(dtype=np.float64)
+            arrays.append(w)
+        return np.array(arrays, dtype=np.float64)
+
+
+def fill_gaps(X):
+    """In place on (N, T, F): forward-fill, then back-fill along T; all-NaN columns become 0."""
+    mask = np.isnan(X)
+    if not mask.any():
+        return X
+    T = X.shape[1]
+    t = np.arange(T).reshape(1, T, 1)
+
+    last = np.where(mask, 0, t)
+    np.maximum.accumulate(last, axis=1, out=last)
+    X[:] = np.take_along_axis(X, last, axis=1)
+
+    mask = np.isnan(X)  # only leading gaps are left
+    if mask.any():
+        nxt = np.where(mask, T - 1, t)[:, ::-1]
+        nxt = np.minimum.accumulate(nxt, axis=1)[:, ::-1]
+        X[:] = np.take_along_axis(X, nxt, axis=1)
+        X[np.isnan(X)] = 0.0
+    return X
+
+
+def _affine(scaler, n):
+    """(mean, scale) float64 vectors of a fitted StandardScaler (identity where disabled)."""
+    mean = scaler.mean_ if getattr(scaler, "with_mean", True) and scaler.mean_ is not None else np.zeros(n)
+    scale = scaler.scale_ if getattr(scaler, "with_std", True) and scaler.scale_ is not None else np.ones(n)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
@@ -0,0 +1,177 @@
+"""
+Lightweight latency tracing and Prometheus metrics.
+Times each stage of the forecast pipeline, keeps process-wide counters and
+histograms, and renders them in the Prometheus text exposition format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets in seconds (sub-ms scaling up to slow weather fetches)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    "voltcast_stage_duration_seconds": ("histogram", "Duration of forecast pipeline stages."),
+    "voltcast_request_duration_seconds": ("histogram", "End-to-end API request latency."),
+    "voltcast_requests_total": ("counter", "API requests by endpoint and status code."),
+    "voltcast_cache_hits_total": ("counter", "Lookups served from an in-memory cache."),
+    "voltcast_cache_misses_total": ("counter", "Lookups that had to load from disk or network."),
+    "voltcast_weather_fallbacks_total": ("counter", "Cities served by the seasonal weather fallback."),
+    "voltcast_errors_total": ("counter", "Errors raised inside the forecast pipeline."),
+    "voltcast_memory_limit_bytes": ("gauge", "Detected container memory limit."),
+    "voltcast_memory_rss_bytes": ("gauge", "Process resident set size at the last memory plan."),
+    "voltcast_memory_component_bytes": ("gauge", "Estimated memory held by each adjustable component."),
+    "voltcast_planned_ensemble_members": ("gauge", "Ensemble members chosen by the memory governor."),
+    "voltcast_planned_history_rows": ("gauge", "History rows chosen by the memory governor."),
+    "voltcast_loaded_zones": ("gauge", "Zone model sets currently loaded in the pool."),
+    "voltcast_zone_evictions_total": ("counter", "Zone model sets evicted to make room for another zone."),
+    "voltcast_inference_active": ("gauge", "Inference slots currently running model compute."),
+    "voltcast_inference_queue_depth": ("gauge", "Requests waiting for an inference slot."),
+    "voltcast_inference_wait_seconds": ("histogram", "Time spent waiting for an inference slot."),
+    "voltcast_inference_rejected_total": ("counter", "Requests that timed out waiting for an inference slot."),
+    "voltcast_retention_requests_total": ("counter", "Forecast requests removed by retention, by status."),
+    "voltcast_db_bytes": ("gauge", "Size of the forecasts database file at the last retention pass."),
+    "voltcast_profiles_total": ("counter", "Requests captured by the on-demand profiler, by mode."),
+}
+
+_lock = threading.Lock()
+_histograms = {}   # (name, labels) -> [bucket_counts, sum, count]
+_counters = {}     # (name, labels) -> value
+_gauges = {}       # (name, labels) -> value
+_local = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# ── Recording ──────────────────────────────────────────────────────────
+
+def observe(name, seconds, **labels):
+    """Record one observation (in seconds) into a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                h[0][i] += 1
+        h[1] += seconds
+        h[2] += 1
+
+
+def inc(name, amount=1, **labels):
+    """Increment a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to an absolute value."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage, recording it globally and on the current request trace."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        observe("voltcast_stage_duration_seconds", elapsed, stage=name)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append((name, elapsed))
+
+
+# ── Per-request trace ──────────────────────────────────────────────────
+
+def begin_request():
+    """Start collecting stage timings for the request on this thread."""
+    _local.trace = []
+    _local.started = time.perf_counter()
+
+
+def end_request():
+    """Stop collecting and return (stages, total_seconds) for this thread."""
+    trace = getattr(_local, "trace", None) or []
+    started = getattr(_local, "started", None)
+    _local.trace = None
+    _local.started = None
+    total = time.perf_counter() - started if started is not None else 0.0
+    return trace, total
+
+
+def timing_header(trace, total):
+    """Format a trace as `stage;dur=<ms>` pairs (Server-Timing syntax)."""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in trace]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+# ── Exposition ─────────────────────────────────────────────────────────
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def render():
+    """Render every metric in Prometheus text format (version 0.0.4)."""
+    with _lock:
+        histograms = {k: (list(v[0]), v[1], v[2]) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    seen = set()
+
+    def header(name, default_type):
+        if name in seen:
+            return
+        seen.add(name)
+        mtype, text = METRIC_HELP.get(name, (default_type, name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {mtype}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+        header(name, "histogram")
+        for bound, n in zip(LATENCY_BUCKETS, buckets):
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', _fmt_bound(bound))])} {n}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {total}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Clear all recorded metrics (used by benchmarks between runs)."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
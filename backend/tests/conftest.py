@@ -0,0 +1,33 @@
+"""
+Test setup: every path the backend writes to (models, data, database) points
+at a throwaway directory before config is imported, and the artifact source is
+disabled so nothing is fetched from the Hub.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix="voltcast-tests-")
+os.environ.update({
+    "VOLTCAST_MODEL_DIR": os.path.join(WORKDIR, "models"),
+    "VOLTCAST_DATA_DIR": os.path.join(WORKDIR, "data"),
+    "VOLTCAST_DB_DIR": os.path.join(WORKDIR, "database"),
+    "VOLTCAST_ARTIFACT_SOURCE": "",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def synthetic_artifacts():
+    """Small synthetic model set and history CSV (bench/synthetic.py) under WORKDIR; returns the config dict."""
+    from bench import synthetic
+    return synthetic.build_artifacts(history_rows=24 * 120, xgb_rounds=5, n_windows=40)
+
+
+@pytest.fixture(scope="session")
+def client(synthetic_artifacts):
+    """Flask test client over the synthetic artifacts."""
+    import app
+    return app.app.test_client()
@@ -0,0 +1,107 @@
+import os
+import shutil
+
+import pytest
+
+import artifacts
+from artifacts import ArtifactError, ArtifactStore
+
+
+@pytest.fixture()
+def published(tmp_path):
+    """Two artifacts published to a local source dir; returns (source, manifest)."""
+    src = tmp_path / "models"
+    src.mkdir()
+    files = {}
+    for name, body in [("a.bin", b"alpha" * 1000), ("b.bin", b"beta" * 10)]:
+        (src / name).write_bytes(body)
+        files[name] = str(src / name)
+    source = str(tmp_path / "hub")
+    return source, artifacts.publish(source, files)
+
+
+def make_store(tmp_path, source, **local):
+    return ArtifactStore(source=source, cache_dir=str(tmp_path / "cache"),
+                         local={name: str(tmp_path / "local" / name) for name in ("a.bin", "b.bin")}, **local)
+
+
+def test_sync_fetches_into_the_blob_cache(tmp_path, published):
+    source, manifest = published
+    paths = make_store(tmp_path, source).sync()
+    for name, entry in manifest["files"].items():
+        assert paths[name] == os.path.join(str(tmp_path / "cache"), "blobs", entry["sha256"])
+        assert artifacts.verify(paths[name], entry)
+
+    shutil.rmtree(source)   # source gone: the cached manifest and blobs still serve
+    again = make_store(tmp_path, source)
+    assert again.sync() == paths
+    assert again.sha256("a.bin") == manifest["files"]["a.bin"]["sha256"]
+    assert again.size("b.bin") == 40
+
+
+def test_verified_local_copy_is_used_without_download(tmp_path, published):
+    source, _ = published
+    (tmp_path / "local").mkdir()
+    shutil.copyfile(os.path.join(source, "a.bin"), tmp_path / "local" / "a.bin")
+    paths = make_store(tmp_path, source).sync()
+    assert paths["a.bin"] == str(tmp_path / "local" / "a.bin")
+    assert paths["b.bin"].startswith(str(tmp_path / "cache"))
+
+
+def test_corrupt_download_never_falls_back_to_a_stale_local_copy(tmp_path, published):
+    source, _ = published
+    with open(os.path.join(source, "b.bin"), "ab") as f:
+        f.write(b"!")
+    (tmp_path / "local").mkdir()
+    (tmp_path / "local" / "b.bin").write_bytes(b"old weights")
+
+    with pytest.raises(ArtifactError, match="b.bin"):
+        make_store(tmp_path, source).sync()
+    assert not [f for f in os.listdir(tmp_path / "cache" / "blobs") if f.startswith(".tmp-")]
+
+
+def test_without_source_local_paths_are_used(tmp_path):
+    store = make_store(tmp_path, "")
+    assert store.sync() == store.local
+    assert store.size("a.bin") == 0
+
+
+def test_prune_drops_blobs_of_old_manifests(tmp_path, published):
+    source, manifest = published
+    make_store(tmp_path, source).sync()
+    (tmp_path / "models" / "a.bin").write_bytes(b"retrained")
+    artifacts.publish(source, {name: str(tmp_path / "models" / name) for name in ("a.bin", "b.bin")})
+
+    paths = make_store(tmp_path, source).sync()
+    blobs = set(os.listdir(tmp_path / "cache" / "blobs"))
+    assert manifest["files"]["a.bin"]["sha256"] not in blobs
+    assert os.path.basename(paths["a.bin"]) in blobs and len(blobs) == 2
+
+
+def test_zone_prefix(tmp_path, published):
+    source, _ = published
+    zone_source = tmp_path / "zoned"
+    shutil.copytree(source, zone_source / artifacts.zone_prefix("ME"))
+    paths = make_store(tmp_path, str(zone_source), prefix=artifacts.zone_prefix("ME")).sync()
+    assert set(paths) == {"a.bin", "b.bin"}
+    assert artifacts.zone_store(artifacts.DEFAULT_ZONE) is artifacts.store
+
+
+def test_source_without_manifest_is_fetched_by_name(tmp_path, published):
+    source, _ = published
+    os.remove(os.path.join(source, artifacts.MANIFEST_NAME))
+    store = make_store(tmp_path, source)
+    store.local[artifacts.FOREST_FILE] = str(tmp_path / "local" / artifacts.FOREST_FILE)  # optional, unpublished
+    paths = store.sync()
+    assert paths == store.local
+    with open(paths["a.bin"], "rb") as f:
+        assert f.read() == b"alpha" * 1000
+    assert not os.path.exists(paths[artifacts.FOREST_FILE])
+
+
+def test_source_without_manifest_missing_a_file_raises(tmp_path, published):
+    source, _ = published
+    os.remove(os.path.join(source, artifacts.MANIFEST_NAME))
+    os.remove(os.path.join(source, "b.bin"))
+    with pytest.raises(ArtifactError, match="b.bin.*publish"):
+        make_store(tmp_path, source).sync()
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+import requests
+
+import weather
+from bench import synthetic
+from bench.weather_stub import WeatherStub, canned_hourly
+
+
+def test_canned_hourly_is_deterministic():
+    a = canned_hourly(42.36, -71.06, "2025-07-01", "2025-07-07")
+    b = canned_hourly(42.36, -71.06, "2025-07-01", "2025-07-07")
+    assert a == b
+    assert all(len(v) == 7 * 24 for v in a.values())
+    assert set(weather.HOURLY_FIELDS.values()) <= set(a)
+    assert a["time"][:2] == ["2025-07-01T00:00", "2025-07-01T01:00"]
+    assert a["time"][24] == "2025-07-02T00:00" and a["time"][-1] == "2025-07-07T23:00"
+    assert canned_hourly(41.82, -71.41, "2025-07-01", "2025-07-07") != a
+
+
+def test_stub_serves_the_weather_request():
+    coords = {"lat": 42.36, "lon": -71.06}
+    start, end = datetime(2025, 7, 1), datetime(2025, 7, 2, 23)
+    with WeatherStub() as stub:
+        arr = weather._request_hourly(stub.env["OPEN_METEO_FORECAST_URL"], coords, start, end, 48)
+        assert requests.get(f"{stub.base_url}/v1/nope", timeout=5).status_code == 404
+        assert requests.get(f"{stub.base_url}/v1/archive", timeout=5).status_code == 400
+
+    expected = canned_hourly(42.36, -71.06, "2025-07-01", "2025-07-02")
+    assert arr.shape == (48, len(weather.WEATHER_VARS))
+    assert not np.isnan(arr).any()
+    np.testing.assert_allclose(arr[:, 0], expected["temperature_2m"], rtol=1e-6)
+
+
+def test_build_history_is_seeded():
+    a = synthetic.build_history(24 * 10, seed=3)
+    b = synthetic.build_history(24 * 10, seed=3)
+    assert len(a) == 240
+    assert a["Timestamp"].iloc[-1] == datetime(2025, 12, 31, 23)
+    assert a.drop(columns="Timestamp").equals(b.drop(columns="Timestamp"))
+    assert not a.drop(columns="Timestamp").isna().any().any()
+
+
+def test_build_config_splits_columns(synthetic_artifacts):
+    df = synthetic.build_history(48)
+    cfg = synthetic.build_config(df)
+    assert cfg["FEATURE_COLS"][cfg["load_col_idx"]] == synthetic.TARGET_COL
+    assert not set(synthetic.SIN_COS_COLS) & set(cfg["NUMERICAL_COLS"])
+    assert cfg["N_FEATURES"] == len(df.columns) - 1
+    assert synthetic_artifacts["FEATURE_COLS"] == cfg["FEATURE_COLS"]
+
+
+@pytest.mark.parametrize("path", ["/v1/forecast", "/v1/archive"])
+def test_stub_latency(path):
+    with WeatherStub(latency_ms=50) as stub:
+        params = {"latitude": 1, "longitude": 2, "start_date": "2025-01-01", "end_date": "2025-01-01"}
+        resp = requests.get(stub.base_url + path, params=params, timeout=5)
+    assert resp.status_code == 200
+    assert resp.elapsed.total_seconds() >= 0.05
+    assert len(resp.json()["hourly"]["time"]) == 24
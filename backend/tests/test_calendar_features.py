@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+import calendar_features
+
+
+def test_holiday_rules_2025():
+    expected = ["2025-01-01", "2025-01-20", "2025-02-17", "2025-05-26", "2025-07-04",
+                "2025-09-01", "2025-10-13", "2025-11-11", "2025-11-27", "2025-12-25"]
+    assert sorted(calendar_features.holiday_dates([2025])) == list(pd.DatetimeIndex(expected))
+
+
+def test_compute_encodings():
+    ts = pd.DatetimeIndex(["2025-11-27 06:00", "2025-11-29 18:00"])   # Thanksgiving, a Saturday
+    cols = dict(zip(calendar_features.CALENDAR_COLS, calendar_features.compute(ts).T))
+    np.testing.assert_array_equal(cols["Hour"], [6, 18])
+    np.testing.assert_array_equal(cols["Weekend"], [0, 1])
+    np.testing.assert_array_equal(cols["Holiday"], [1, 0])
+    np.testing.assert_allclose(cols["Hour_sin"], np.sin(2 * np.pi * np.array([6, 18]) / 24), atol=1e-6)
+    np.testing.assert_allclose(cols["Month_cos"], np.cos(2 * np.pi * 10 / 12), atol=1e-6)
+
+
+def test_window_slices_the_table():
+    start = pd.Timestamp("2025-12-30 22:30")
+    got = calendar_features.window(start, 72)
+    assert np.shares_memory(got["Hour"], calendar_features.table())
+    expected = calendar_features.compute(pd.date_range(start.floor("h"), periods=72, freq="h"))
+    for j, col in enumerate(calendar_features.CALENDAR_COLS):
+        np.testing.assert_array_equal(got[col], expected[:, j])
+
+
+def test_window_outside_the_table_is_computed():
+    start = calendar_features.TABLE_END - pd.Timedelta(hours=2)
+    got = calendar_features.window(start, 5)
+    expected = calendar_features.compute(pd.date_range(start, periods=5, freq="h"))
+    np.testing.assert_array_equal(got["Holiday"], expected[:, 4])
+    assert got["Hour"].shape == (5,)
+
+
+def test_lookup_non_contiguous_and_off_hour():
+    ts = pd.DatetimeIndex(["2024-07-04 12:00", "2015-03-01 00:00", "2030-12-25 23:00"])
+    got = calendar_features.lookup(ts)
+    np.testing.assert_array_equal(got["Holiday"], [1, 0, 1])
+    off_hour = calendar_features.lookup(pd.DatetimeIndex(["2024-07-04 12:30"]))
+    assert off_hour["Hour"][0] == 12 and off_hour["Holiday"][0] == 1
@@ -0,0 +1,61 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+import export
+
+
+def test_parse_range():
+    assert export.parse_range(None, None) == (None, None)
+    assert export.parse_range("2025-01-01", "2025-01-02 06:00") == (datetime(2025, 1, 1), datetime(2025, 1, 2, 6))
+    with pytest.raises(ValueError):
+        export.parse_range("2025-01-02", "2025-01-01")
+    with pytest.raises(ValueError):
+        export.parse_range("yesterday", None)
+
+
+def test_encode_ndjson_maps_non_finite_to_null():
+    lines = "".join(export.encode(["t", "v"], [[("a", 1.5), ("b", float("nan"))]], "ndjson")).splitlines()
+    assert [json.loads(line) for line in lines] == [{"t": "a", "v": 1.5}, {"t": "b", "v": None}]
+
+
+def test_encode_csv_writes_header_once():
+    text = "".join(export.encode(["t", "v"], [[("a", 1)], [("b", 2)]], "csv"))
+    assert text == "t,v\na,1\nb,2\n"
+
+
+def test_gzip_stream_round_trip():
+    blocks = [f"row {i}\n" for i in range(1000)]
+    assert gzip.decompress(b"".join(export.gzip_stream(iter(blocks)))).decode() == "".join(blocks)
+
+
+def test_history_export_gzip_is_a_gz_file(client):
+    r = client.get("/api/export/history?start=2025-12-01&end=2025-12-02&columns=load&format=csv&gzip=1")
+    assert r.status_code == 200
+    assert r.mimetype == "application/gzip"
+    assert "Content-Encoding" not in r.headers
+    assert r.headers["Content-Disposition"] == 'attachment; filename="history.csv.gz"'
+    rows = gzip.decompress(r.data).decode().splitlines()
+    assert rows[0] == "Timestamp,load" and len(rows) == 25
+
+
+def test_history_export_plain(client):
+    r = client.get("/api/export/history?start=2025-12-01&end=2025-12-01 03:00&columns=load")
+    assert r.mimetype == "application/x-ndjson"
+    assert [json.loads(line)["Timestamp"] for line in r.data.decode().splitlines()] == \
+        ["2025-12-01T00:00:00", "2025-12-01T01:00:00", "2025-12-01T02:00:00"]
+
+
+def test_export_rejects_bad_arguments(client):
+    assert client.get("/api/export/history?format=xml").status_code == 400
+    assert client.get("/api/export/history?columns=nope").status_code == 400
+    assert client.get("/api/export/forecasts?start=2025-02-01&end=2025-01-01").status_code == 400
+
+
+def test_history_export_of_a_zone_without_history(client):
+    r = client.get("/api/export/history?zone=NH")
+    assert r.status_code == 404 and r.is_json
+    assert r.get_json() == {"error": "No history data for zone 'NH'"}
+    assert client.get("/api/export/history?zone=Atlantis").status_code == 400
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+import torch
+
+from inference_pool import InferenceBusy, InferencePool
+
+
+def test_sets_torch_threads_once_for_the_process():
+    before = torch.get_num_threads()
+    try:
+        InferencePool(slots=1, threads=1)
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(torch.get_num_threads()))
+        t.start()
+        t.join()
+        assert torch.get_num_threads() == 1 and seen == [1]
+    finally:
+        torch.set_num_threads(before)
+
+
+def test_slot_is_reentrant_per_thread():
+    pool = InferencePool(slots=1, threads=torch.get_num_threads(), timeout=0.05)
+    with pool.slot():
+        with pool.slot():
+            assert pool.active == 1
+    assert pool.active == 0
+
+
+def test_full_pool_raises_busy():
+    pool = InferencePool(slots=1, threads=torch.get_num_threads(), timeout=0.05)
+    entered, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.slot():
+            entered.set()
+            release.wait()
+
+    t = threading.Thread(target=hold)
+    t.start()
+    entered.wait()
+    try:
+        with pytest.raises(InferenceBusy):
+            with pool.slot():
+                pass
+        assert pool.rejected == 1
+    finally:
+        release.set()
+        t.join()
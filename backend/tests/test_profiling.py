@@ -0,0 +1,96 @@
+import json
+import pstats
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture()
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture()
+def token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "s3cret")
+    return "s3cret"
+
+
+def work():
+    return sum(i * i for i in range(200_000)), [bytes(1000) for _ in range(500)]
+
+
+def test_parse_modes():
+    assert profiling.parse_modes("cpu, mem,cpu") == ["cpu", "mem"]
+    for bad in ("", "gpu", "cpu,gpu"):
+        with pytest.raises(ValueError):
+            profiling.parse_modes(bad)
+
+
+def test_token_is_compared_exactly(token):
+    assert profiling.authorized("s3cret")
+    assert not profiling.authorized("s3cre")
+    assert not profiling.authorized(None)
+
+
+def test_session_writes_every_artifact(profile_dir):
+    session = profiling.begin(["cpu", "mem", "speedscope"], "GET /test")
+    work()
+    meta = session.finish(200)
+
+    assert meta["files"] == ["cpu.pstats", "cpu.txt", "speedscope.json", "mem.json"]
+    assert profiling.load_meta(meta["id"]) == meta
+    stats = pstats.Stats(profiling.artifact_path(meta["id"], "cpu.pstats"))
+    assert any(func[2] == "work" for func in stats.stats)
+    speedscope = json.load(open(profiling.artifact_path(meta["id"], "speedscope.json")))
+    frames = len(speedscope["shared"]["frames"])
+    assert all(0 <= i < frames for sample in speedscope["profiles"][0]["samples"] for i in sample)
+    mem = json.load(open(profiling.artifact_path(meta["id"], "mem.json")))
+    assert mem["top_allocations"] and mem["python_peak_mb"] >= mem["python_current_mb"]
+
+
+def test_one_profile_at_a_time(profile_dir):
+    session = profiling.begin(["cpu"], "first")
+    with pytest.raises(profiling.ProfilerBusy):
+        profiling.begin(["cpu"], "second")
+    session.finish(200)
+    profiling.begin(["cpu"], "third").finish(200)
+
+
+def test_artifact_names_are_validated(profile_dir):
+    meta = profiling.begin(["cpu"], "x").finish(200)
+    assert profiling.artifact_path(meta["id"], "cpu.pstats")
+    assert profiling.artifact_path(meta["id"], "../meta.json") is None
+    assert profiling.artifact_path("../" + meta["id"], "meta.json") is None
+    assert profiling.artifact_path(meta["id"], "mem.json") is None  # not captured
+
+
+def test_prune_keeps_the_newest(profile_dir):
+    ids = [profiling.begin(["cpu"], str(i)).finish(200)["id"] for i in range(3)]
+    profiling.prune(keep=2)
+    assert [m["id"] for m in profiling.list_profiles()] == sorted(ids, reverse=True)[:2]
+
+
+def test_token_is_only_read_from_the_header(client, token, profile_dir):
+    import app
+
+    with app.app.test_request_context("/api/history?profile=cpu&profile_token=s3cret"):
+        response, status = app._start_profile()
+        assert status == 403
+    with app.app.test_request_context("/api/history?profile=cpu", headers={"X-Profile-Token": "s3cret"}):
+        assert app._start_profile() is None
+        response = app._finish_profile(app.app.response_class("{}"))
+        assert profiling.load_meta(response.headers["X-Profile-Id"])["request"] == "GET /api/history"
+
+
+def test_profile_routes_need_the_token(client, token, profile_dir):
+    assert client.get("/api/profiles").status_code == 403
+    assert client.get("/api/profiles?profile_token=s3cret").status_code == 403
+    assert client.get("/api/profiles", headers={"X-Profile-Token": "s3cret"}).status_code == 200
+
+
+def test_profile_routes_are_hidden_when_disabled(client):
+    assert not profiling.enabled()
+    assert client.get("/api/profiles").status_code == 404
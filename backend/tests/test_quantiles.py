@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import torch
+
+import app
+import artifacts
+import config
+import model_v4
+import weather
+from model_v4 import ModelV4Manager, ResidualPredictor
+
+MEMBERS = 3
+
+
+@pytest.fixture(scope="module")
+def manager(synthetic_artifacts):
+    m = ModelV4Manager(store=artifacts.ArtifactStore(source=""))
+    m.load()
+    return m
+
+
+@pytest.fixture(scope="module")
+def windows(manager):
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(2, config.INPUT_LEN, len(manager.config["FEATURE_COLS"])))
+
+
+def test_mc_dropout_only_samples_rows_after_keep():
+    torch.manual_seed(0)
+    model = ResidualPredictor(6, 24, conv_filters=8, lstm_hidden=8, n_heads=2, dropout=0.5).eval()
+    model_v4.enable_mc_dropout(model)
+    x = torch.randn(2, 24, 6)
+    with torch.no_grad():
+        plain = model(x)
+        with model_v4.mc_dropout(2):
+            out = model(torch.cat([x, x, x]))
+        after = model(x)
+    torch.testing.assert_close(out[:2], plain)
+    torch.testing.assert_close(after, plain)
+    assert not torch.allclose(out[2:4], plain)
+    assert not torch.allclose(out[2:4], out[4:6])
+
+
+def test_mc_dropout_samples_attention_dropout():
+    torch.manual_seed(0)
+    model = ResidualPredictor(6, 24, conv_filters=8, lstm_hidden=8, n_heads=2, dropout=0.5).eval()
+    for m in model.modules():
+        if isinstance(m, torch.nn.Dropout):
+            m.p = 0.0                                   # only the attention dropout is left
+    model_v4.enable_mc_dropout(model)
+    x = torch.randn(2, 24, 6)
+    with torch.no_grad():
+        plain = model(x)
+        with model_v4.mc_dropout(2):
+            out = model(torch.cat([x, x]))
+    torch.testing.assert_close(out[:2], plain)
+    assert not torch.allclose(out[2:], plain)
+    assert not model.attn.training
+
+
+def test_quantiles_from_one_batched_pass(manager, windows):
+    point = manager.predict_batch(windows)
+    out = manager.predict_batch(windows, mc_samples=4)
+    np.testing.assert_allclose(out["prediction"], point["prediction"], rtol=1e-5)
+    assert out["samples"].shape == (2, MEMBERS * 4, config.OUTPUT_LEN)
+    keys = [f"p{round(q * 100)}" for q in config.FORECAST_QUANTILES]
+    assert keys == ["p10", "p50", "p90"]
+    np.testing.assert_allclose(out["p50"], np.median(out["samples"], axis=1), rtol=1e-5)
+    assert np.all(out["p10"] <= out["p50"]) and np.all(out["p50"] <= out["p90"])
+    assert np.any(out["p10"] < out["p90"])
+
+
+def test_point_alerts():
+    assert app.peak_alerts(config.PEAK_CRITICAL_MW + 1)[0][0]["type"] == "CRITICAL"
+    assert app.peak_alerts(config.PEAK_WARNING_MW + 1)[0][0]["type"] == "WARNING"
+    assert app.peak_alerts(config.PEAK_WARNING_MW - 1) == ([], None)
+
+
+def test_probabilistic_alerts():
+    samples = np.full((10, 168), 15000.0)
+    samples[:3, 100] = config.PEAK_CRITICAL_MW + 1      # 30 % of draws cross the critical line
+    alerts, exceedance = app.peak_alerts(15000.0, samples)
+    assert exceedance == {str(int(config.PEAK_CRITICAL_MW)): 0.3, str(int(config.PEAK_WARNING_MW)): 0.3}
+    assert [a["type"] for a in alerts] == ["CRITICAL"] and alerts[0]["probability"] == 0.3
+
+    samples[:3, 100] = config.PEAK_WARNING_MW + 1
+    samples[:1, 100] = config.PEAK_CRITICAL_MW + 1      # 10 %: below ALERT_MIN_PROBABILITY
+    alerts, _ = app.peak_alerts(15000.0, samples)
+    assert [a["type"] for a in alerts] == ["WARNING"]
+
+    assert app.peak_alerts(15000.0, np.full((10, 168), 15000.0))[0] == []
+
+
+def test_forecast_endpoint_returns_quantiles(client, monkeypatch):
+    def offline(*args, **kwargs):
+        raise ConnectionError("offline")
+    monkeypatch.setattr(weather, "_request_hourly", offline)
+
+    resp = client.post("/api/forecast", json={"start_date": "2025-12-10 00:00", "quantiles": True})
+    assert resp.status_code == 200, resp.get_json()
+    body = resp.get_json()
+    row = body["forecast"][0]
+    assert row["p10"] <= row["p50"] <= row["p90"]
+    assert set(body["summary"]["peak_exceedance"]) == {str(int(config.PEAK_CRITICAL_MW)), str(int(config.PEAK_WARNING_MW))}
+
+    plain = client.post("/api/forecast", json={"start_date": "2025-12-10 00:00"}).get_json()
+    assert "p50" not in plain["forecast"][0] and plain["summary"]["peak_exceedance"] is None
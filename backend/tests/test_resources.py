@@ -0,0 +1,100 @@
+import pytest
+
+import resources
+from model_v4 import ModelV4Manager
+from resources import MB, MemoryGovernor
+
+MEMBER = 10 * MB
+
+
+@pytest.fixture()
+def history_csv(tmp_path):
+    """History CSV of 5000 rows x 10 columns."""
+    path = tmp_path / "history.csv"
+    path.write_text(",".join(f"c{i}" for i in range(10)) + "\n" + "0,0,0,0,0,0,0,0,0,0\n" * 5000)
+    return str(path)
+
+
+def with_budget(monkeypatch, budget, rss=200 * MB):
+    monkeypatch.setattr(MemoryGovernor, "budget", lambda self: (budget, budget, rss))
+
+
+def test_fit_bounds_and_grow_margin():
+    assert resources._fit(100 * MB, 10 * MB, held=0, lo=1, hi=5) == 5
+    assert resources._fit(5 * MB, 10 * MB, held=0, lo=1, hi=5) == 1
+    assert resources._fit(100 * MB, 0, held=0, lo=1, hi=5) == 5
+    # 3 fit, but growing from 2 to 3 also has to clear MEMORY_GROW_MARGIN_MB
+    room = 3 * MEMBER + (resources.MEMORY_GROW_MARGIN_MB - 1) * MB
+    assert resources._fit(room, MEMBER, held=2, lo=1, hi=5) == 2
+    assert resources._fit(room, MEMBER, held=3, lo=1, hi=5) == 3
+    assert resources._fit(room + 2 * MB, MEMBER, held=2, lo=1, hi=5) == 3
+
+
+def test_history_shape(history_csv, tmp_path):
+    assert resources.history_shape(history_csv) == (5000, 10)
+    unterminated = tmp_path / "short.csv"
+    unterminated.write_text("a,b\n1,2\n3,4")
+    assert resources.history_shape(str(unterminated)) == (2, 2)
+    assert resources.history_shape(str(tmp_path / "missing.csv")) == (0, 0)
+
+
+def test_limit_from_cgroup(monkeypatch, tmp_path):
+    limit = tmp_path / "memory.max"
+    monkeypatch.setattr(resources, "MEMORY_LIMIT_MB", None)
+    monkeypatch.setattr(resources, "_CGROUP_LIMIT_FILES", (str(limit),))
+    monkeypatch.setattr(resources, "_meminfo", lambda: {"MemTotal": 8192 * MB})
+
+    limit.write_text(f"{512 * MB}\n")
+    assert resources.memory_limit_bytes() == 512 * MB
+    limit.write_text("max\n")
+    assert resources.memory_limit_bytes() == 8192 * MB
+    monkeypatch.setattr(resources, "MEMORY_LIMIT_MB", 300)
+    assert resources.memory_limit_bytes() == 300 * MB
+
+
+def test_plan_loads_everything_without_a_known_limit(monkeypatch, history_csv):
+    with_budget(monkeypatch, None)
+    decision = MemoryGovernor().plan([MEMBER] * 3, zone="T", history_path=history_csv)
+    assert (decision["members"], decision["history_rows"], decision["fits"]) == (3, 5000, True)
+    assert decision["budget_mb"] is None
+
+
+def test_plan_shrinks_to_the_budget(monkeypatch, history_csv):
+    row_bytes = resources.history_row_bytes(10)
+    headroom = resources.MEMORY_HEADROOM_MB * MB
+    rows = resources.HISTORY_MIN_ROWS * row_bytes
+    margin = resources.MEMORY_GROW_MARGIN_MB * MB
+    with_budget(monkeypatch, 200 * MB + headroom + margin + 2 * resources.member_bytes(MEMBER) + rows + MB)
+    decision = MemoryGovernor().plan([MEMBER] * 3, zone="T", history_path=history_csv)
+    assert (decision["members"], decision["history_rows"], decision["fits"]) == (2, 5000, True)
+
+    with_budget(monkeypatch, 100 * MB)
+    decision = MemoryGovernor().plan([MEMBER] * 3, zone="T", history_path=history_csv)
+    assert decision["members"] == resources.MIN_ENSEMBLE_MEMBERS
+    assert decision["history_rows"] == resources.HISTORY_MIN_ROWS and not decision["fits"]
+
+
+def test_forget_drops_a_zone(monkeypatch, history_csv):
+    with_budget(monkeypatch, None)
+    gov = MemoryGovernor()
+    gov.report("ensemble", 3, MEMBER, zone="T")
+    gov.report("history", 100, 280, zone="T")
+    gov.report("ensemble", 2, MEMBER)
+    gov.plan([MEMBER] * 3, zone="T", history_path=history_csv)
+    gov.forget("T")
+    assert set(gov.usage) == {"ensemble"} and "T" not in gov.decisions
+
+
+def test_failed_load_forgets_the_zone(monkeypatch):
+    manager = ModelV4Manager(zone="T")
+
+    def broken_load():
+        resources.governor.report("ensemble", 2, MEMBER, zone="T")
+        resources.governor.decisions["T"] = {"members": 2}
+        raise OSError("member 3 is truncated")
+    monkeypatch.setattr(manager, "_load", broken_load)
+
+    with pytest.raises(OSError):
+        manager.load()
+    assert resources.governor.held("ensemble", "T") == 0
+    assert "T" not in resources.governor.decisions and not manager.loaded
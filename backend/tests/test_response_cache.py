@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import database as db
+import response_cache
+from config import MODEL_DIR
+from response_cache import CachedResponse, ResponseCache
+
+
+@pytest.fixture()
+def app_context(client):
+    import app
+    with app.app.app_context():
+        yield
+
+
+@pytest.fixture()
+def metrics_file(client):
+    path = os.path.join(MODEL_DIR, "v4", "all_model_comparison_v4.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"models": [{"name": f"model_{i}", "mape": i / 10} for i in range(100)]}, f)
+    yield path
+    os.remove(path)
+
+
+def test_entry_bytes_and_etags(app_context):
+    small = CachedResponse({"a": 1})
+    assert small.gzipped is None and small.etag_gzip is None
+    assert json.loads(small.body) == {"a": 1}
+
+    large = CachedResponse({"rows": list(range(1000))})
+    assert gzip.decompress(large.gzipped) == large.body
+    assert large.etag_gzip == large.etag + "-gz"
+    assert CachedResponse({"rows": list(range(1000))}).etag == large.etag
+
+
+def test_lru_is_bounded_by_bytes(app_context):
+    entries = {k: CachedResponse({"k": k}) for k in "abc"}
+    cache = ResponseCache(max_bytes=2 * entries["a"].nbytes)
+    cache.put("a", entries["a"])
+    cache.put("b", entries["b"])
+    assert cache.get("a") is entries["a"]       # a is now most recent
+    cache.put("c", entries["c"])
+    assert cache.get("b") is None and cache.get("a") is entries["a"]
+    cache.put("big", CachedResponse({"rows": list(range(1000))}))
+    assert cache.get("big") is None and cache.stats()["entries"] == 2
+
+
+def test_version_change_rebuilds(app_context):
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"n": len(builds)}
+    first = cache.get("k", version=1, build=build)
+    assert cache.get("k", version=1, build=build) is first
+    assert json.loads(cache.get("k", version=2, build=build).body) == {"n": 2}
+    assert cache.get("missing", build=lambda: None) is None
+
+
+def test_conditional_get_and_gzip(client, metrics_file):
+    response_cache.cache.clear()
+    first = client.get("/api/models")
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+    assert "Accept-Encoding" in first.headers["Vary"]
+    etag = first.headers["ETag"]
+    assert client.get("/api/models", headers={"If-None-Match": etag}).status_code == 304
+
+    zipped = client.get("/api/models", headers={"Accept-Encoding": "gzip, br"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["ETag"] != etag
+    assert gzip.decompress(zipped.data) == first.data
+    assert client.get("/api/models", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"}).status_code == 200
+
+    with open(metrics_file, "w") as f:
+        json.dump({"models": []}, f)
+    os.utime(metrics_file, ns=(0, os.stat(metrics_file).st_mtime_ns + 1))
+    changed = client.get("/api/models", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.get_json() == {"models": []}
+
+
+def test_history_detail_is_dropped_on_delete(client):
+    request_id = db.save_forecast_request("2025-06-01T00:00:00", "2025-06-07T23:00:00", "", "")
+    db.save_forecast_results(request_id, [{"hour_offset": 0, "timestamp": "2025-06-01T00:00:00",
+                                           "predicted_load": 1000.0}])
+    etag = client.get(f"/api/history/{request_id}").headers["ETag"]
+    assert client.get(f"/api/history/{request_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.delete(f"/api/history/{request_id}").status_code == 200
+    assert client.get(f"/api/history/{request_id}").status_code == 404
@@ -0,0 +1,103 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import database as db
+import retention
+
+
+def brute_force(ts, loads, request_ids, actual):
+    df = pd.DataFrame({"ts": pd.to_datetime(ts), "load": loads, "rid": request_ids, "actual": actual})
+    df["day"] = df.ts.dt.strftime("%Y-%m-%d")
+    df["err"] = np.where(df.actual > 0, df.load - df.actual, 0.0)
+    out = {}
+    for day, g in df.groupby("day"):
+        hit = g.actual > 0
+        out[day] = {"forecasts": g.rid.nunique(), "hours": len(g), "load_sum": g.load.sum(),
+                    "peak": g.load.max(), "min": g.load.min(), "actual_hours": int(hit.sum()),
+                    "abs_err": g.err.abs().sum(), "pct_err": (g.err.abs()[hit] / g.actual[hit]).sum()}
+    return out
+
+
+def test_daily_rollups_match_brute_force():
+    rng = np.random.default_rng(0)
+    ts = np.concatenate([np.arange(np.datetime64("2025-03-01T00"), np.datetime64("2025-03-08T00"))
+                         for _ in range(3)]).astype("datetime64[s]")
+    request_ids = np.repeat([1, 2, 3], len(ts) // 3)
+    loads = rng.normal(15000, 2000, len(ts))
+    a_ts = np.arange(np.datetime64("2025-02-20T00"), np.datetime64("2025-03-05T00")).astype("datetime64[s]")
+    a_load = rng.normal(15000, 2000, len(a_ts))
+    a_load[5::7] = 0  # zero actuals never count
+
+    rows = retention.daily_rollups("system", request_ids, ts, loads, (a_ts, a_load))
+    pos = np.minimum(np.searchsorted(a_ts, ts), len(a_ts) - 1)
+    actual = np.where(a_ts[pos] == ts, a_load[pos], 0.0)
+    expected = brute_force(ts, loads, request_ids, actual)
+
+    assert [r[1] for r in rows] == sorted(expected)
+    for (zone, day, forecasts, hours, load_sum, peak, peak_hour, low,
+         actual_hours, _, abs_err, pct_err) in rows:
+        e = expected[day]
+        assert (forecasts, hours, actual_hours) == (e["forecasts"], e["hours"], e["actual_hours"])
+        assert load_sum == pytest.approx(e["load_sum"])
+        assert (peak, low) == (pytest.approx(e["peak"]), pytest.approx(e["min"]))
+        assert peak_hour.startswith(day)
+        assert abs_err == pytest.approx(e["abs_err"]) and pct_err == pytest.approx(e["pct_err"])
+
+
+def store_forecast(created_at, start="2025-01-10T00:00:00", zone="system"):
+    request_id = db.save_forecast_request(start, start, start, start, zone=zone)
+    first = datetime.fromisoformat(start)
+    db.save_forecast_results(request_id, [
+        {"hour_offset": i, "timestamp": (first + timedelta(hours=i)).isoformat(), "predicted_load": 1000.0 + i}
+        for i in range(48)])
+    with db.get_db() as conn:
+        conn.execute("UPDATE forecast_requests SET created_at = ? WHERE id = ?", (created_at, request_id))
+    return request_id
+
+
+def test_pass_rolls_up_and_deletes_expired_requests(synthetic_artifacts, tmp_path, monkeypatch):
+    db.init_db()
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path))
+    now = datetime.now(timezone.utc)
+    old = store_forecast((now - timedelta(days=40)).strftime(retention.SQLITE_TIME), zone="RI")
+    recent = store_forecast((now - timedelta(days=1)).strftime(retention.SQLITE_TIME), zone="RI")
+
+    policy = retention.RetentionPolicy(full_days=30, actuals=None)
+    assert policy.run(dry_run=True)["requests"] == 1
+    deleted = []
+    summary = policy.run(on_deleted=deleted.extend)
+
+    assert summary["requests"] == 1 and summary["results"] == 48 and summary["archives"] == 1
+    assert deleted == [old]
+    assert db.get_request_with_results(old) is None
+    assert db.get_request_with_results(recent) is not None
+    days = db.get_daily_rollups("RI")
+    assert [d["day"] for d in days] == ["2025-01-10", "2025-01-11"]
+    assert days[0]["hours"] == 24 and days[0]["peak_load"] == 1023.0
+    assert np.load(next(tmp_path.rglob("*.npz")))["req_id"].tolist() == [old]
+    db.delete_request(recent)
+
+
+def test_server_passes_never_run_the_full_vacuum(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.execute("CREATE TABLE t (x)")
+    conn.commit()
+    policy = retention.RetentionPolicy()
+
+    assert policy.vacuum(conn) == 0
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    assert policy.status()["needs_conversion"]
+
+    policy.vacuum(conn, convert=True)  # what `python retention.py` does
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert not policy.needs_conversion
+    conn.close()
+
+
+def test_disabled_policy_is_never_due():
+    assert not retention.RetentionPolicy(interval=0).due()
+    assert retention.RetentionPolicy(full_days=0).expired_ids(None, datetime.now(timezone.utc)) == []
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from scaling import ScalingPlan, fill_gaps
+
+CONFIG = {
+    "FEATURE_COLS": ["temp", "wind", "Hour_sin", "load"],
+    "NUMERICAL_COLS": ["wind", "temp"],
+    "TARGET_COL": "load",
+}
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    """Scalers fitted like scaling_sequences.ipynb (numerical columns by name, target alone)."""
+    rng = np.random.default_rng(0)
+    train = pd.DataFrame({"temp": rng.normal(10, 8, 500), "wind": rng.gamma(2, 6, 500),
+                          "Hour_sin": np.sin(np.arange(500)), "load": rng.normal(15000, 2000, 500)})
+    feature_scaler = StandardScaler().fit(train[CONFIG["NUMERICAL_COLS"]])
+    target_scaler = StandardScaler().fit(train[["load"]].to_numpy())
+    return feature_scaler, target_scaler, ScalingPlan(CONFIG, feature_scaler, target_scaler)
+
+
+def reference(df, feature_scaler, target_scaler):
+    out = df.copy()
+    out[CONFIG["NUMERICAL_COLS"]] = feature_scaler.transform(df[CONFIG["NUMERICAL_COLS"]])
+    out["load"] = target_scaler.transform(df[["load"]].to_numpy())[:, 0]
+    return out[CONFIG["FEATURE_COLS"]].to_numpy(np.float32)
+
+
+def test_transform_matches_standard_scaler(fitted):
+    feature_scaler, target_scaler, plan = fitted
+    rng = np.random.default_rng(1)
+    windows = [pd.DataFrame(rng.normal(5, 3, (24, 4)), columns=["load", "Hour_sin", "wind", "temp"])
+               for _ in range(3)]
+    got = plan.transform(windows)
+    assert got.shape == (3, 24, 4) and got.dtype == np.float32
+    for k, w in enumerate(windows):
+        np.testing.assert_allclose(got[k], reference(w, feature_scaler, target_scaler), rtol=1e-6)
+    stacked = np.stack([w[CONFIG["FEATURE_COLS"]].to_numpy() for w in windows])
+    np.testing.assert_array_equal(plan.transform(stacked), got)
+
+
+def test_inverse_target_matches_standard_scaler(fitted):
+    _, target_scaler, plan = fitted
+    y = np.random.default_rng(2).normal(size=(2, 168)).astype(np.float32)
+    expected = target_scaler.inverse_transform(y.reshape(-1, 1)).reshape(y.shape)
+    np.testing.assert_allclose(plan.inverse_target(y), expected, rtol=1e-6)
+
+
+def test_transform_does_not_modify_the_input(fitted):
+    *_, plan = fitted
+    X = np.full((1, 4, 4), np.nan)
+    X[0, 2] = 1.0
+    plan.transform(X)
+    assert np.isnan(X[0, 0]).all()
+
+
+def test_fill_gaps_matches_pandas():
+    X = np.array([[np.nan, 1.0, np.nan, np.nan, 4.0, np.nan]]).T[None].repeat(2, axis=0)
+    X[1, :, 0] = np.nan
+    expected = [pd.Series(x[:, 0]).ffill().bfill().fillna(0).to_numpy() for x in X]
+    fill_gaps(X)
+    np.testing.assert_array_equal(X[0, :, 0], expected[0])
+    np.testing.assert_array_equal(X[0, :, 0], [1, 1, 1, 1, 4, 4])
+    np.testing.assert_array_equal(X[1, :, 0], expected[1])
+    np.testing.assert_array_equal(X[1, :, 0], np.zeros(6))
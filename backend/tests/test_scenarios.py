@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import config
+import features
+import weather
+from bench import synthetic
+
+START = "2025-12-10 00:00"
+
+
+@pytest.fixture(autouse=True)
+def offline_weather(monkeypatch):
+    """Seasonal fallback weather, without trying the network."""
+    def offline(*args, **kwargs):
+        raise ConnectionError("offline")
+    monkeypatch.setattr(weather, "_request_hourly", offline)
+
+
+def test_scenario_windows_match_single_windows(synthetic_artifacts):
+    history = synthetic.build_history(168)
+    base = weather.fetch_weather_forecast(datetime(2026, 1, 1), hours=168)
+    weathers = [base.with_temp_offset(o, {"Boston": c}) for o, c in [(0, 0), (-3, 0), (2, 1.5)]]
+    cols = synthetic_artifacts["FEATURE_COLS"]
+
+    windows = features.prepare_scenario_windows(history, weathers, cols)
+    assert windows.shape == (3, 168, len(cols))
+    for k, w in enumerate(weathers):
+        single = features.prepare_inference_data(history, w, cols).to_numpy(np.float64)
+        np.testing.assert_allclose(windows[k], single, rtol=1e-6)
+
+
+def test_sweep_scores_each_scenario(client):
+    resp = client.post("/api/scenarios", json={"start_date": START, "offsets": [-4, 0, 4]})
+    assert resp.status_code == 200, resp.get_json()
+    body = resp.get_json()
+    assert [sc["temp_offset"] for sc in body["scenarios"]] == [-4, 0, 4]
+    assert len(body["timestamps"]) == 168
+    for sc in body["scenarios"]:
+        assert len(sc["forecast"]) == len(sc["xgb_base"]) == 168
+        assert sc["peak_load"] == pytest.approx(max(sc["forecast"]))
+        assert sc["energy_mwh"] == pytest.approx(sum(sc["forecast"]), rel=1e-4)
+
+    alone = client.post("/api/scenarios", json={"start_date": START, "offsets": [0]}).get_json()
+    np.testing.assert_allclose(alone["scenarios"][0]["forecast"], body["scenarios"][1]["forecast"], rtol=1e-5)
+
+
+def test_explicit_scenarios(client):
+    resp = client.post("/api/scenarios", json={
+        "start_date": START,
+        "scenarios": [{"temp_offset": 1}, {"city_offsets": {"Boston": -2}}],
+    })
+    assert resp.status_code == 200, resp.get_json()
+    scenarios = resp.get_json()["scenarios"]
+    assert scenarios[0]["temp_offset"] == 1 and scenarios[0]["city_offsets"] == {}
+    assert scenarios[1]["temp_offset"] == 0 and scenarios[1]["city_offsets"] == {"Boston": -2.0}
+
+
+@pytest.mark.parametrize("body", [
+    {"offsets": [0]},
+    {"start_date": "10/12/2025"},
+    {"start_date": START, "city_offsets": {"Atlantis": 1}},
+    {"start_date": START, "offsets": []},
+    {"start_date": START, "offsets": list(range(config.MAX_SCENARIOS + 1))},
+])
+def test_bad_requests(client, body):
+    assert client.post("/api/scenarios", json=body).status_code == 400
@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import database as db
+import downsample
+import zones
+
+
+# ── Downsampling ───────────────────────────────────────────────────────
+
+def test_short_series_is_returned_whole():
+    assert downsample.downsample(np.arange(5), np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_lttb_keeps_endpoints_and_the_spike():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    keep = downsample.lttb_indices(np.arange(1000), y, 20)
+    assert len(keep) == 20 and keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 437 in keep
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=1000)
+    keep = downsample.minmax_indices(y, 100)
+    assert np.all(np.diff(keep) > 0) and len(keep) <= 100
+    for bucket in np.array_split(np.arange(1000), 50):
+        assert y[bucket].argmax() + bucket[0] in keep
+        assert y[bucket].argmin() + bucket[0] in keep
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        downsample.downsample(np.arange(10), np.arange(10.0), 5, "mean")
+
+
+# ── /api/series ────────────────────────────────────────────────────────
+
+@pytest.fixture()
+def zone_with_zero_actuals(client):
+    """Zone ME: 48 h of history whose first 24 actuals are 0, and a stored forecast over all of it."""
+    ts = pd.date_range("2025-06-01", periods=48, freq="h")
+    load = np.r_[np.zeros(24), np.full(24, 1000.0)]
+    path = zones.history_csv("ME")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame({"Timestamp": ts, "load": load}).to_csv(path, index=False)
+
+    request_id = db.save_forecast_request(ts[0].isoformat(), ts[-1].isoformat(), "", "", zone="ME")
+    db.save_forecast_results(request_id, [
+        {"hour_offset": i, "timestamp": t.isoformat(), "predicted_load": 1100.0} for i, t in enumerate(ts)])
+    yield
+    db.delete_request(request_id)
+    os.remove(path)
+
+
+def strict_json(response):
+    def reject(value):
+        raise ValueError(f"non-standard JSON constant {value}")
+    return json.loads(response.data, parse_constant=reject)
+
+
+def test_series_mape_skips_zero_actuals(client, zone_with_zero_actuals):
+    body = strict_json(client.get("/api/series?zone=ME&start=2025-06-01&end=2025-06-03"))
+    assert body["metrics"]["n"] == 48
+    assert body["metrics"]["mape"] == pytest.approx(10.0)
+    assert body["actual"]["raw_points"] == 48
+
+
+def test_series_mape_is_null_when_every_actual_is_zero(client, zone_with_zero_actuals):
+    body = strict_json(client.get("/api/series?zone=ME&start=2025-06-01&end=2025-06-02"))
+    assert body["metrics"]["n"] == 24
+    assert body["metrics"]["mape"] is None
+
+
+def test_series_rejects_bad_arguments(client):
+    assert client.get("/api/series?method=mean").status_code == 400
+    assert client.get("/api/series?zone=XX").status_code == 400
+
+
+def test_series_of_a_zone_without_history(client):
+    r = client.get("/api/series?zone=NH&column=load")
+    assert r.status_code == 404
+    assert r.get_json() == {"error": "No history data for zone 'NH'"}
+
+
+# ── Column cache ───────────────────────────────────────────────────────
+
+def test_column_cache_is_bounded(tmp_path, monkeypatch):
+    path = tmp_path / "history.csv"
+    cols = {f"c{i}": np.arange(10.0) + i for i in range(6)}
+    pd.DataFrame({"Timestamp": pd.date_range("2025-01-01", periods=10, freq="h"), **cols}).to_csv(path, index=False)
+    store = zones.HistoryStore("system", manager=None)
+    monkeypatch.setattr(store, "path", str(path))
+    monkeypatch.setattr(zones, "HISTORY_COLUMN_CACHE", 2)
+
+    for name in ("c0", "c1", "c0", "c2"):
+        ts, values = store.column(name)
+    assert values.tolist() == (np.arange(10.0) + 2).tolist()
+    assert list(store.columns) == ["c0", "c2"]  # c1 was least recently used
+    assert zones.resources.governor.held("columns") == 2
+    store.unload()
+    assert zones.resources.governor.held("columns") == 0
@@ -0,0 +1,57 @@
+import pytest
+
+import telemetry
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    telemetry.reset()
+    yield
+    telemetry.reset()
+
+
+def test_histogram_buckets_are_cumulative():
+    for seconds in (0.0004, 0.003, 0.003, 40.0):
+        telemetry.observe("voltcast_stage_duration_seconds", seconds, stage="xgboost")
+    text = telemetry.render()
+    prefix = 'voltcast_stage_duration_seconds_bucket{stage="xgboost",le='
+    assert f'{prefix}"0.0005"}} 1' in text
+    assert f'{prefix}"0.005"}} 3' in text
+    assert f'{prefix}"30.0"}} 3' in text
+    assert f'{prefix}"+Inf"}} 4' in text
+    assert 'voltcast_stage_duration_seconds_count{stage="xgboost"} 4' in text
+    assert text.count("# TYPE voltcast_stage_duration_seconds histogram") == 1
+
+
+def test_counters_gauges_and_label_escaping():
+    telemetry.inc("voltcast_requests_total", endpoint="/api/forecast", status=200)
+    telemetry.inc("voltcast_requests_total", 2, endpoint="/api/forecast", status=200)
+    telemetry.set_gauge("voltcast_loaded_zones", 3)
+    telemetry.inc("voltcast_errors_total", endpoint='say "hi"\n')
+    text = telemetry.render()
+    assert 'voltcast_requests_total{endpoint="/api/forecast",status="200"} 3' in text
+    assert "voltcast_loaded_zones 3" in text
+    assert 'voltcast_errors_total{endpoint="say \\"hi\\"\\n"} 1' in text
+    assert "# HELP voltcast_requests_total API requests by endpoint and status code." in text
+
+
+def test_request_trace_and_timing_header():
+    telemetry.begin_request()
+    with telemetry.stage("weather"):
+        pass
+    with pytest.raises(RuntimeError):
+        with telemetry.stage("features"):
+            raise RuntimeError  # failed stages are still timed
+    trace, total = telemetry.end_request()
+    assert [name for name, _ in trace] == ["weather", "features"]
+    header = telemetry.timing_header(trace, total)
+    assert header.startswith("weather;dur=") and ", features;dur=" in header and ", total;dur=" in header
+    assert telemetry.end_request() == ([], 0.0)
+
+
+def test_metrics_endpoint_and_timing_opt_in(client):
+    r = client.get("/api/history", headers={"X-Timing": "1"})
+    assert "total;dur=" in r.headers["X-Timing"]
+    assert "X-Timing" not in client.get("/api/history").headers
+    body = client.get("/api/metrics").get_data(as_text=True)
+    assert 'voltcast_requests_total{endpoint="/api/history",status="200"}' in body
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import torch
+from sklearn.preprocessing import StandardScaler
+
+import features
+import train_v4
+from model_v4 import ResidualPredictor
+from scaling import ScalingPlan
+
+
+def small_model(noise_std):
+    torch.manual_seed(0)
+    return ResidualPredictor(6, 24, conv_filters=8, lstm_hidden=8, n_heads=2, dropout=0.0, noise_std=noise_std)
+
+
+def test_input_noise_only_while_training():
+    x = torch.randn(4, 24, 6)
+    noisy, clean = small_model(0.1), small_model(0.0)
+    noisy.train(), clean.train()
+    assert not torch.equal(noisy(x), noisy(x))
+    assert torch.equal(clean(x), clean(x))
+    noisy.eval()
+    assert torch.equal(noisy(x), noisy(x))
+
+
+def test_sliding_windows_are_views_of_the_series():
+    series = np.arange(50 * 3, dtype=np.float32).reshape(50, 3)
+    target = np.arange(50, dtype=np.float32)
+    X, y = features.sliding_windows(series, target, 10, 5, start_offset=2)
+    assert X.shape == (34, 10, 3) and y.shape == (34, 5)
+    np.testing.assert_array_equal(X[0], series[2:12])
+    np.testing.assert_array_equal(y[0], target[12:17])
+    np.testing.assert_array_equal(y[-1], target[45:50])
+    assert np.shares_memory(X, series)
+
+
+def test_batch_xgb_features_match_per_window():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(7, 168, 5)).astype(np.float32)
+    expected = np.stack([features.engineer_xgb_features(w, 2) for w in X])
+    np.testing.assert_allclose(features.engineer_xgb_features_batch(X, 2), expected, rtol=1e-5, atol=1e-5)
+
+
+def target_plan(mean=15000.0, scale=2000.0):
+    cfg = {"FEATURE_COLS": ["x", "load"], "NUMERICAL_COLS": ["x"], "TARGET_COL": "load"}
+    feature_scaler = StandardScaler().fit(np.array([[0.0], [1.0]]))
+    target_scaler = StandardScaler().fit(np.array([[mean - scale], [mean + scale]]))
+    return ScalingPlan(cfg, feature_scaler, target_scaler)
+
+
+def test_blend_metrics_match_a_per_alpha_loop():
+    rng = np.random.default_rng(1)
+    plan = target_plan()
+    y, xgb, res = (rng.normal(size=(20, 24)).astype(np.float32) for _ in range(3))
+    alphas = [0.0, 0.5, 1.0]
+    got = train_v4.blend_metrics(plan, y, xgb, res, alphas)
+    for i, a in enumerate(alphas):
+        yt, yp = plan.inverse_target(y), plan.inverse_target(xgb + a * res)
+        err = (yt - yp).astype(np.float64)
+        assert got["MAE"][i] == pytest.approx(np.abs(err).mean(), rel=1e-5)
+        assert got["RMSE"][i] == pytest.approx(np.sqrt((err ** 2).mean()), rel=1e-5)
+        assert got["MAPE"][i] == pytest.approx(np.mean(np.abs(err / yt)) * 100, rel=1e-5)
+        peak = yt.argmax(axis=1)
+        assert got["Peak_MAE"][i] == pytest.approx(np.abs(err[np.arange(20), peak]).mean(), rel=1e-5)
+
+
+def test_train_member_runs_one_epoch(tmp_path):
+    rng = np.random.default_rng(0)
+    n_feat, T = 4, train_v4.INPUT_LEN + train_v4.OUTPUT_LEN
+    data = {"offsets": {"train": 0, "val": 0, "test": 0}, "stride": {"train": 8, "val": 8, "test": 8}}
+    for split in ("train", "val", "test"):
+        X = rng.normal(size=(T + 63, n_feat)).astype(np.float32)
+        data[f"X_{split}"], data[f"y_{split}"] = X, X[:, 0].copy()
+        n = len(features.sliding_windows(X, X[:, 0], train_v4.INPUT_LEN, train_v4.OUTPUT_LEN)[0][::8])
+        data[f"xgb_{split}"] = np.zeros((n, train_v4.OUTPUT_LEN), dtype=np.float32)
+    train_v4._init_worker(data, torch.get_num_threads())
+    hp = dict(train_v4.HP, max_epochs=1, batch_size=4, conv_filters=8, lstm_hidden=8, n_heads=2)
+
+    out = train_v4.train_member(0, 42, hp, str(tmp_path / "m.pt"))
+    assert np.isfinite(out["best_val"]) and len(out["history"]["val"]) == 1
+    assert out["res_val"].shape == (8, train_v4.OUTPUT_LEN)
+    assert (tmp_path / "m.pt").exists()
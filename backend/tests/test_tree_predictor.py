@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from xgboost import XGBRegressor
+
+from tree_predictor import PackedForest, TreePredictor
+
+
+@pytest.fixture(scope="module")
+def model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 12)).astype(np.float32)
+    Y = np.column_stack([X[:, 0] * 3 + X[:, 1], np.sin(X[:, 2]), X[:, 3] ** 2])
+    return XGBRegressor(n_estimators=15, max_depth=4, learning_rate=0.3, tree_method="hist").fit(X, Y)
+
+
+def random_inputs(n, n_features, seed=1):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 1.5, (n, n_features)).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan  # default directions
+    return X
+
+
+def test_packed_matches_inplace_predict(model):
+    forest = PackedForest.from_model(model)
+    X = random_inputs(64, 12)
+    expected = model.get_booster().inplace_predict(X)
+    np.testing.assert_allclose(forest.predict(X), expected, atol=1e-5)
+
+
+def test_predictor_routes_by_batch_size(model):
+    forest = PackedForest.from_model(model)
+    predictor = TreePredictor(model, forest, packed_max_batch=4)
+    X = random_inputs(10, 12, seed=2)
+    np.testing.assert_allclose(predictor.predict(X[:1]), predictor.predict(X)[:1], atol=1e-5)
+    assert predictor.mode == "packed<=4"
+
+
+def test_source_round_trip(model, tmp_path):
+    path = tmp_path / "forest.npz"
+    PackedForest.from_model(model, "ab" * 32).save(path)
+    loaded = PackedForest.load(path)
+    assert loaded.source == "ab" * 32
+    np.testing.assert_array_equal(loaded.predict(random_inputs(5, 12)),
+                                  PackedForest.from_model(model).predict(random_inputs(5, 12)))
+
+
+def test_forest_without_source_loads_as_unknown(model, tmp_path):
+    forest = PackedForest.from_model(model)
+    path = tmp_path / "old.npz"
+    with open(path, "wb") as f:  # layout written before sources were recorded
+        np.savez(f, **{name: getattr(forest, name) for name in PackedForest.FIELDS})
+    assert PackedForest.load(path).source == ""
+
+
+def test_manager_ignores_stale_forest(synthetic_artifacts):
+    import joblib
+    import artifacts
+    import config
+    from model_v4 import ModelV4Manager
+
+    xgb = joblib.load(config.XGB_MODEL_PATH)
+    matching = artifacts.sha256_file(config.XGB_MODEL_PATH)
+    for source, mode in (("0" * 64, "booster"), (matching, f"packed<={config.XGB_PACKED_MAX_BATCH}")):
+        PackedForest.from_model(xgb, source).save(config.XGB_FOREST_PATH)
+        manager = ModelV4Manager(store=artifacts.ArtifactStore(source=""))
+        manager.load()
+        assert manager.xgb_predictor.mode == mode
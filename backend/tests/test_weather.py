@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import config
+import features
+import market
+import weather
+
+CITIES = ("Boston", "Hartford")
+
+
+def make_weather(hours=6):
+    values = np.arange(len(CITIES) * hours * len(weather.WEATHER_VARS), dtype=np.float32)
+    return weather.WeatherArray(values.reshape(len(CITIES), hours, -1), CITIES)
+
+
+def test_accessors_are_views():
+    w = make_weather()
+    assert w.hours == 6
+    assert np.shares_memory(w.temp, w.values)
+    assert np.shares_memory(w.city("Hartford"), w.values)
+    np.testing.assert_array_equal(w.city("Hartford")[:, 0], w.temp[1])
+    np.testing.assert_array_equal(w.var("Wind100"), w.values[:, :, -1])
+
+
+def test_with_temp_offset_copies():
+    w = make_weather()
+    shifted = w.with_temp_offset(2.0, {"Hartford": -1.0})
+    np.testing.assert_array_equal(shifted.temp[0], w.temp[0] + 2.0)
+    np.testing.assert_array_equal(shifted.temp[1], w.temp[1] + 1.0)
+    np.testing.assert_array_equal(shifted.solar, w.solar)
+    assert not np.shares_memory(shifted.values, w.values)
+    with pytest.raises(ValueError):
+        w.with_temp_offset(city_offsets={"Nowhere": 1.0})
+
+
+def test_to_frame_matches_training_columns():
+    w = make_weather()
+    df = w.to_frame()
+    expected = [f"{var}_{city}" for city in CITIES for var in weather.WEATHER_VARS]
+    assert list(df.columns) == expected
+    np.testing.assert_array_equal(df["Solar_Boston"].values, w.solar[0])
+
+
+def test_degree_hours_and_renewables():
+    w = make_weather()
+    cols = features.generate_cdh_hdh(w)
+    np.testing.assert_array_equal(cols["CDH_Hartford"], np.maximum(0, w.temp[1] - config.CDH_BASE))
+    np.testing.assert_array_equal(cols["HDH_Boston"], np.maximum(0, config.HDH_BASE - w.temp[0]))
+
+    solar, wind = market.estimate_renewables(w)
+    assert solar.shape == wind.shape == (w.hours,)
+    np.testing.assert_allclose(solar, w.solar.sum(axis=0) * 1.5)
+
+
+def test_seasonal_fallback_covers_every_city(monkeypatch):
+    def offline(*args, **kwargs):
+        raise ConnectionError("offline")
+    monkeypatch.setattr(weather, "_request_hourly", offline)
+
+    w = weather.fetch_weather_forecast(datetime(2025, 1, 15), hours=48)
+    assert w.values.shape == (len(config.WEATHER_CITIES), 48, len(weather.WEATHER_VARS))
+    assert w.values.dtype == np.float32
+    assert not np.isnan(w.values).any()
+    np.testing.assert_allclose(w.temp.mean(axis=1), config.SEASONAL_TEMP[1], atol=1.0)
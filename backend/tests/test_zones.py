@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+
+import resources
+import zones
+
+
+class FakeSet:
+    """Stands in for ZoneModels: records loads and unloads, costs nothing."""
+    def __init__(self, zone, fail=False):
+        self.zone = zone
+        self.fail = fail
+        self.loaded = False
+        self.users = 0
+        self.unloads = 0
+
+    def load(self):
+        if self.fail:
+            raise FileNotFoundError(self.zone)
+        self.loaded = True
+
+    def unload(self):
+        self.loaded = False
+        self.unloads += 1
+
+    def floor_bytes(self):
+        return 0
+
+
+def fake_pool(names, max_loaded=None, failing=()):
+    pool = zones.ModelPool(zones=names, max_loaded=max_loaded)
+    pool._sets = {z: FakeSet(z, fail=z in failing) for z in names}
+    return pool
+
+
+def test_evicts_least_recently_used_idle_zone():
+    pool = fake_pool(["a", "b", "c"], max_loaded=2)
+    for zone in ("a", "b", "a", "c"):
+        with pool.use(zone):
+            pass
+    assert pool.loaded_zones() == ["a", "c"]
+    assert pool._sets["b"].unloads == 1 and pool.evictions == 1
+
+
+def test_zone_in_use_is_never_evicted():
+    pool = fake_pool(["a", "b"], max_loaded=1)
+    with pool.use("a"):
+        with pool.use("b"):
+            assert pool._sets["a"].loaded
+    assert pool.loaded_zones() == ["a", "b"]
+
+
+def test_failed_load_is_unloaded_and_not_tracked():
+    pool = fake_pool(["a", "bad"], failing={"bad"})
+    with pytest.raises(FileNotFoundError):
+        with pool.use("bad"):
+            pass
+    zm = pool._sets["bad"]
+    assert zm.unloads == 1 and zm.users == 0
+    assert pool.loaded_zones() == []
+
+
+class SlowFailingSet(FakeSet):
+    """First load() blocks until released, then fails; later loads succeed unless `fail` is set."""
+    def __init__(self, zone, fail=False):
+        super().__init__(zone, fail)
+        self.started, self.release = threading.Event(), threading.Event()
+        self.calls = 0
+
+    def load(self):
+        self.calls += 1
+        if self.calls == 1:
+            self.started.set()
+            self.release.wait(5)
+            raise OSError("truncated download")
+        super().load()
+
+
+def run_failing_load(pool, zone):
+    """Start a request whose load of `zone` fails once released; returns (thread, errors)."""
+    errors = []
+
+    def request():
+        try:
+            with pool.use(zone):
+                pass
+        except OSError as e:
+            errors.append(e)
+    thread = threading.Thread(target=request)
+    thread.start()
+    assert pool._sets[zone].started.wait(5)
+    return thread, errors
+
+
+def test_failed_load_keeps_a_set_another_request_is_using():
+    pool = zones.ModelPool(zones=["a"])
+    zm = pool._sets["a"] = SlowFailingSet("a")
+    thread, errors = run_failing_load(pool, "a")
+    with pool.use("a"):
+        zm.release.set()
+        thread.join(5)
+        assert errors and zm.loaded and zm.unloads == 0
+    assert pool.loaded_zones() == ["a"] and zm.unloads == 0 and zm.users == 0
+
+
+def test_failed_loads_unload_once_after_the_last_holder():
+    pool = zones.ModelPool(zones=["a"])
+    zm = pool._sets["a"] = SlowFailingSet("a", fail=True)
+    thread, errors = run_failing_load(pool, "a")
+    with pytest.raises(FileNotFoundError):
+        with pool.use("a"):
+            pass
+    assert zm.unloads == 0          # the first request still holds the set
+    zm.release.set()
+    thread.join(5)
+    assert errors and zm.unloads == 1 and zm.users == 0
+    assert pool.loaded_zones() == []
+
+
+def test_unknown_zone():
+    with pytest.raises(zones.UnknownZone):
+        fake_pool(["a"]).get("b")
+
+
+def test_zone_without_artifacts_leaves_nothing_behind(synthetic_artifacts):
+    pool = zones.ModelPool()
+    assert "VT" not in pool.available_zones()
+    with pytest.raises(Exception):
+        with pool.use("VT"):
+            pass
+    zm = pool.get("VT")
+    assert zm.history.df is None and not zm.manager.loaded
+    assert "VT" not in resources.governor.decisions
+    assert "VT" not in pool.loaded_zones()
+
+
+def test_available_zones_lists_zones_with_artifacts(synthetic_artifacts):
+    assert zones.ModelPool().available_zones() == [zones.DEFAULT_ZONE]
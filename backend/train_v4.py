@@ -0,0 +1,387 @@
+"""
+Headless V4 training (scaling_sequences + baseline_model + deep_learning_model_v4 notebooks).
+Reads a zone's history CSV, windows it, trains the residual ensemble with one
+seed per worker process on CPU, searches the blend alpha over all candidates
+at once and writes the artifacts where config.py / artifacts.py expect them
+(the zone's model dir; publish with artifacts.py or deploy_to_hf.py).
+
+Usage:
+    python train_v4.py [--zone ME] [--refit] [--seeds 42,123,456] [--workers N]
+                       [--max-epochs 80] [--patience 20] [--stride 1] [--model-dir DIR]
+
+--refit also refits the scalers and XGBoost (baseline_model.ipynb settings);
+otherwise the model dir's config, scalers and XGBoost are reused.
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import StandardScaler
+import artifacts
+import features
+import resources
+import zones
+from model_v4 import ResidualPredictor
+from scaling import ScalingPlan
+from tree_predictor import PackedForest
+from config import DEFAULT_ZONE, INPUT_LEN, OUTPUT_LEN
+
+TRAIN_YEARS  = [2018, 2019, 2020, 2021, 2022]
+VAL_YEARS    = [2023]
+TEST_YEARS   = [2024, 2025]
+BOUNDARY_GAP = 168   # skipped at the start of val/test to avoid cross-split leakage
+SIN_COS_COLS = ['Hour_sin', 'Hour_cos', 'Day_sin', 'Day_cos', 'Month_sin', 'Month_cos']
+TARGET_COL   = 'load'
+
+# deep_learning_model_v4.ipynb; the architecture must match what model_v4 loads
+HP = {
+    'batch_size': 64, 'lr': 3e-4, 'weight_decay': 1e-3,
+    'max_epochs': 80, 'patience': 20, 'grad_clip': 0.5,
+    'dropout': 0.25, 'noise_std': 0.015,
+    'mixup_alpha': 0.2,
+    'conv_filters': 48, 'lstm_hidden': 128, 'n_heads': 4,
+    'n_ensemble': 3, 'seeds': [42, 123, 456],
+}
+XGB_PARAMS = dict(n_estimators=300, max_depth=6, learning_rate=0.05, subsample=0.8,
+                  colsample_bytree=0.8, tree_method='hist', random_state=42)
+ALPHAS = np.round(np.arange(0.0, 1.05, 0.05), 2)
+HORIZONS = [1, 24, 72, 168]
+EVAL_BATCH = 256
+
+
+# ── Data ───────────────────────────────────────────────────────────────
+
+def training_config(df):
+    """Feature layout as in scaling_sequences.ipynb: numerical + sin/cos + target-as-input."""
+    numerical = [c for c in df.columns if c not in ['Timestamp', TARGET_COL] + SIN_COS_COLS]
+    feature_cols = numerical + SIN_COS_COLS + [TARGET_COL]
+    return {
+        'FEATURE_COLS': feature_cols,
+        'TARGET_COL': TARGET_COL,
+        'NUMERICAL_COLS': numerical,
+        'SIN_COS_COLS': SIN_COS_COLS,
+        'INPUT_LEN': INPUT_LEN,
+        'OUTPUT_LEN': OUTPUT_LEN,
+        'N_FEATURES': len(feature_cols),
+        'load_col_idx': feature_cols.index(TARGET_COL),
+    }
+
+
+def load_splits(path):
+    """History CSV -> {'train'|'val'|'test': DataFrame} split by year."""
+    df = pd.read_csv(path)
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    df = df.sort_values('Timestamp').reset_index(drop=True)
+    years = df['Timestamp'].dt.year
+    return {name: df[years.isin(ys)].reset_index(drop=True)
+            for name, ys in (('train', TRAIN_YEARS), ('val', VAL_YEARS), ('test', TEST_YEARS))}
+
+
+def scaled_series(plan, df, load_idx):
+    """One split as scaled (T, F) features and its (T,) scaled target (ScalingPlan, as at inference)."""
+    X = plan.transform(df[plan.columns].to_numpy(np.float64)[None])[0]
+    return X, X[:, load_idx].copy()
+
+
+# ── Ensemble members (one per worker process) ──────────────────────────
+
+_data = {}
+
+
+def _init_worker(data, threads):
+    _data.update(data)
+    torch.set_num_threads(threads)
+
+
+def _batches(X, xgb, idx, size):
+    """(B, 168, F+1) float32 inputs: window features + the XGBoost prediction as the last feature."""
+    for s in range(0, len(idx), size):
+        b = idx[s:s + size]
+        yield b, torch.from_numpy(np.concatenate([X[b], xgb[b][:, :, None]], axis=-1))
+
+
+def _windows(split):
+    X, y = features.sliding_windows(_data[f'X_{split}'], _data[f'y_{split}'], INPUT_LEN, OUTPUT_LEN,
+                                    _data['offsets'][split])
+    return X[::_data['stride'][split]], y[::_data['stride'][split]]
+
+
+def _predict_residuals(model, split):
+    X, _ = _windows(split)
+    xgb = _data[f'xgb_{split}']
+    model.eval()
+    out = []
+    with torch.no_grad():
+        for _, xb in _batches(X, xgb, np.arange(len(X)), EVAL_BATCH):
+            out.append(model(xb).numpy())
+    return np.concatenate(out)
+
+
+def train_member(idx, seed, hp, path):
+    """
+    Train one residual model (notebook STEP 5) and save its best state to path.
+    Same recipe as the notebook: Huber loss, AdamW, cosine warm restarts,
+    mixup, training-mode input noise (ResidualPredictor.noise_std) and early
+    stopping on the mean per-batch validation loss.
+    """
+    t0 = time.time()
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    X_tr, y_tr = _windows('train')
+    X_va, y_va = _windows('val')
+    xgb_tr, xgb_va = _data['xgb_train'], _data['xgb_val']
+    res_tr = torch.from_numpy(y_tr - xgb_tr)   # DL targets are residuals
+    res_va = torch.from_numpy(y_va - xgb_va)
+
+    model = ResidualPredictor(X_tr.shape[-1] + 1, OUTPUT_LEN, hp['conv_filters'], hp['lstm_hidden'],
+                              hp['n_heads'], hp['dropout'], hp['noise_std'])
+    criterion = nn.HuberLoss(delta=0.5)
+    opt = torch.optim.AdamW(model.parameters(), lr=hp['lr'], weight_decay=hp['weight_decay'])
+    sched = torch.optim.lr_scheduler.CosineAnnealingWarmRestarts(opt, T_0=20, T_mult=2, eta_min=1e-6)
+
+    hist = {'train': [], 'val': [], 'lr': []}
+    best_vl, patience_ctr, best_state = float('inf'), 0, None
+    n_full = len(X_tr) - len(X_tr) % hp['batch_size']   # drop_last
+    for ep in range(hp['max_epochs']):
+        model.train()
+        losses = []
+        order = rng.permutation(len(X_tr))[:n_full]
+        for b, xb in _batches(X_tr, xgb_tr, order, hp['batch_size']):
+            yb = res_tr[b]
+            if hp['mixup_alpha'] > 0:
+                lam = float(max(rng.beta(hp['mixup_alpha'], hp['mixup_alpha']), 0.5))
+                perm = torch.randperm(len(b))
+                xb, yb = lam * xb + (1 - lam) * xb[perm], lam * yb + (1 - lam) * yb[perm]
+            opt.zero_grad()
+            loss = criterion(model(xb), yb)
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), hp['grad_clip'])
+            opt.step()
+            losses.append(loss.item())
+        sched.step()
+
+        # Validation loss as in the notebook: mean of per-batch means over batch_size batches
+        model.eval()
+        vl = []
+        with torch.no_grad():
+            for b, xb in _batches(X_va, xgb_va, np.arange(len(X_va)), hp['batch_size']):
+                vl.append(criterion(model(xb), res_va[b]).item())
+        tl, vl = float(np.mean(losses)), float(np.mean(vl))
+        hist['train'].append(tl)
+        hist['val'].append(vl)
+        hist['lr'].append(float(opt.param_groups[0]['lr']))
+
+        if vl < best_vl:
+            best_vl, patience_ctr = vl, 0
+            best_state = copy.deepcopy(model.state_dict())
+        else:
+            patience_ctr += 1
+        if (ep + 1) % 5 == 0 or patience_ctr == 0:
+            print(f"  [seed {seed}] Ep {ep+1:3d}/{hp['max_epochs']} | T:{tl:.5f} V:{vl:.5f}"
+                  f"{' ✅' if patience_ctr == 0 else ''}", flush=True)
+        if patience_ctr >= hp['patience']:
+            print(f"  [seed {seed}] ⛔ Early stop ep {ep+1}", flush=True)
+            break
+
+    model.load_state_dict(best_state)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.save(model.state_dict(), path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return {
+        'idx': idx, 'seed': seed, 'best_val': best_vl, 'history': hist,
+        'seconds': round(time.time() - t0, 1),
+        'res_val': _predict_residuals(model, 'val'),
+        'res_test': _predict_residuals(model, 'test'),
+    }
+
+
+# ── Blend search and metrics ───────────────────────────────────────────
+
+def blend_metrics(plan, y, xgb, res, alphas):
+    """
+    compute_metrics (notebook) of xgb + alpha * res for every alpha at once.
+    Returns {metric: (len(alphas),) array} in MW.
+    """
+    yt = plan.inverse_target(y)                                    # (N, H)
+    alphas = np.asarray(alphas, dtype=np.float32)
+    yp = plan.inverse_target(xgb[None] + alphas[:, None, None] * res[None])   # (A, N, H)
+    err = yt[None] - yp
+    mask = yt != 0
+    peak = np.argmax(yt, axis=1)
+    rows = np.arange(len(yt))
+    return {
+        'MAE': np.abs(err).mean(axis=(1, 2), dtype=np.float64),
+        'RMSE': np.sqrt(np.square(err).mean(axis=(1, 2), dtype=np.float64)),
+        'MAPE': (np.abs(err[:, mask]) / np.abs(yt[mask])).mean(axis=1, dtype=np.float64) * 100,
+        'Peak_MAE': np.abs(err[:, rows, peak]).mean(axis=1, dtype=np.float64),
+    }
+
+
+def metrics_at(m, i):
+    return {k: round(float(v[i]), 2) for k, v in m.items()}
+
+
+def horizon_metrics(plan, y, pred):
+    yt, yp = plan.inverse_target(y), plan.inverse_target(pred)
+    out = {}
+    for h in HORIZONS:
+        t, p = yt[:, h - 1], yp[:, h - 1]
+        mk = t != 0
+        out[str(h)] = {'MAE': round(float(np.abs(t - p).mean()), 2),
+                       'RMSE': round(float(np.sqrt(((t - p).astype(np.float64) ** 2).mean())), 2),
+                       'MAPE': round(float(np.mean(np.abs((t[mk] - p[mk]) / t[mk])) * 100), 2)}
+    return out
+
+
+# ── Pipeline ───────────────────────────────────────────────────────────
+
+def train(zone=DEFAULT_ZONE, model_dir=None, refit=False, seeds=None, workers=None, stride=1,
+          max_epochs=None, patience=None):
+    t_start = time.time()
+    model_dir = model_dir or artifacts.zone_model_dir(zone)
+    paths = artifacts.local_paths(model_dir)
+    hp = dict(HP, seeds=list(seeds or HP['seeds']))
+    hp['n_ensemble'] = len(hp['seeds'])
+    if max_epochs:
+        hp['max_epochs'] = max_epochs
+    if patience:
+        hp['patience'] = patience
+    if hp['n_ensemble'] != len(artifacts.DL_FILES):
+        # Every configured member file is served: fewer seeds would leave stale members behind
+        raise ValueError(f"Need {len(artifacts.DL_FILES)} seeds, one per configured ensemble file")
+
+    print(f"📂 Loading history for {zone}...")
+    splits = load_splits(zones.history_csv(zone))
+    for name, df in splits.items():
+        if len(df) < INPUT_LEN + OUTPUT_LEN + BOUNDARY_GAP:
+            raise ValueError(f"Not enough {name} rows ({len(df)}) in the history CSV")
+        print(f"  {name:5s}: {len(df):,} rows | {df['Timestamp'].min()} → {df['Timestamp'].max()}")
+
+    # 1. Config + scalers (fit on train), or the ones already in the model dir
+    if refit:
+        cfg = training_config(splits['train'])
+        feature_scaler = StandardScaler().fit(splits['train'][cfg['NUMERICAL_COLS']])
+        target_scaler = StandardScaler().fit(splits['train'][[TARGET_COL]])
+    else:
+        cfg = joblib.load(paths[artifacts.CONFIG_FILE])
+        feature_scaler = joblib.load(paths[artifacts.FEATURE_SCALER_FILE])
+        target_scaler = joblib.load(paths[artifacts.TARGET_SCALER_FILE])
+    plan = ScalingPlan(cfg, feature_scaler, target_scaler)
+    load_idx = cfg['load_col_idx']
+
+    # 2. Windows: zero-copy views over each scaled split
+    data = {'offsets': {'train': 0, 'val': BOUNDARY_GAP, 'test': BOUNDARY_GAP},
+            'stride': {'train': stride, 'val': 1, 'test': 1}}
+    windows = {}
+    for name, df in splits.items():
+        data[f'X_{name}'], data[f'y_{name}'] = scaled_series(plan, df, load_idx)
+        X, y = features.sliding_windows(data[f'X_{name}'], data[f'y_{name}'], INPUT_LEN, OUTPUT_LEN,
+                                        data['offsets'][name])
+        windows[name] = (X[::data['stride'][name]], y[::data['stride'][name]])
+        print(f"  {name:5s} windows: X={windows[name][0].shape}")
+
+    # 3. XGBoost base predictions
+    t0 = time.time()
+    Xf = {name: features.engineer_xgb_features_batch(X, load_idx) for name, (X, _) in windows.items()}
+    if refit:
+        from xgboost import XGBRegressor
+        print("🌲 Training XGBoost (multi-output)...")
+        xgb_model = XGBRegressor(**XGB_PARAMS)
+        xgb_model.fit(Xf['train'], windows['train'][1], eval_set=[(Xf['val'], windows['val'][1])], verbose=50)
+    else:
+        xgb_model = joblib.load(paths[artifacts.XGB_FILE])
+    for name in windows:
+        data[f'xgb_{name}'] = xgb_model.predict(Xf[name]).astype(np.float32)
+    print(f"🌲 XGBoost predictions ready in {time.time() - t0:.1f}s")
+
+    # 4. Residual ensemble: one seed per process, CPUs split between them
+    n_cpu = resources.cpu_count()
+    workers = max(1, min(workers or n_cpu, hp['n_ensemble']))
+    threads = max(1, n_cpu // workers)
+    member_paths = [paths[name] for name in artifacts.DL_FILES]
+    print(f"🧠 Training {hp['n_ensemble']} residual models on {workers} process(es) x {threads} thread(s)...")
+    ctx = multiprocessing.get_context('spawn')   # fresh interpreters: no forked torch/OpenMP state
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(data, threads)) as ex:
+        futures = [ex.submit(train_member, i, seed, hp, member_paths[i]) for i, seed in enumerate(hp['seeds'])]
+        members = sorted((f.result() for f in futures), key=lambda m: m['idx'])
+    for m in members:
+        print(f"  ✅ Model {m['idx']+1} seed={m['seed']}: best val={m['best_val']:.5f} ({m['seconds']}s)")
+
+    # 5. Blend: all alphas scored in one pass
+    y_val, y_test = windows['val'][1], windows['test'][1]
+    res_val = np.mean([m['res_val'] for m in members], axis=0)
+    res_test = np.mean([m['res_test'] for m in members], axis=0)
+    val_m = blend_metrics(plan, y_val, data['xgb_val'], res_val, ALPHAS)
+    best = int(np.argmin(val_m['MAE']))
+    best_alpha = float(ALPHAS[best])
+    test_m = blend_metrics(plan, y_test, data['xgb_test'], res_test, [0.0, 1.0, best_alpha])
+    print(f"⚖️ Best blend alpha: {best_alpha:.2f} (val MAE: {val_m['MAE'][best]:.2f})")
+
+    # 6. Artifacts
+    cfg = dict(cfg, BLEND_ALPHA=best_alpha)
+    os.makedirs(os.path.join(model_dir, 'v4'), exist_ok=True)
+    joblib.dump(cfg, paths[artifacts.CONFIG_FILE])
+    if refit:
+        joblib.dump(feature_scaler, paths[artifacts.FEATURE_SCALER_FILE])
+        joblib.dump(target_scaler, paths[artifacts.TARGET_SCALER_FILE])
+        joblib.dump(xgb_model, paths[artifacts.XGB_FILE])
+        PackedForest.from_model(xgb_model, artifacts.sha256_file(paths[artifacts.XGB_FILE])).save(
+            paths[artifacts.FOREST_FILE])
+
+    final_val, final_test = metrics_at(val_m, best), metrics_at(test_m, 2)
+    v4_full = {
+        'xgb_only_test': metrics_at(test_m, 0),
+        'hybrid_test': metrics_at(test_m, 1),
+        'final_blended_val': final_val,
+        'final_blended_test': final_test,
+        'best_blend_alpha': best_alpha,
+        'alpha_search': [[float(a), round(float(v), 2)] for a, v in zip(ALPHAS, val_m['MAE'])],
+        'horizon_wise': horizon_metrics(plan, y_test, data['xgb_test'] + best_alpha * res_test),
+        'individual_val_losses': [round(m['best_val'], 5) for m in members],
+        'hyperparameters': hp,
+        'train_seconds': round(time.time() - t_start, 1),
+    }
+    with open(os.path.join(model_dir, 'v4', 'dl_metrics_v4.json'), 'w') as f:
+        json.dump(v4_full, f, indent=2)
+    for m in members:
+        pd.DataFrame(m['history']).to_csv(os.path.join(model_dir, 'v4', f"history_model{m['idx']}.csv"), index=False)
+
+    comparison_path = os.path.join(model_dir, 'v4', 'all_model_comparison_v4.json')
+    comparison = {}
+    if os.path.exists(comparison_path):
+        with open(comparison_path) as f:
+            comparison = json.load(f)
+    if refit:
+        xgb_val = blend_metrics(plan, y_val, data['xgb_val'], res_val, [0.0])
+        comparison['XGBoost'] = {'val': metrics_at(xgb_val, 0), 'test': v4_full['xgb_only_test']}
+    comparison['V4 Hybrid'] = {'val': final_val, 'test': final_test}
+    with open(comparison_path, 'w') as f:
+        json.dump(comparison, f, indent=2)
+
+    print(f"✅ V4 artifacts written to {model_dir} in {v4_full['train_seconds']:.0f}s "
+          f"(test MAE {final_test['MAE']}, alpha {best_alpha:.2f}).")
+    return v4_full
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the V4 hybrid residual ensemble.")
+    parser.add_argument("--zone", default=DEFAULT_ZONE, choices=zones.pool.zones)
+    parser.add_argument("--model-dir", help="write here instead of the zone's model dir")
+    parser.add_argument("--refit", action="store_true", help="refit scalers and XGBoost too")
+    parser.add_argument("--seeds", default=",".join(map(str, HP['seeds'])))
+    parser.add_argument("--workers", type=int, help="training processes (default: one per seed, up to the CPUs)")
+    parser.add_argument("--stride", type=int, default=1, help="use every n-th training window")
+    parser.add_argument("--max-epochs", type=int)
+    parser.add_argument("--patience", type=int)
+    args = parser.parse_args()
+    train(args.zone, args.model_dir, args.refit, [int(s) for s in args.seeds.split(",")],
+          args.workers, args.stride, args.max_epochs, args.patience)
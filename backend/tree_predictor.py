@@ -0,0 +1,285 @@
+"""
+Fast XGBoost inference for the 168-hour base forecast.
+Packs a fitted model (sklearn XGBRegressor, native Booster, or a
+MultiOutputRegressor of single-output regressors) into flat NumPy arrays and
+walks every tree level by level, vectorized over (windows, trees): no DMatrix,
+no sklearn validation and no per-target booster calls. Large batches can still
+go through Booster.inplace_predict with a fixed nthread.
+
+    python tree_predictor.py convert [model.joblib] [forest.npz]   # pack xgb_v4.joblib
+    python tree_predictor.py verify  [model.joblib] [forest.npz]   # parity vs model.predict
+
+A packed forest records the sha256 of the model file it was packed from
+(`source`); ModelV4Manager only uses it while that still matches xgb_v4.joblib.
+"""
+import json
+import sys
+import numpy as np
+from config import XGB_NTHREAD, XGB_PACKED_MAX_BATCH
+
+FOREST_VERSION = 1
+_MAX_CELLS = 1 << 21  # (rows x trees) evaluated per chunk, bounds temporary memory
+
+
+class PackedForest:
+    """
+    All trees of a multi-output model as flat node arrays. Leaves point to
+    themselves, so a fixed number of steps (the max depth) lands every
+    (row, tree) pair on its leaf. Trees are ordered by target so outputs are
+    one np.add.reduceat over the leaf values.
+    """
+    FIELDS = ("feature", "threshold", "left", "right", "default_left", "value",
+              "roots", "target_starts", "base_score", "meta")
+
+    def __init__(self, feature, threshold, left, right, default_left, value,
+                 roots, target_starts, base_score, meta, source=""):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.target_starts = target_starts
+        self.base_score = base_score
+        self.meta = meta  # [version, depth, n_features]
+        self.source = str(source)  # sha256 of the packed model file ("" if unknown)
+        self._children = np.stack([right, left], axis=1)  # [node, went_left]
+
+    depth = property(lambda self: int(self.meta[1]))
+    n_features = property(lambda self: int(self.meta[2]))
+    n_targets = property(lambda self: len(self.base_score))
+    n_trees = property(lambda self: len(self.roots))
+
+    # ── Build ──────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_model(cls, model, source=""):
+        """
+        Pack an XGBRegressor, a Booster, or a MultiOutputRegressor of XGBRegressors.
+        source: sha256 of the file the model was saved to (see sha256_file).
+        """
+        if hasattr(model, "estimators_"):  # sklearn MultiOutputRegressor: one booster per target
+            parts = [_booster_trees(_booster(est), _n_iterations(est)) for est in model.estimators_]
+            trees = [(t, k) for k, (tree_list, _, _) in enumerate(parts) for t, _ in tree_list]
+            base = np.array([p[1][0] for p in parts], dtype=np.float32)
+            n_features = parts[0][2]
+        else:
+            trees, base, n_features = _booster_trees(_booster(model), _n_iterations(model))
+        return cls._pack(trees, base, n_features, source)
+
+    @classmethod
+    def _pack(cls, trees, base, n_features, source=""):
+        trees = sorted(trees, key=lambda tk: tk[1])  # stable: keeps boosting order per target
+        targets = np.array([k for _, k in trees])
+        n_targets = len(base)
+        if set(targets.tolist()) != set(range(n_targets)):
+            raise ValueError("every target needs at least one tree")
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        offset, depth = 0, 0
+        for tree, _ in trees:
+            lc = np.asarray(tree["left_children"], dtype=np.int32)
+            rc = np.asarray(tree["right_children"], dtype=np.int32)
+            leaf = lc == -1
+            idx = np.arange(len(lc), dtype=np.int32)
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            feature.append(np.where(leaf, 0, np.asarray(tree["split_indices"], dtype=np.int32)))
+            threshold.append(np.where(leaf, 0, cond).astype(np.float32))
+            left.append(np.where(leaf, idx, lc) + offset)
+            right.append(np.where(leaf, idx, rc) + offset)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            value.append(np.where(leaf, cond, 0).astype(np.float32))  # leaf value lives in split_conditions
+            roots.append(offset)
+            depth = max(depth, _tree_depth(lc, rc))
+            offset += len(lc)
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value),
+            roots=np.asarray(roots, dtype=np.int32),
+            target_starts=np.searchsorted(targets, np.arange(n_targets)).astype(np.int64),
+            base_score=np.asarray(base, dtype=np.float32),
+            meta=np.array([FOREST_VERSION, depth, n_features], dtype=np.int64),
+            source=source,
+        )
+
+    # ── Persist ────────────────────────────────────────────────────────
+
+    def save(self, path):
+        with open(path, "wb") as f:  # file object: np.savez would append ".npz" to a bare name
+            np.savez(f, source=np.array(self.source), **{name: getattr(self, name) for name in self.FIELDS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            source = str(data["source"]) if "source" in data.files else ""  # older forests: no source recorded
+            forest = cls(**{name: data[name] for name in cls.FIELDS}, source=source)
+        if int(forest.meta[0]) != FOREST_VERSION:
+            raise ValueError(f"unsupported forest version {int(forest.meta[0])}")
+        return forest
+
+    # ── Predict ────────────────────────────────────────────────────────
+
+    def predict(self, X):
+        """(N, n_features) -> (N, n_targets) float32, same as XGBoost's predict."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected (N, {self.n_features}) features, got {X.shape}")
+        out = np.empty((len(X), self.n_targets), dtype=np.float32)
+        step = max(1, _MAX_CELLS // self.n_trees)
+        for s in range(0, len(X), step):
+            out[s:s + step] = self._predict_chunk(X[s:s + step])
+        return out
+
+    def _predict_chunk(self, X):
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        has_nan = np.isnan(X).any()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = x < self.threshold[node]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            node = self._children[node, go_left.astype(np.intp)]
+        leaf = self.value[node].astype(np.float64)
+        return np.add.reduceat(leaf, self.target_starts, axis=1) + self.base_score
+
+
+class TreePredictor:
+    """
+    What ModelV4Manager calls: the packed forest for small batches, the
+    booster's inplace_predict (nthread=XGB_NTHREAD) for large ones. Either
+    part may be missing; the other then serves every batch.
+    """
+    def __init__(self, model=None, forest=None, nthread=XGB_NTHREAD, packed_max_batch=XGB_PACKED_MAX_BATCH):
+        if model is None and forest is None:
+            raise ValueError("need an XGBoost model or a packed forest")
+        self.forest = forest
+        self.packed_max_batch = packed_max_batch
+        self.boosters, self.iteration_ranges = [], []
+        if model is not None:
+            for est in getattr(model, "estimators_", None) or [model]:
+                booster = _booster(est)
+                if nthread:
+                    booster.set_param({"nthread": nthread})
+                self.boosters.append(booster)
+                self.iteration_ranges.append((0, _n_iterations(est) or 0))
+
+    @property
+    def mode(self):
+        if self.forest is None:
+            return "booster"
+        return "packed" if not self.boosters else f"packed<={self.packed_max_batch}"
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self.forest is not None and (not self.boosters or len(X) <= self.packed_max_batch):
+            return self.forest.predict(X)
+        preds = [b.inplace_predict(X, iteration_range=r) for b, r in zip(self.boosters, self.iteration_ranges)]
+        out = preds[0] if len(preds) == 1 else np.column_stack(preds)
+        return np.asarray(out, dtype=np.float32).reshape(len(X), -1)
+
+
+# ── XGBoost model introspection ────────────────────────────────────────
+
+def _booster(model):
+    return model.get_booster() if hasattr(model, "get_booster") else model
+
+
+def _n_iterations(model):
+    """Boosting rounds predict() uses (best_iteration + 1 after early stopping), or None for all."""
+    try:
+        return int(model.best_iteration) + 1
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _booster_trees(booster, n_iterations=None):
+    """([(tree_json, target)], base_score (n_targets,), n_features) for one booster."""
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree":
+        raise ValueError(f"only gbtree boosters can be packed (got {gbm['name']})")
+    objective = learner["objective"]["name"]
+    if not objective.startswith("reg:squarederror"):
+        raise ValueError(f"identity-link objectives only (got {objective})")
+    model = gbm["model"]
+
+    params = learner["learner_model_param"]
+    n_targets = max(1, int(params.get("num_target", 1)))
+    base = np.atleast_1d(np.asarray(json.loads(params["base_score"]), dtype=np.float32))
+    if base.size == 1:
+        base = np.repeat(base, n_targets)
+
+    trees = model["trees"]
+    if n_iterations is not None:
+        trees = trees[:model["iteration_indptr"][n_iterations]]
+    for tree in trees:
+        if int(tree["tree_param"].get("size_leaf_vector", 1)) > 1:
+            raise ValueError("multi_output_tree models are not supported; use the booster path")
+        if tree.get("categories_nodes"):
+            raise ValueError("categorical splits are not supported; use the booster path")
+    return list(zip(trees, model["tree_info"])), base, int(params["num_feature"])
+
+
+def _tree_depth(left, right):
+    depth, level = 0, [0]
+    while True:
+        level = [c for n in level for c in (left[n], right[n]) if c != -1]
+        if not level:
+            return depth
+        depth += 1
+
+
+# ── CLI ────────────────────────────────────────────────────────────────
+
+def _cli(argv):
+    import time
+    import joblib
+    import artifacts
+
+    if not argv or argv[0] not in ("convert", "verify"):
+        print(__doc__)
+        return 1
+    src = argv[1] if len(argv) > 1 else artifacts.LOCAL_PATHS[artifacts.XGB_FILE]
+    dst = argv[2] if len(argv) > 2 else artifacts.LOCAL_PATHS[artifacts.FOREST_FILE]
+    model = joblib.load(src)
+
+    if argv[0] == "convert":
+        t0 = time.perf_counter()
+        forest = PackedForest.from_model(model, artifacts.sha256_file(src))
+        forest.save(dst)
+        print(f"🌲 Packed {forest.n_trees:,} trees ({forest.n_targets} targets, depth {forest.depth}) "
+              f"into {dst} in {time.perf_counter() - t0:.1f}s")
+        return 0
+
+    # verify: packed forest and inplace_predict against the model's own predict()
+    forest = PackedForest.load(dst)
+    if forest.source != artifacts.sha256_file(src):
+        print(f"⚠️ {dst} was not packed from {src} (source sha256 differs); re-run convert.")
+    rng = np.random.default_rng(0)
+    X = rng.normal(0, 1.5, (64, forest.n_features)).astype(np.float32)
+    X[rng.random(X.shape) < 0.01] = np.nan  # exercise default directions
+    expected = np.asarray(model.predict(X), dtype=np.float32).reshape(len(X), -1)
+    ok = True
+    for name, predictor in (("packed", TreePredictor(forest=forest)),
+                            ("booster", TreePredictor(model, packed_max_batch=0))):
+        got = predictor.predict(X)
+        err = float(np.abs(got - expected).max())
+        t0 = time.perf_counter()
+        for _ in range(20):
+            predictor.predict(X[:1])
+        ms = (time.perf_counter() - t0) / 20 * 1000
+        passed = err <= 1e-4
+        ok &= passed
+        print(f"{'✅' if passed else '❌'} {name:<8} max |diff| {err:.2e}   single-window {ms:.2f} ms")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_cli(sys.argv[1:]))
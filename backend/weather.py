@@ -6,122 +6,159 @@ import requests
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from config import WEATHER_CITIES, SEASONAL_TEMP, SEASONAL_HUMIDITY, SEASONAL_WIND
+import telemetry
+from config import WEATHER_CITIES, SEASONAL_TEMP, SEASONAL_HUMIDITY, SEASONAL_WIND, OPEN_METEO_FORECAST_URL, OPEN_METEO_ARCHIVE_URL
+
+# Variable order along the last axis of WeatherArray, with the Open-Meteo field for each
+WEATHER_VARS = ("Temp", "Humidity", "Precip", "Wind", "Code", "Solar", "Wind100")
+HOURLY_FIELDS = {
+    "Temp":     "temperature_2m",
+    "Humidity": "relative_humidity_2m",
+    "Precip":   "precipitation",
+    "Wind":     "wind_speed_10m",
+    "Code":     "weather_code",
+    "Solar":    "shortwave_radiation",
+    "Wind100":  "wind_speed_100m",
+}
+_VAR_IDX = {v: i for i, v in enumerate(WEATHER_VARS)}
+
+_SEASONAL_TEMP = np.array([SEASONAL_TEMP[m] for m in range(1, 13)], dtype=np.float32)
+_SEASONAL_HUMIDITY = np.array([SEASONAL_HUMIDITY[m] for m in range(1, 13)], dtype=np.float32)
+_SEASONAL_WIND = np.array([SEASONAL_WIND[m] for m in range(1, 13)], dtype=np.float32)
+
+
+class WeatherArray:
+    """
+    Hourly weather for several cities as one float32 array of shape
+    (cities, hours, variables). Accessors return views, not copies;
+    use to_frame() only where a wide `{Var}_{City}` DataFrame is needed.
+    """
+    __slots__ = ("values", "cities")
+
+    def __init__(self, values, cities):
+        self.values = np.asarray(values, dtype=np.float32)
+        self.cities = tuple(cities)
+
+    @property
+    def hours(self):
+        return self.values.shape[1]
+
+    def var(self, name):
+        """(cities, hours) view of one variable."""
+        return self.values[:, :, _VAR_IDX[name]]
+
+    def city(self, name):
+        """(hours, variables) view of one city."""
+        return self.values[self.cities.index(name)]
+
+    temp = property(lambda self: self.var("Temp"))
+    solar = property(lambda self: self.var("Solar"))
+    wind100 = property(lambda self: self.var("Wind100"))
+    code = property(lambda self: self.var("Code"))
+
+    def with_temp_offset(self, offset=0.0, city_offsets=None):
+        """What-if copy with temperatures shifted globally and/or per city (°C)."""
+        out = self.values.copy()
+        shift = np.full(len(self.cities), offset, dtype=np.float32)
+        for city, delta in (city_offsets or {}).items():
+            shift[self.cities.index(city)] += delta
+        out[:, :, _VAR_IDX["Temp"]] += shift[:, None]
+        return WeatherArray(out, self.cities)
+
+    def columns(self):
+        """{`{Var}_{City}`: (hours,) view}, city-major like the training CSV."""
+        return {
+            f"{var}_{city}": self.values[c, :, v]
+            for c, city in enumerate(self.cities)
+            for v, var in enumerate(WEATHER_VARS)
+        }
+
+    def to_frame(self):
+        return pd.DataFrame(self.columns())
 
 
 def fetch_weather_forecast(start_date, hours=168):
     """
     Fetch hourly weather forecast for all 5 cities.
-    Returns dict of city -> DataFrame with columns: Temp, Humidity, Precip, Wind, Code, Solar, Wind100
+    Returns a WeatherArray (cities, hours, WEATHER_VARS).
     Falls back to seasonal averages if API fails.
     """
     end_date = start_date + timedelta(hours=hours - 1)
-    weather_data = {}
+    values = np.empty((len(WEATHER_CITIES), hours, len(WEATHER_VARS)), dtype=np.float32)
 
-    for city, coords in WEATHER_CITIES.items():
-        try:
-            url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                "latitude": coords["lat"],
-                "longitude": coords["lon"],
-                "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m,weather_code,shortwave_radiation,wind_speed_100m",
-                "start_date": start_date.strftime("%Y-%m-%d"),
-                "end_date": end_date.strftime("%Y-%m-%d"),
-                "timezone": "America/New_York",
-            }
-            resp = requests.get(url, params=params, timeout=15)
-            resp.raise_for_status()
-            data = resp.json()
-
-            hourly = data["hourly"]
-            df = pd.DataFrame({
-                f"Temp_{city}":     hourly["temperature_2m"][:hours],
-                f"Humidity_{city}": hourly["relative_humidity_2m"][:hours],
-                f"Precip_{city}":   hourly["precipitation"][:hours],
-                f"Wind_{city}":     hourly["wind_speed_10m"][:hours],
-                f"Code_{city}":     hourly["weather_code"][:hours],
-                f"Solar_{city}":    hourly["shortwave_radiation"][:hours],
-                f"Wind100_{city}":  hourly["wind_speed_100m"][:hours],
-            })
-            # Check if we got back valid data
-            if df.isna().all().any():
-                print(f"  ⚠️  {city} weather API returned nulls. Using seasonal fallback.")
-                weather_data[city] = _seasonal_fallback(city, start_date, hours)
-            else:
-                weather_data[city] = df
-                print(f"  ✅ {city}: {len(df)} hours fetched")
+    for c, (city, coords) in enumerate(WEATHER_CITIES.items()):
+        with telemetry.stage(f"weather.{city}"):
+            try:
+                arr = _request_hourly(OPEN_METEO_FORECAST_URL, coords, start_date, end_date, hours)
+                # Check if we got back valid data
+                if np.isnan(arr).all(axis=0).any():
+                    print(f"  ⚠️  {city} weather API returned nulls. Using seasonal fallback.")
+                    values[c] = _seasonal_fallback(city, start_date, hours)
+                else:
+                    values[c] = arr
+                    print(f"  ✅ {city}: {len(arr)} hours fetched")
 
-        except Exception as e:
-            print(f"  ⚠️  {city} weather API failed: {e}. Using seasonal fallback.")
-            weather_data[city] = _seasonal_fallback(city, start_date, hours)
+            except Exception as e:
+                print(f"  ⚠️  {city} weather API failed: {e}. Using seasonal fallback.")
+                values[c] = _seasonal_fallback(city, start_date, hours)
 
-    return weather_data
+    return WeatherArray(values, WEATHER_CITIES.keys())
 
 
 def fetch_historical_weather(start_date, hours=168):
     """
     Fetch historical hourly weather for all 5 cities.
     Uses Open-Meteo historical API.
-    Returns dict of city -> DataFrame with columns: Temp, Humidity, Precip, Wind, Code, Solar, Wind100
+    Returns a WeatherArray (cities, hours, WEATHER_VARS).
     """
     end_date = start_date + timedelta(hours=hours - 1)
-    weather_data = {}
+    values = np.empty((len(WEATHER_CITIES), hours, len(WEATHER_VARS)), dtype=np.float32)
 
-    for city, coords in WEATHER_CITIES.items():
+    for c, (city, coords) in enumerate(WEATHER_CITIES.items()):
         try:
-            url = "https://archive-api.open-meteo.com/v1/archive"
-            params = {
-                "latitude": coords["lat"],
-                "longitude": coords["lon"],
-                "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m,weather_code,shortwave_radiation,wind_speed_100m",
-                "start_date": start_date.strftime("%Y-%m-%d"),
-                "end_date": end_date.strftime("%Y-%m-%d"),
-                "timezone": "America/New_York",
-            }
-            resp = requests.get(url, params=params, timeout=15)
-            resp.raise_for_status()
-            data = resp.json()
-
-            hourly = data["hourly"]
-            df = pd.DataFrame({
-                f"Temp_{city}":     hourly["temperature_2m"][:hours],
-                f"Humidity_{city}": hourly["relative_humidity_2m"][:hours],
-                f"Precip_{city}":   hourly["precipitation"][:hours],
-                f"Wind_{city}":     hourly["wind_speed_10m"][:hours],
-                f"Code_{city}":     hourly["weather_code"][:hours],
-                f"Solar_{city}":    hourly["shortwave_radiation"][:hours],
-                f"Wind100_{city}":  hourly["wind_speed_100m"][:hours],
-            })
-            weather_data[city] = df
-            print(f"  ✅ {city}: {len(df)} hours (historical)")
+            values[c] = _request_hourly(OPEN_METEO_ARCHIVE_URL, coords, start_date, end_date, hours)
+            print(f"  ✅ {city}: {hours} hours (historical)")
 
         except Exception as e:
             print(f"  ⚠️  {city} historical API failed: {e}. Using seasonal fallback.")
-            weather_data[city] = _seasonal_fallback(city, start_date, hours)
+            values[c] = _seasonal_fallback(city, start_date, hours)
+
+    return WeatherArray(values, WEATHER_CITIES.keys())
+
+
+def _request_hourly(url, coords, start_date, end_date, hours):
+    """Call Open-Meteo and return a (hours, WEATHER_VARS) float32 array (NaN-padded)."""
+    params = {
+        "latitude": coords["lat"],
+        "longitude": coords["lon"],
+        "hourly": ",".join(HOURLY_FIELDS[v] for v in WEATHER_VARS),
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "timezone": "America/New_York",
+    }
+    resp = requests.get(url, params=params, timeout=15)
+    resp.raise_for_status()
+    hourly = resp.json()["hourly"]
 
-    return weather_data
+    arr = np.full((hours, len(WEATHER_VARS)), np.nan, dtype=np.float32)
+    for v, var in enumerate(WEATHER_VARS):
+        series = np.array(hourly[HOURLY_FIELDS[var]][:hours], dtype=np.float32)  # nulls -> NaN
+        arr[:len(series), v] = series
+    return arr
 
 
 def _seasonal_fallback(city, start_date, hours):
     """Generate seasonal average weather when API fails."""
-    timestamps = [start_date + timedelta(hours=h) for h in range(hours)]
-    temps, humids, winds = [], [], []
-
-    for ts in timestamps:
-        month = ts.month
-        hour = ts.hour
-        # Add diurnal temperature variation (±5°C)
-        diurnal = 5.0 * np.sin(2 * np.pi * (hour - 6) / 24)
-        temps.append(SEASONAL_TEMP[month] + diurnal)
-        humids.append(SEASONAL_HUMIDITY[month])
-        winds.append(SEASONAL_WIND[month])
-
-    return pd.DataFrame({
-        f"Temp_{city}":     temps,
-        f"Humidity_{city}": humids,
-        f"Precip_{city}":   [0.0] * hours,
-        f"Wind_{city}":     winds,
-        f"Code_{city}":     [0] * hours,
-        f"Solar_{city}":    [0.0] * hours,
-        f"Wind100_{city}":  [winds[i] * 1.2 for i in range(hours)], # simple estimate
-    })
+    telemetry.inc("voltcast_weather_fallbacks_total", city=city)
+    ts = pd.date_range(start_date, periods=hours, freq="h")
+    month_idx = ts.month.values - 1
+    # Add diurnal temperature variation (±5°C)
+    diurnal = 5.0 * np.sin(2 * np.pi * (ts.hour.values - 6) / 24)
+
+    arr = np.zeros((hours, len(WEATHER_VARS)), dtype=np.float32)
+    winds = _SEASONAL_WIND[month_idx]
+    arr[:, _VAR_IDX["Temp"]] = _SEASONAL_TEMP[month_idx] + diurnal
+    arr[:, _VAR_IDX["Humidity"]] = _SEASONAL_HUMIDITY[month_idx]
+    arr[:, _VAR_IDX["Wind"]] = winds
+    arr[:, _VAR_IDX["Wind100"]] = winds * 1.2  # simple estimate
+    return arr
@@ -0,0 +1,298 @@
+"""
+Per-zone model sets and history stores.
+Each load zone (config.ZONES) has its own artifacts and history CSV. The pool
+loads a zone's model set and history on first use and evicts the least
+recently used idle zones when the memory budget (or MAX_LOADED_ZONES) would
+be exceeded. All zones share one process, inference pool and governor.
+"""
+import gc
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import artifacts
+import resources
+import telemetry
+from model_v4 import ModelV4Manager, model_manager
+from config import (DEFAULT_ZONE, ZONES, PREPROCESSED_CSV, ZONE_DATA_ROOT, MAX_LOADED_ZONES, MEMORY_HEADROOM_MB,
+                    HISTORY_COLUMN_CACHE)
+
+MB = 1024 * 1024
+
+
+class UnknownZone(ValueError):
+    def __init__(self, zone):
+        super().__init__(f"Unknown zone '{zone}' (available: {', '.join(ZONES)})")
+
+
+def history_csv(zone):
+    if zone == DEFAULT_ZONE:
+        return PREPROCESSED_CSV
+    return os.path.join(ZONE_DATA_ROOT, zone, os.path.basename(PREPROCESSED_CSV))
+
+
+# ── History store ──────────────────────────────────────────────────────
+
+class HistoryStore:
+    """A zone's recent history (tail sized by the governor) and full-range column arrays."""
+    def __init__(self, zone, manager):
+        self.zone = zone
+        self.path = history_csv(zone)
+        self.manager = manager
+        self.df = None
+        self.columns = OrderedDict()  # column -> (csv mtime, timestamps, values), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The history tail, loaded on first use."""
+        df = self.df
+        if df is not None:
+            telemetry.inc("voltcast_cache_hits_total", cache="history")
+            return df
+        with self._lock:
+            if self.df is None:
+                telemetry.inc("voltcast_cache_misses_total", cache="history")
+                with telemetry.stage("history_load"):
+                    # Tail length comes from the memory governor; reserve room for the
+                    # XGBoost model if it has not been loaded yet.
+                    pending = 0 if self.manager.loaded else resources.xgb_bytes(self.manager.xgb_size())
+                    plan = resources.governor.plan(self.manager.member_sizes(), pending_bytes=pending,
+                                                   zone=self.zone, history_path=self.path)
+                    try:
+                        self.df = self.load_tail(plan["history_rows"])
+                    except Exception:
+                        resources.governor.forget(self.zone)
+                        raise
+            return self.df
+
+    def load_tail(self, n_rows):
+        """Read the last n_rows of the history CSV with compact dtypes."""
+        label = "" if self.zone == DEFAULT_ZONE else f" [{self.zone}]"
+        print(f"🕒 Loading recent historical data{label} ({n_rows:,} rows, Memory Optimized)...")
+        total_rows, n_cols = resources.history_shape(self.path)
+        skip = max(0, total_rows - n_rows)
+
+        df = pd.read_csv(self.path, skiprows=range(1, skip + 1))
+
+        # Optimize types
+        for col in df.select_dtypes(include=['float64']).columns:
+            df[col] = df[col].astype('float32')
+        for col in df.select_dtypes(include=['int64']).columns:
+            df[col] = df[col].astype('int32')
+
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+        gc.collect()
+        resources.governor.report("history", len(df), resources.history_row_bytes(n_cols), zone=self.zone)
+        print(f"✅ Recent data loaded{label}. Horizon: {len(df)} rows.")
+        return df
+
+    def column(self, column):
+        """
+        (datetime64[s] timestamps, float64 values) of one column over the whole CSV,
+        cached per file mtime. At most HISTORY_COLUMN_CACHE columns are kept; their
+        size is reported to the governor, which counts it as fixed memory.
+        """
+        mtime = os.path.getmtime(self.path)
+        with self._lock:
+            cached = self.columns.get(column)
+            if cached and cached[0] == mtime:
+                self.columns.move_to_end(column)
+                telemetry.inc("voltcast_cache_hits_total", cache="history_column")
+                return cached[1], cached[2]
+        telemetry.inc("voltcast_cache_misses_total", cache="history_column")
+        df = pd.read_csv(self.path, usecols=['Timestamp', column])
+        ts = pd.to_datetime(df['Timestamp']).to_numpy(dtype='datetime64[s]')
+        values = df[column].to_numpy(dtype=np.float64)
+        with self._lock:
+            self.columns[column] = (mtime, ts, values)
+            self.columns.move_to_end(column)
+            while len(self.columns) > HISTORY_COLUMN_CACHE:
+                self.columns.popitem(last=False)
+            self._report_columns()
+        return ts, values
+
+    def _report_columns(self):
+        unit = max((c[1].nbytes + c[2].nbytes for c in self.columns.values()), default=0)
+        resources.governor.report("columns", len(self.columns), unit, zone=self.zone)
+
+    def rebalance(self, plan):
+        """Trim to the planned rows, or re-read for a meaningful gain (>25% more rows)."""
+        with self._lock:
+            held = self.df
+            if held is None:
+                return
+            if plan["history_rows"] < len(held):
+                print(f"📉 Trimming history {len(held):,} -> {plan['history_rows']:,} rows to fit the memory budget.")
+                self.df = held.tail(plan["history_rows"]).reset_index(drop=True)
+                resources.governor.report("history", len(self.df), plan["history_row_bytes"], zone=self.zone)
+                del held
+                resources.release_memory()
+            elif plan["history_rows"] > len(held) * 1.25:
+                self.df = self.load_tail(plan["history_rows"])
+
+    def unload(self):
+        with self._lock:
+            self.df = None
+            self.columns = OrderedDict()
+            self._report_columns()
+
+
+# ── Model pool ─────────────────────────────────────────────────────────
+
+class ZoneModels:
+    """One zone's model manager and history store."""
+    def __init__(self, zone, manager):
+        self.zone = zone
+        self.manager = manager
+        self.history = HistoryStore(zone, manager)
+        self.users = 0  # requests holding this set (never evicted while > 0)
+
+    @property
+    def loaded(self):
+        return self.manager.loaded and self.history.df is not None
+
+    def available(self):
+        """True when the zone has a history CSV and known artifacts (local files or a synced manifest)."""
+        return os.path.exists(self.history.path) and self.manager.xgb_size() > 0
+
+    def load(self):
+        self.history.get()
+        self.manager.load()
+
+    def unload(self):
+        self.history.unload()
+        self.manager.unload()
+        resources.governor.forget(self.zone)
+
+    def floor_bytes(self):
+        return resources.model_set_floor_bytes(self.manager.xgb_size(), self.manager.member_sizes(),
+                                               self.history.path)
+
+    def rebalance(self):
+        """Re-plan against the live RSS and resize the ensemble and history tail."""
+        plan = resources.governor.plan(self.manager.member_sizes(), zone=self.zone, history_path=self.history.path)
+        if self.manager.loaded and plan["members"] != len(self.manager.dl_ensemble):
+            self.manager.resize_ensemble(plan["members"])
+        self.history.rebalance(plan)
+        return plan
+
+
+class ModelPool:
+    """
+    Keyed model sets, loaded on demand and evicted least-recently-used.
+    Requests hold a set with `with pool.use(zone) as zm:`; held sets are
+    never evicted, so a set cannot be unloaded under a running prediction.
+    """
+    def __init__(self, zones=ZONES, max_loaded=MAX_LOADED_ZONES):
+        self.zones = list(zones)
+        self.max_loaded = max_loaded
+        self.evictions = 0
+        self._sets = {}
+        self._lru = OrderedDict()  # loaded zones, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, zone=DEFAULT_ZONE):
+        """The ZoneModels for a zone (created, not loaded, on first access)."""
+        if zone not in self.zones:
+            raise UnknownZone(zone)
+        with self._lock:
+            zm = self._sets.get(zone)
+            if zm is None:
+                manager = (model_manager if zone == DEFAULT_ZONE else
+                           ModelV4Manager(zone, artifacts.zone_store(zone), history_csv(zone)))
+                zm = self._sets[zone] = ZoneModels(zone, manager)
+            return zm
+
+    @contextmanager
+    def use(self, zone=DEFAULT_ZONE):
+        """Hold a zone's model set, loading it (and evicting idle zones) if needed."""
+        zm = self.get(zone)
+        with self._lock:
+            zm.users += 1
+        failed = False
+        try:
+            if not zm.loaded:
+                self._make_room(zm)
+                try:
+                    zm.load()
+                except Exception:
+                    failed = True
+                    raise
+            with self._lock:
+                self._lru[zone] = True
+                self._lru.move_to_end(zone)
+            yield zm
+        finally:
+            with self._lock:
+                zm.users -= 1
+                # A half-loaded set is not in the LRU, so nothing would ever evict it.
+                # Release it once its last holder leaves: other requests may be using
+                # (or still loading) the same set.
+                if failed and zm.users == 0 and zone not in self._lru:
+                    zm.unload()
+
+    def _make_room(self, zm):
+        """Evict idle LRU zones until zm's minimum footprint fits the budget and the zone cap."""
+        need = zm.floor_bytes()
+        while True:
+            with self._lock:
+                others = [z for z in self._lru if z != zm.zone]
+                idle = [z for z in others if self._sets[z].users == 0]
+                over = bool(self.max_loaded) and len(others) >= self.max_loaded
+                if not over:
+                    _, budget, rss = resources.governor.budget()
+                    over = bool(budget) and rss + need + MEMORY_HEADROOM_MB * MB > budget
+                if not over or not idle:
+                    return
+                victim = self._sets[idle[0]]
+                del self._lru[victim.zone]
+                # Unload under the pool lock: nobody can take the set until it is gone.
+                print(f"♻️ Evicting zone {victim.zone} to load {zm.zone}.")
+                victim.unload()
+                self.evictions += 1
+            telemetry.inc("voltcast_zone_evictions_total", zone=victim.zone)
+
+    def available_zones(self):
+        """Zones that can be loaded (see ZoneModels.available), in config order."""
+        return [zone for zone in self.zones if self.get(zone).available()]
+
+    def loaded_zones(self):
+        with self._lock:
+            return list(self._lru)
+
+    def rebalance(self):
+        """Re-plan every loaded zone (periodic governor pass)."""
+        for zone in self.loaded_zones():
+            zm = self.get(zone)
+            with self._lock:
+                if zone not in self._lru:
+                    continue
+                zm.users += 1
+            try:
+                zm.rebalance()
+            finally:
+                with self._lock:
+                    zm.users -= 1
+
+    def status(self):
+        """Zones and what each loaded one holds, for /api/health."""
+        with self._lock:
+            loaded = list(self._lru)
+            sets = {z: self._sets[z] for z in loaded}
+        telemetry.set_gauge("voltcast_loaded_zones", len(loaded))
+        return {
+            "available": self.zones,
+            "loaded": loaded,  # least recently used first
+            "max_loaded": self.max_loaded,
+            "evictions": self.evictions,
+            "sets": {z: {"ensemble_members": len(zm.manager.dl_ensemble),
+                         "history_rows": 0 if zm.history.df is None else len(zm.history.df),
+                         "in_use": zm.users}
+                     for z, zm in sets.items()},
+        }
+
+
+# Singleton instance
+pool = ModelPool()